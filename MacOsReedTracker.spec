@@ -6,7 +6,16 @@ a = Analysis(
     pathex=[],
     binaries=[('./portaudio-binaries/libportaudio.dylib', '.')],
     datas=[],
-    hiddenimports=[],
+    # loaded lazily by name (kivy Factory / first use), invisible to analysis
+    hiddenimports=[
+        'src_kivy_app.figure',
+        'src_kivy_app.live_view',
+        'src_kivy_app.overlay',
+        'sounddevice',
+        'sklearn.neighbors',
+        'scipy.integrate',
+        'scipy.signal',
+    ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,448 @@
+"""
+Where audio comes from and goes to. ReedRecorder and LiveSpectrogram only talk
+to an AudioSource (record / read / open_stream) and an AudioSink (play), so the
+same capture, trigger and save code runs from:
+
+    DeviceSource      the live microphone (sounddevice)
+    FileSource        a WAV, .npz or .rrec file, e.g. an archived session
+    ArraySource       samples already in memory
+    SyntheticSource   generated notes over a noise floor
+    NullSource        silence
+
+File and synthetic sources read as fast as the CPU allows. Their open_stream
+paces blocks to realtime, so the app can run on them as if they were a
+microphone.
+
+Headless machines: set REED_REVIEWER_AUDIO to "null", "synthetic" or to the
+path of a recording and default_source / default_sink never touch the audio
+device.
+"""
+import os
+import time
+import threading
+import numpy as np
+
+import reed_reviewer.reed_utils as rutils
+import reed_reviewer.storage as storage
+from reed_reviewer.constants import CLOCK_PRECISION
+
+AUDIO_ENV = "REED_REVIEWER_AUDIO"  # "device" (default), "null", "synthetic" or a path
+NOISE_RMS = 1e-3
+
+
+def synthetic_take(n_samples, channels, Fs=44100, n_notes=3, seed=0):
+    """
+    quiet noise with n_notes harmonic notes (enveloped) spread over it, the
+    second channel a quieter copy of the first like a stereo pair of mics
+
+    Returns
+    -------
+        raw_data (ndarray) - (n_samples, channels) float32
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / Fs
+    signal = rng.normal(0, NOISE_RMS, n_samples)
+    note_len = n_samples // (2 * max(n_notes, 1))
+    for idx in range(n_notes):
+        start = (2 * idx + 1) * note_len // 2
+        f0 = rng.uniform(200, 900)
+        note = sum(
+            (0.3 / harmonic) * np.sin(2 * np.pi * f0 * harmonic * t[:note_len])
+            for harmonic in range(1, 8)
+        )
+        signal[start : start + note_len] += note * np.hanning(note_len)
+    gains = [1.0, 0.8][:channels] + [0.8] * max(0, channels - 2)
+    return (signal[:, np.newaxis] * gains).astype(np.float32)
+
+
+def default_source(Fs=44100, backend=None):
+    """
+    source picked by REED_REVIEWER_AUDIO: the device unless it says "null",
+    "synthetic" or names a recording file (looped)
+    """
+    setting = os.environ.get(AUDIO_ENV, "device")
+    if setting == "device":
+        return DeviceSource(Fs, backend=backend)
+    if setting == "null":
+        return NullSource(Fs)
+    if setting == "synthetic":
+        return SyntheticSource(Fs)
+    return FileSource(setting, loop=True)
+
+
+def default_sink(backend=None):
+    """
+    the device, or a NullSink when REED_REVIEWER_AUDIO points away from it
+    """
+    if os.environ.get(AUDIO_ENV, "device") == "device":
+        return DeviceSink(backend=backend)
+    return NullSink()
+
+
+# ____________________________ Sources ____________________________#
+class AudioSource:
+    """
+    Base class. Subclasses set Fs and channels and implement record.
+
+    realtime is True for sources that produce audio at wall clock speed (a
+    device), False for ones that can be read as fast as wanted.
+    """
+
+    Fs = 44100
+    channels = 1
+    realtime = False
+
+    def record(self, n_frames):
+        """
+        starts getting n_frames (frames, channels) float32 samples. The array
+        may still be filling until wait returns. Fewer (or 0) frames at the end
+        of a finite source.
+        """
+        raise NotImplementedError
+
+    def record_into(self, out):
+        """
+        like record, into the preallocated (frames, channels) float32 array out.
+        Returns the part of out that is (being) filled. The base version copies
+        from record, sources that can write in place override it.
+        """
+        data = self.record(out.shape[0])
+        self.wait()
+        out[: data.shape[0]] = data
+        return out[: data.shape[0]]
+
+    def wait(self):
+        """
+        blocks until the last record is filled
+        """
+
+    def read(self, n_frames):
+        data = self.record(n_frames)
+        self.wait()
+        return data
+
+    def blocks(self, blocksize=4096):
+        """
+        yields (blocksize, channels) blocks until the source runs out
+        """
+        while True:
+            block = self.read(blocksize)
+            if block.shape[0] == 0:
+                return
+            yield block
+            if block.shape[0] < blocksize:
+                return
+
+    def open_stream(self, callback, blocksize=512):
+        """
+        a stream (start / stop / close, channels) calling
+        callback(indata, frames, time_info, status) per block, like
+        sounddevice.InputStream. Blocks are paced to realtime.
+        """
+        return PacedStream(self, callback, blocksize)
+
+    def start_time(self):
+        """
+        save_time (epoch int at clock resolution) of the first sample
+        """
+        return rutils.epoch_time_int()
+
+
+class DeviceSource(AudioSource):
+    """
+    The live input device. Asks for stereo and falls back to mono.
+
+    Inputs
+    ------
+        Fs (int) - 44100 - sampling rate.
+        channels (int) - 2 - channels asked for.
+        backend (module) - None - sounddevice, or anything with its rec, wait,
+            InputStream and PortAudioError (see bench.FakeSoundDevice).
+    """
+
+    realtime = True
+
+    def __init__(self, Fs=44100, channels=2, backend=None):
+        if backend is None:
+            import sounddevice as backend  # only loaded when a device is used
+        self.sd = backend
+        self.Fs = Fs
+        self.channels = channels
+
+    def record(self, n_frames):
+        try:
+            return self.sd.rec(n_frames, samplerate=self.Fs, channels=self.channels)
+        except self.sd.PortAudioError:
+            if self.channels == 1:
+                raise
+            return self.sd.rec(n_frames, samplerate=self.Fs, channels=1)
+
+    def record_into(self, out):
+        try:
+            return self.sd.rec(out=out, samplerate=self.Fs)
+        except self.sd.PortAudioError:
+            if out.shape[1] == 1:
+                raise
+            # stay mono from now on, callers size their buffers from channels
+            self.channels = 1
+            return self.sd.rec(out=np.empty_like(out[:, :1]), samplerate=self.Fs)
+
+    def wait(self):
+        self.sd.wait()
+
+    def open_stream(self, callback, blocksize=0):
+        try:
+            return self.sd.InputStream(
+                samplerate=self.Fs,
+                channels=self.channels,
+                dtype="float32",
+                blocksize=blocksize,
+                callback=callback,
+            )
+        except self.sd.PortAudioError:
+            return self.sd.InputStream(
+                samplerate=self.Fs,
+                channels=1,
+                dtype="float32",
+                blocksize=blocksize,
+                callback=callback,
+            )
+
+
+class ArraySource(AudioSource):
+    """
+    Plays back samples already in memory.
+
+    Inputs
+    ------
+        data (ndarray) - (samples, channels) or (samples,) audio.
+        Fs (int) - 44100 - sampling rate.
+        loop (bool) - False - start over at the end instead of running out.
+    """
+
+    def __init__(self, data, Fs=44100, loop=False):
+        self.data = data if data.ndim > 1 else data[:, np.newaxis]
+        self.n_samples, self.channels = self.data.shape
+        self.Fs = Fs
+        self.loop = loop
+        self.pos = 0
+
+    def record(self, n_frames):
+        pieces = []
+        while n_frames > 0:
+            if self.loop and self.pos >= self.n_samples > 0:
+                self.pos = 0
+            piece = self._window(self.pos, n_frames)
+            if piece.shape[0] == 0:
+                break
+            pieces.append(piece)
+            self.pos += piece.shape[0]
+            n_frames -= piece.shape[0]
+            if not self.loop:
+                break
+        if not pieces:
+            return np.empty([0, self.channels], dtype=np.float32)
+        return np.concatenate(pieces) if len(pieces) > 1 else pieces[0]
+
+    def _window(self, start, length):
+        return np.array(self.data[start : start + length], dtype=np.float32)
+
+
+class FileSource(ArraySource):
+    """
+    Replays a recording file: WAV, a saved .rrec or a legacy .npz, loose or
+    packed (see pack). .rrec files are read a window at a time and WAV files
+    memory mapped, so hour long sessions never have to fit in memory.
+
+    Inputs
+    ------
+        path (str) - file to replay.
+        loop (bool) - False - start over at the end instead of running out.
+    """
+
+    def __init__(self, path, loop=False):
+        self.path = path
+        self._save_time = None
+        self._scale = None  # integer WAV samples are scaled to +-1
+
+        if path.lower().endswith(".wav"):
+            from scipy.io import wavfile
+
+            Fs, data = wavfile.read(path, mmap=True)
+            if np.issubdtype(data.dtype, np.signedinteger):
+                self._scale = np.float32(1 / np.iinfo(data.dtype).max)
+            super(FileSource, self).__init__(data, Fs, loop)
+        elif path.endswith(storage.EXTENSION):
+            self._data_path, header = rutils.locate_rec(path)  # loose or packed
+            self._header = header
+            self.data = None  # read window by window
+            self.n_samples = header["n_samples"]
+            self.channels = header["n_channels"]
+            self.Fs = int(header["fingerprint"]["Fs"])
+            self.loop = loop
+            self.pos = 0
+            self._save_time = header["fingerprint"].get("save_time")
+        else:
+            data, fingerp = rutils.load_rec(path)
+            super(FileSource, self).__init__(data, int(fingerp["Fs"]), loop)
+            self._save_time = fingerp.get("save_time")
+
+    def start_time(self):
+        if self._save_time is not None:
+            return int(self._save_time)
+        return round(rutils.rec_stat(self.path)[1] / CLOCK_PRECISION)
+
+    def _window(self, start, length):
+        if self.data is None:
+            block = storage._load_window(
+                self._data_path, self._header, None, start, length
+            )
+            return np.asarray(block, dtype=np.float32)
+        block = super(FileSource, self)._window(start, length)
+        if self._scale is not None:
+            block *= self._scale
+        return block
+
+
+class SyntheticSource(AudioSource):
+    """
+    Generated audio. make_take(n, channels, Fs, seed=...) is called for
+    chunk_sec of audio at a time (a new seed per chunk) and reads are served
+    from that, so small blocks still sound like a player with pauses between
+    notes.
+
+    Inputs
+    ------
+        Fs (int) - 44100 - sampling rate.
+        channels (int) - 2 - channels generated.
+        duration_sec (float) - None - runs out after this much audio, None never.
+        make_take (callable) - synthetic_take - generator of the audio.
+        chunk_sec (float) - 3 - audio generated per make_take call.
+    """
+
+    def __init__(
+        self, Fs=44100, channels=2, duration_sec=None, make_take=None, chunk_sec=3
+    ):
+        self.Fs = Fs
+        self.channels = channels
+        self.make_take = make_take or synthetic_take
+        self.remaining = None if duration_sec is None else int(duration_sec * Fs)
+        self.chunk = max(1, int(chunk_sec * Fs))
+        self.n_chunks = 0
+        self._buffer = np.empty([0, channels], dtype=np.float32)
+
+    def record(self, n_frames):
+        if self.remaining is not None:
+            n_frames = min(n_frames, self.remaining)
+            self.remaining -= n_frames
+        pieces = [self._buffer]
+        n_held = self._buffer.shape[0]
+        while n_held < n_frames:
+            self.n_chunks += 1
+            chunk = self.make_take(
+                self.chunk, self.channels, self.Fs, seed=self.n_chunks
+            )
+            pieces.append(chunk)
+            n_held += chunk.shape[0]
+        held = np.concatenate(pieces) if len(pieces) > 1 else self._buffer
+        self._buffer = held[n_frames:]
+        return held[:n_frames]
+
+
+class NullSource(AudioSource):
+    """
+    Endless silence, for running without any input at all.
+    """
+
+    def __init__(self, Fs=44100, channels=1):
+        self.Fs = Fs
+        self.channels = channels
+
+    def record(self, n_frames):
+        return np.zeros([n_frames, self.channels], dtype=np.float32)
+
+    def record_into(self, out):
+        out.fill(0)
+        return out
+
+
+class PacedStream:
+    """
+    InputStream look-alike over any source: a thread reads blocks and hands
+    them to the callback at realtime pace. Stops by itself when the source
+    runs out.
+    """
+
+    def __init__(self, source, callback, blocksize=512):
+        self.source = source
+        self.callback = callback
+        self.blocksize = blocksize or 512
+        self.channels = source.channels
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+
+    def _run(self):
+        block_sec = self.blocksize / self.source.Fs
+        next_time = time.perf_counter()
+        for block in self.source.blocks(self.blocksize):
+            if self._stop.is_set():
+                return
+            self.callback(block, block.shape[0], None, None)
+            next_time += block_sec
+            self._stop.wait(max(0, next_time - time.perf_counter()))
+
+
+# ____________________________ Sinks ____________________________#
+class AudioSink:
+    """
+    Base class for where playback goes
+    """
+
+    def play(self, data, Fs):
+        raise NotImplementedError
+
+    def wait(self):
+        pass
+
+
+class DeviceSink(AudioSink):
+    """
+    System speakers through sounddevice (or backend, see DeviceSource)
+    """
+
+    def __init__(self, backend=None):
+        if backend is None:
+            import sounddevice as backend
+        self.sd = backend
+
+    def play(self, data, Fs):
+        self.sd.play(data, Fs)
+
+    def wait(self):
+        self.sd.wait()
+
+
+class NullSink(AudioSink):
+    """
+    Drops playback, keeps a count. For headless runs.
+    """
+
+    def __init__(self):
+        self.played = 0
+
+    def play(self, data, Fs):
+        self.played += 1
@@ -0,0 +1,331 @@
+"""
+Benchmarks of the capture-to-disk and review hot paths, no microphone needed.
+
+ReedRecorder runs against FakeSoundDevice, which hands back synthetic takes
+(a few harmonic notes over a quiet noise floor) instead of recording. Every
+case is timed over a few repeats and run once more under tracemalloc for its
+peak memory. Results go to a json file and can be compared to a stored
+baseline; a case slower than the baseline by more than the threshold is
+flagged and the command exits non zero.
+
+    python -m reed_reviewer.bench                      # run, compare to baseline
+    python -m reed_reviewer.bench --save-baseline      # run, store as baseline
+
+Timings are machine specific, so the baseline and the latest results live in
+DATA_ROOT/bench (--out writes the results elsewhere).
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import matplotlib
+
+matplotlib.use("Agg")  # benchmarks draw off screen
+import matplotlib.pyplot as plt
+
+import reed_reviewer.reed_utils as rutils
+from reed_reviewer.constants import DATA_ROOT
+from reed_reviewer.audio import synthetic_take, ArraySource
+from reed_reviewer.recorder import ReedRecorder
+from reed_reviewer.writer import SaveQueue
+
+BASELINE_PATH = os.path.join(DATA_ROOT, "bench", "baseline.json")
+RESULTS_PATH = os.path.join(DATA_ROOT, "bench", "results.json")
+
+DURATIONS_SEC = (0.5, 1, 5, 30)
+CHANNELS = (1, 2)
+REPEATS = 5
+THRESHOLD = 0.25  # fraction slower than baseline that counts as a regression
+
+
+# ____________________________ Fake audio ____________________________#
+class FakeSoundDevice:
+    """
+    Stand in for the sounddevice module (the parts audio.DeviceSource uses). rec
+    returns make_take(n_samples, channels) right away, InputStream feeds the
+    same signal to its callback in blocks on start.
+
+    Inputs
+    ------
+        make_take (callable) - synthetic_take - makes the "recorded" audio.
+        max_channels (int) - 2 - asking for more channels raises PortAudioError,
+            like a mono interface.
+    """
+
+    class PortAudioError(Exception):
+        pass
+
+    def __init__(self, make_take=synthetic_take, max_channels=2):
+        self.make_take = make_take
+        self.max_channels = max_channels
+        self.played = 0
+
+    def rec(self, frames=None, samplerate=44100, channels=1, out=None, **kwargs):
+        if out is not None:
+            frames, channels = out.shape
+        if channels > self.max_channels:
+            raise self.PortAudioError(f"no device with {channels} channels")
+        take = self.make_take(frames, channels, samplerate)
+        if out is None:
+            return take
+        out[:] = take
+        return out
+
+    def wait(self):
+        pass
+
+    def play(self, data, samplerate=None, **kwargs):
+        self.played += 1
+
+    def InputStream(self, samplerate=44100, channels=1, callback=None, **kwargs):
+        if channels > self.max_channels:
+            raise self.PortAudioError(f"no device with {channels} channels")
+        return _FakeStream(self, samplerate, channels, callback)
+
+
+class _FakeStream:
+    def __init__(self, device, samplerate, channels, callback, blocksize=512):
+        self.device = device
+        self.samplerate = samplerate
+        self.channels = channels
+        self.callback = callback
+        self.blocksize = blocksize
+
+    def start(self):
+        n_samples = int(self.samplerate)  # one second of audio
+        data = self.device.make_take(n_samples, self.channels, self.samplerate)
+        for start in range(0, data.shape[0], self.blocksize):
+            block = data[start : start + self.blocksize]
+            self.callback(block, block.shape[0], None, None)
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# ____________________________ Cases ____________________________#
+def make_recorder(data_root, duration, channels, compact=False):
+    """
+    ReedRecorder on a fake backend in data_root, with a threshold set from a
+    noise only baseline. compact is ReedRecorder's compact mode.
+    """
+
+    def noise(n_samples, n_channels, Fs):
+        return synthetic_take(n_samples, n_channels, Fs, n_notes=0)
+
+    device = FakeSoundDevice(noise, max_channels=channels)
+    recorder = ReedRecorder(
+        "bench",
+        rec_duration_sec=duration,
+        rec_wait=0,
+        save_queue=SaveQueue(maxsize=64),
+        backend=device,
+        data_root=data_root,
+        compact=compact,
+    )
+    recorder.set_thresh()
+    recorder.save_queue.flush()
+    device.make_take = synthetic_take
+    recorder.listen(save_bool=False)
+    return recorder
+
+
+def cases(recorder):
+    """
+    name -> zero argument callable of every benchmarked path. Saves are
+    flushed inside the case so the disk write is part of its time.
+    """
+    signal = recorder.raw_data.copy()  # compact mode records over its buffers
+    fig = plt.figure(figsize=(10, 10))
+
+    def listen():
+        recorder.listen()
+        recorder.save_queue.flush()
+
+    def thresh_save():
+        recorder.raw_data = signal
+        recorder._thresh_save()
+        recorder.save_queue.flush()
+
+    def fft():
+        recorder.spectrum_cache.clear()  # time the transform, not the cache
+        if recorder.compact:
+            recorder.spectrum_workspace.key = None
+        recorder._fft(signal)
+
+    def compute_power():
+        recorder._compute_power(signal[:, 0], signal.shape[0] / recorder.Fs)
+
+    def save_load():
+        recorder.raw_data = signal
+        recorder.save_time = rutils.epoch_time_int()
+        sv_path = recorder._save_rec()
+        recorder.save_queue.flush()
+        rutils.load_rec(sv_path)
+
+    def replay():
+        # the whole take as a session, trigger + segmentation + saves
+        recorder.replay(ArraySource(signal, recorder.Fs), verbose=False)
+
+    def plot():
+        recorder.raw_data = signal
+        recorder.plot(fig)
+        fig.canvas.draw()
+
+    return dict(
+        listen=listen,
+        thresh_save=thresh_save,
+        fft=fft,
+        compute_power=compute_power,
+        save_load=save_load,
+        replay=replay,
+        plot=plot,
+    )
+
+
+def measure(fn, repeats=REPEATS):
+    """
+    Returns
+    -------
+        result (dict) - median_s, min_s over repeats, and peak_mb (traced
+            allocations of one more run)
+    """
+    fn()  # warm up (imports, caches, first figure layout)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(
+        median_s=float(np.median(times)),
+        min_s=float(np.min(times)),
+        peak_mb=peak / 2**20,
+    )
+
+
+def run(
+    durations=DURATIONS_SEC,
+    channels=CHANNELS,
+    repeats=REPEATS,
+    only=None,
+    compact=False,
+):
+    """
+    every case for every duration and channel count. compact runs them on a
+    compact mode recorder, its keys end in /compact.
+
+    Returns
+    -------
+        results (dict) - meta (machine info) and results, "case/<dur>s/<ch>ch" ->
+            measure output
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as data_root:
+        for duration in durations:
+            for n_channels in channels:
+                recorder = make_recorder(data_root, duration, n_channels, compact)
+                for name, fn in cases(recorder).items():
+                    if only and name not in only:
+                        continue
+                    key = f"{name}/{duration:g}s/{n_channels}ch"
+                    key += "/compact" if compact else ""
+                    results[key] = measure(fn, repeats)
+                    print(
+                        f"{key:28s} {results[key]['median_s'] * 1e3:9.2f} ms "
+                        f"{results[key]['peak_mb']:8.1f} MB"
+                    )
+                recorder.save_queue.close()
+                plt.close("all")
+    meta = dict(
+        python=platform.python_version(),
+        numpy=np.__version__,
+        machine=platform.machine(),
+        processor=platform.processor(),
+        date=time.strftime("%Y-%m-%d %H:%M:%S"),
+    )
+    return dict(meta=meta, results=results)
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    cases whose median time grew by more than threshold against the baseline
+
+    Returns
+    -------
+        regressions (list of (str, float, float)) - case, baseline and new
+            median seconds
+    """
+    regressions = []
+    for key, new in results["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        if new["median_s"] > old["median_s"] * (1 + threshold):
+            regressions.append((key, old["median_s"], new["median_s"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m reed_reviewer.bench",
+        description="Time the capture-to-disk and review paths on synthetic audio.",
+    )
+    parser.add_argument("--out", default=RESULTS_PATH, help="results json file")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument(
+        "--durations", type=float, nargs="+", default=list(DURATIONS_SEC)
+    )
+    parser.add_argument("--only", nargs="+", help="case names to run, e.g. fft plot")
+    parser.add_argument(
+        "--compact", action="store_true", help="time a compact mode recorder"
+    )
+    args = parser.parse_args(argv)
+
+    results = run(
+        durations=args.durations,
+        repeats=args.repeats,
+        only=args.only,
+        compact=args.compact,
+    )
+    rutils.check_add_dir(os.path.dirname(os.path.abspath(args.out)))
+    with open(args.out, "w") as out_file:
+        json.dump(results, out_file, indent=2)
+    print(f"results written to {args.out}")
+
+    if args.save_baseline:
+        rutils.check_add_dir(os.path.dirname(os.path.abspath(args.baseline)))
+        with open(args.baseline, "w") as out_file:
+            json.dump(results, out_file, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare to, run with --save-baseline first")
+        return
+
+    with open(args.baseline) as in_file:
+        baseline = json.load(in_file)
+    regressions = compare(results, baseline, args.threshold)
+    for key, old, new in regressions:
+        print(f"REGRESSION {key}: {old * 1e3:.2f} ms -> {new * 1e3:.2f} ms")
+    if regressions:
+        sys.exit(1)
+    print(f"no regressions (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Catalog of recordings under DATA_ROOT. A small SQLite index that is updated on
+every ReedRecorder save, so finding and filtering a reed's history is a query
+instead of a directory scan plus a decompress of every file.
+
+Rebuild or check the index of an existing data tree with:
+
+    python -m reed_reviewer.catalog rebuild
+    python -m reed_reviewer.catalog verify
+"""
+import os
+import sqlite3
+import argparse
+import numpy as np
+import reed_reviewer.reed_utils as rutils
+from reed_reviewer.constants import DATA_ROOT
+
+CATALOG_NAME = "catalog.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    reed_id TEXT,
+    save_time INTEGER,
+    Fs INTEGER,
+    rms_thresh REAL,
+    duration REAL,
+    n_samples INTEGER,
+    n_channels INTEGER,
+    mtime REAL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS recordings_reed_time ON recordings (reed_id, save_time);
+"""
+_COLUMNS = (
+    "path",
+    "reed_id",
+    "save_time",
+    "Fs",
+    "rms_thresh",
+    "duration",
+    "n_samples",
+    "n_channels",
+    "mtime",
+    "size",
+)
+_INSERT = f"INSERT OR REPLACE INTO recordings VALUES ({','.join('?' * len(_COLUMNS))})"
+
+
+def row_key(row):
+    """
+    identity of a catalog row's recording as it is now (path, size, mtime), so
+    stores of per-take results can tell a rewritten take from the one they hold
+    """
+    return f"{row['path']}|{row['size']}|{row['mtime']!r}"
+
+
+def sync_rows(kept_keys, rows):
+    """
+    what a store of per-take results (timeline, spectrum history) has to do to
+    match the catalog. Compares membership, not a newest save_time, so takes
+    that reach the catalog out of order (replayed sessions, late saves,
+    migrated or packed trees) are still picked up, and removed or rewritten
+    takes are dropped.
+
+    Inputs
+    ------
+        kept_keys (iterable of str) - row_key of every take in the store.
+        rows (list of dict) - every catalog row the store should hold.
+
+    Returns
+    -------
+        keep (ndarray) - (kept,) bool, stored takes still current
+        new_rows (list of dict) - rows the store doesn't have yet
+    """
+    current = {row_key(row): row for row in rows}
+    kept_keys = list(kept_keys)
+    keep = np.array([key in current for key in kept_keys], dtype=bool)
+    kept = set(kept_keys)
+    new_rows = [row for key, row in current.items() if key not in kept]
+    return keep, new_rows
+
+
+class Catalog:
+    """
+    SQLite index of the reed takes in a data tree (baseline recordings are not
+    indexed). Paths are stored relative to data_root so the tree can be moved. A new connection is opened per call, so
+    one Catalog can be shared by the UI and the save threads.
+
+    Inputs
+    ------
+        data_root (str) - DATA_ROOT - root of the data tree.
+        db_path (str) - None - location of the index, defaults to
+            data_root/catalog.sqlite3.
+    """
+
+    def __init__(self, data_root=DATA_ROOT, db_path=None):
+        self.data_root = data_root
+        self.db_path = db_path or os.path.join(data_root, CATALOG_NAME)
+        rutils.check_add_dir(os.path.dirname(self.db_path))
+        with self._connect() as con:
+            con.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    # ____________________________ Updates ____________________________#
+    def add(self, rec_path, fingerprint, shape):
+        """
+        add (or replace) one recording.
+
+        Inputs
+        ------
+            rec_path (str) - path of the saved file.
+            fingerprint (dict) - the recording's fingerprint, see
+                ReedRecorder._fingerprint.
+            shape (tuple) - (samples, channels) of the recording.
+        """
+        with self._connect() as con:
+            con.execute(_INSERT, self._row(rec_path, fingerprint, shape))
+
+    def remove(self, rec_path):
+        with self._connect() as con:
+            con.execute("DELETE FROM recordings WHERE path = ?", (self._rel(rec_path),))
+
+    def rebuild(self):
+        """
+        drop the index and re-read every recording in the reed_* dirs.
+        Recordings are memory mapped, so mostly just their headers are read.
+        Only needed once per tree.
+
+        Returns
+        -------
+            count (int) - number of recordings indexed
+        """
+        rows = []
+        for rec_path in self._walk():
+            try:
+                raw_data, fingerp = rutils.load_rec(rec_path, mmap_mode="r")
+            except Exception as err:  # unreadable file, leave it out
+                print(f"skipping {rec_path}: {err}")
+                continue
+            rows.append(self._row(rec_path, fingerp, raw_data.shape))
+
+        with self._connect() as con:
+            con.execute("DELETE FROM recordings")
+            con.executemany(_INSERT, rows)
+        return len(rows)
+
+    def verify(self):
+        """
+        compares the index against the files on disk without loading any
+        recordings.
+
+        Returns
+        -------
+            report (dict) - lists of paths that are "missing" (indexed, no file),
+                "unindexed" (file, not indexed) and "changed" (size/mtime differ).
+        """
+        indexed = {row["path"]: row for row in self.recordings()}
+        on_disk = set(self._walk())
+
+        report = dict(missing=[], unindexed=[], changed=[])
+        for path, row in indexed.items():
+            if path not in on_disk:
+                report["missing"].append(path)
+                continue
+            size, mtime = rutils.rec_stat(path)
+            if size != row["size"] or mtime != row["mtime"]:
+                report["changed"].append(path)
+        report["unindexed"] = sorted(on_disk - set(indexed))
+        return report
+
+    # ____________________________ Queries ____________________________#
+    def recordings(self, reed_id=None, since=None, until=None):
+        """
+        recordings ordered by save_time, optionally filtered.
+
+        Inputs
+        ------
+            reed_id (str/int) - None - only this reed. None is every reed.
+            since, until (int) - None - save_time bounds, inclusive.
+
+        Returns
+        -------
+            rows (list of dict) - one dict per recording, "path" is absolute.
+        """
+        query = "SELECT * FROM recordings WHERE 1=1"
+        args = []
+        if reed_id is not None:
+            query += " AND reed_id = ?"
+            args.append(str(reed_id))
+        if since is not None:
+            query += " AND save_time >= ?"
+            args.append(int(since))
+        if until is not None:
+            query += " AND save_time <= ?"
+            args.append(int(until))
+        query += " ORDER BY save_time"
+
+        with self._connect() as con:
+            cursor = con.execute(query, args)
+            rows = [dict(zip(_COLUMNS, values)) for values in cursor]
+        for row in rows:
+            row["path"] = os.path.join(self.data_root, row["path"])
+        return rows
+
+    def newest(self, reed_id):
+        """
+        newest recording of a reed, or None
+        """
+        with self._connect() as con:
+            values = con.execute(
+                "SELECT * FROM recordings WHERE reed_id = ? "
+                "ORDER BY save_time DESC LIMIT 1",
+                (str(reed_id),),
+            ).fetchone()
+        if values is None:
+            return None
+        row = dict(zip(_COLUMNS, values))
+        row["path"] = os.path.join(self.data_root, row["path"])
+        return row
+
+    def reed_ids(self):
+        with self._connect() as con:
+            return [
+                values[0]
+                for values in con.execute(
+                    "SELECT DISTINCT reed_id FROM recordings ORDER BY reed_id"
+                )
+            ]
+
+    # ____________________________ Support ____________________________#
+    def _rel(self, rec_path):
+        return os.path.relpath(rec_path, self.data_root)
+
+    def _row(self, rec_path, fingerprint, shape):
+        n_samples = shape[0]
+        n_channels = shape[1] if len(shape) > 1 else 1
+        Fs = int(fingerprint["Fs"])
+        rms_thresh = fingerprint["rms_thresh"]
+        rms_thresh = float(np.max(rms_thresh)) if np.size(rms_thresh) else None
+        size, mtime = rutils.rec_stat(rec_path)
+        return (
+            self._rel(rec_path),
+            str(fingerprint["id"]),
+            int(fingerprint["save_time"]),
+            Fs,
+            rms_thresh,
+            n_samples / Fs,
+            n_samples,
+            n_channels,
+            mtime,
+            size,
+        )
+
+    def _walk(self):
+        """
+        paths of every recording in the reed_* dirs, packed or not. Baseline
+        recordings are room noise, not takes of a reed, and are left out.
+        """
+        if not os.path.exists(self.data_root):
+            return []
+        paths = []
+        for sub_dir in sorted(os.listdir(self.data_root)):
+            dir_path = os.path.join(self.data_root, sub_dir)
+            if not os.path.isdir(dir_path):
+                continue
+            if not sub_dir.startswith("reed_"):
+                continue
+            for file_name in rutils.list_recordings(dir_path):
+                paths.append(os.path.join(dir_path, file_name))
+        return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m reed_reviewer.catalog",
+        description="index of the recordings in the reed reviewer data tree",
+    )
+    parser.add_argument("command", choices=["rebuild", "verify", "list"])
+    parser.add_argument("--root", default=DATA_ROOT, help="data tree root")
+    parser.add_argument("--reed", default=None, help="reed id for list")
+    args = parser.parse_args(argv)
+
+    catalog = Catalog(args.root)
+    if args.command == "rebuild":
+        count = catalog.rebuild()
+        print(f"indexed {count} recordings")
+    elif args.command == "verify":
+        report = catalog.verify()
+        for kind, paths in report.items():
+            print(f"{kind}: {len(paths)}")
+            for path in paths:
+                print(f"    {path}")
+    else:
+        for row in catalog.recordings(reed_id=args.reed):
+            print(
+                row["reed_id"],
+                row["save_time"],
+                row["Fs"],
+                f"{row['duration']:.2f}s",
+                row["n_channels"],
+                row["path"],
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""
+Constants shared by every module. Nothing else in the package is imported
+here, so any module (reed_utils, storage, pack, instrument...) can import it
+without an import cycle.
+"""
+import os
+import time
+
+HOME = os.path.expanduser("~")
+DATA_ROOT = os.path.join(HOME, ".reed_reviewer_data")
+CLOCK_PRECISION = time.clock_getres(0)  # save_time units (seconds)
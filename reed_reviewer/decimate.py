@@ -0,0 +1,75 @@
+"""
+Min/max decimation for line plots. A recording (or spectrum) is reduced once
+into a pyramid of levels, each level holding the min and max of every bin of
+FACTOR times as many samples as the level below. A view then only needs the
+level with about one bin per pixel of the axes, so drawing, zooming and panning
+cost depends on the plot's width rather than the recording's length, and since
+every bin keeps its extremes no peak ever disappears from the plot.
+
+    pyramid = MinMaxPyramid(t, signal)
+    x, y = pyramid.view(x_min, x_max, ax.bbox.width)   # y is (points, channels)
+"""
+import numpy as np
+
+FACTOR = 2  # samples per bin grows by this from level to level
+MIN_BINS = 64  # coarsest level kept
+RAW_POINTS_PER_PIXEL = 2  # raw samples are drawn up to this density
+
+
+class MinMaxPyramid:
+    """
+    Inputs
+    ------
+        x (ndarray) - (samples,) increasing positions, time or frequency.
+        y (ndarray) - (samples,) or (samples, channels) values.
+        factor (int) - FACTOR - bin growth from one level to the next.
+    """
+
+    def __init__(self, x, y, factor=FACTOR):
+        self.x = np.asarray(x)
+        self.y = y[:, np.newaxis] if y.ndim == 1 else y
+        self.factor = factor
+        # levels[k] is (mins, maxs), bins of factor ** (k + 1) samples
+        self.levels = []
+        mins = maxs = self.y
+        while mins.shape[0] > MIN_BINS:
+            starts = np.arange(0, mins.shape[0], factor)
+            mins = np.minimum.reduceat(mins, starts, axis=0)
+            maxs = np.maximum.reduceat(maxs, starts, axis=0)
+            self.levels.append((mins, maxs))
+
+    @property
+    def n_samples(self):
+        return self.x.shape[0]
+
+    def view(self, x_min, x_max, width_px):
+        """
+        points to draw for the x range [x_min, x_max] on an axes width_px wide.
+        One sample either side of the range is included so lines reach the
+        edges. Raw samples if the range is short enough, otherwise a min and a
+        max per bin from the finest level with at most about a bin per pixel.
+
+        Returns
+        -------
+            x (ndarray) - (points,)
+            y (ndarray) - (points, channels)
+        """
+        first = max(int(np.searchsorted(self.x, x_min, "left")) - 1, 0)
+        stop = min(int(np.searchsorted(self.x, x_max, "right")) + 1, self.n_samples)
+        n_bins = max(int(width_px), 1)
+        span = stop - first
+        if span <= RAW_POINTS_PER_PIXEL * n_bins or not self.levels:
+            return self.x[first:stop], self.y[first:stop]
+
+        # largest bin that still gives n_bins bins over the span
+        level = int(np.log(span / n_bins) / np.log(self.factor)) - 1
+        level = min(max(level, 0), len(self.levels) - 1)
+        bin_len = self.factor ** (level + 1)
+        mins, maxs = self.levels[level]
+        first_bin, stop_bin = first // bin_len, -(-stop // bin_len)
+
+        x = np.repeat(self.x[np.arange(first_bin, stop_bin) * bin_len], 2)
+        y = np.empty([2 * (stop_bin - first_bin), self.y.shape[1]], self.y.dtype)
+        y[0::2] = mins[first_bin:stop_bin]
+        y[1::2] = maxs[first_bin:stop_bin]
+        return x, y
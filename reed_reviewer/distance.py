@@ -0,0 +1,282 @@
+"""
+Pairwise spectral distances between recordings, of one reed or several.
+
+Spectra come off the feature sidecar grid (FREQ_GRID, see features.py), cut to
+the band every recording actually has: MIN_HZ up to the lowest Nyquist among
+them, so a 22.05 kHz take and a 48 kHz take are compared on the same bins.
+Two metrics, both on normalized spectra so overall loudness doesn't count:
+
+    cosine        1 - cosine similarity of the magnitude spectra, 0 to 1.
+    log_spectral  rms difference (dB) of the log power spectra, each with its
+                  mean removed.
+
+Both reduce to one matrix product per block of recordings, so the n x n
+matrix is filled tile by tile (BLOCK_MB bounds the working memory of a tile),
+the upper triangle only, optionally on a thread pool. A few thousand takes is
+a few million pairs and a few seconds.
+
+    matrix = DistanceMatrix.from_spectra(freq, spectra, Fs)
+    order = matrix.leaf_order()    # similar takes next to each other
+    labels = matrix.clusters(4)
+
+See ReedReviewer.distance_matrix.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+METRICS = ("cosine", "log_spectral")
+MIN_HZ = 50  # below this is room rumble, not the reed
+BLOCK_MB = 64  # working memory of one tile
+OPTIMAL_MAX = 1000  # optimal leaf ordering is slow past this many recordings
+_EPS = 1e-12
+
+
+def common_band(freq, Fs, min_hz=MIN_HZ):
+    """
+    grid points every recording has: min_hz up to (not including) the lowest
+    Nyquist in Fs
+
+    Returns
+    -------
+        keep (ndarray) - (grid,) bool
+    """
+    nyquist = np.min(Fs) / 2
+    return (freq >= min_hz) & (freq < nyquist)
+
+
+def normalize(spectra, metric="cosine"):
+    """
+    rows the metric is computed on: unit length magnitude spectra for cosine,
+    mean removed dB spectra for log_spectral
+
+    Inputs
+    ------
+        spectra (ndarray) - (recordings, bins) magnitudes.
+        metric (str) - "cosine" - see METRICS.
+
+    Returns
+    -------
+        rows (ndarray) - (recordings, bins) float32
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}, not {metric!r}")
+    spectra = np.asarray(spectra, dtype=np.float64)
+    if metric == "cosine":
+        norm = np.linalg.norm(spectra, axis=1, keepdims=True)
+        rows = spectra / np.maximum(norm, _EPS)
+    else:
+        rows = 20 * np.log10(spectra + _EPS)
+        rows -= rows.mean(axis=1, keepdims=True)
+    return rows.astype(np.float32)
+
+
+def block_rows(n_cols, block_mb=BLOCK_MB):
+    """
+    rows per tile so a (rows, rows) tile and its (rows, n_cols) inputs fit
+    in block_mb
+    """
+    budget = block_mb * 2**20 / 4  # float32
+    # largest rows with rows^2 + 2 rows n_cols <= budget
+    rows = int(np.sqrt(n_cols**2 + budget) - n_cols)
+    return max(rows, 16)
+
+
+def pairwise(rows, metric="cosine", block=None, workers=1, out=None):
+    """
+    distance between every pair of normalized rows, tile by tile.
+
+    Inputs
+    ------
+        rows (ndarray) - (recordings, bins) output of normalize.
+        metric (str) - "cosine" - the metric rows were normalized for.
+        block (int) - None - recordings per tile, None sizes tiles by BLOCK_MB.
+        workers (int) - 1 - threads computing tiles. BLAS may already use
+            several cores for each product, so more threads only help on
+            single threaded BLAS builds or with small tiles.
+        out (ndarray) - None - (recordings, recordings) array to fill, e.g. a
+            np.memmap when the matrix doesn't fit in memory.
+
+    Returns
+    -------
+        matrix (ndarray) - (recordings, recordings) float32, symmetric, zero
+            diagonal
+    """
+    n_rows, n_cols = rows.shape
+    if out is None:
+        out = np.empty([n_rows, n_rows], dtype=np.float32)
+    block = block or block_rows(n_cols)
+    starts = range(0, n_rows, block)
+    sq_norms = np.einsum("ij,ij->i", rows, rows)
+
+    def tile(bounds):
+        row0, col0 = bounds
+        row1, col1 = min(row0 + block, n_rows), min(col0 + block, n_rows)
+        gram = rows[row0:row1] @ rows[col0:col1].T
+        if metric == "cosine":
+            dist = np.subtract(1, gram, out=gram)
+        else:
+            dist = sq_norms[row0:row1, np.newaxis] + sq_norms[col0:col1] - 2 * gram
+            np.maximum(dist, 0, out=dist)
+            np.sqrt(dist / n_cols, out=dist)
+        np.clip(dist, 0, None, out=dist)
+        out[row0:row1, col0:col1] = dist
+        if row0 != col0:  # mirror into the lower triangle
+            out[col0:col1, row0:row1] = dist.T
+
+    tiles = [(row0, col0) for row0 in starts for col0 in starts if col0 >= row0]
+    if workers == 1:
+        for bounds in tiles:
+            tile(bounds)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(tile, tiles))
+    np.fill_diagonal(out, 0)
+    return out
+
+
+class DistanceMatrix:
+    """
+    Pairwise distances of a set of recordings, with the order and labels to
+    read them by.
+
+    Inputs
+    ------
+        matrix (ndarray) - (recordings, recordings) distances.
+        reed_ids (ndarray) - (recordings,) reed of each recording.
+        save_time (ndarray) - (recordings,) save time of each recording.
+        metric (str) - "cosine" - metric of the distances, see METRICS.
+    """
+
+    def __init__(self, matrix, reed_ids, save_time, metric="cosine"):
+        self.matrix = matrix
+        self.reed_ids = np.asarray(reed_ids, dtype=str)
+        self.save_time = np.asarray(save_time, dtype=np.int64)
+        self.metric = metric
+
+    @classmethod
+    def from_spectra(
+        cls,
+        freq,
+        spectra,
+        Fs,
+        reed_ids=None,
+        save_time=None,
+        metric="cosine",
+        workers=1,
+        min_hz=MIN_HZ,
+    ):
+        """
+        distances between recordings from their grid spectra.
+
+        Inputs
+        ------
+            freq (ndarray) - (grid,) frequency grid of the spectra.
+            spectra (ndarray) - (recordings, grid) magnitudes, channels
+                averaged (e.g. history.SpectrumHistory.spectra).
+            Fs (ndarray/int) - (recordings,) sampling rate of each recording,
+                or one for all. Sets the top of the common band.
+            reed_ids, save_time (ndarray) - None - kept for labelling.
+            metric (str) - "cosine" - see METRICS.
+            workers (int) - 1 - see pairwise.
+            min_hz (float) - MIN_HZ - bottom of the common band.
+        """
+        n_recs = spectra.shape[0]
+        keep = common_band(freq, Fs, min_hz) if n_recs else np.ones(len(freq), bool)
+        rows = normalize(spectra[:, keep], metric)
+        matrix = pairwise(rows, metric, workers=workers)
+        reed_ids = np.full(n_recs, "") if reed_ids is None else reed_ids
+        save_time = np.zeros(n_recs) if save_time is None else save_time
+        return cls(matrix, reed_ids, save_time, metric)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def linkage(self, method="average", optimal=None):
+        """
+        hierarchical clustering of the recordings (scipy.cluster.hierarchy).
+
+        Inputs
+        ------
+            method (str) - "average" - linkage method, any that works on
+                precomputed distances (single, complete, average, weighted).
+            optimal (bool) - None - reorder leaves so neighbours are as close
+                as possible. None does so up to OPTIMAL_MAX recordings.
+        """
+        from scipy.cluster import hierarchy  # slow import, only when clustering
+        from scipy.spatial.distance import squareform
+
+        if optimal is None:
+            optimal = len(self) <= OPTIMAL_MAX
+        condensed = squareform(self.matrix, checks=False).astype(np.float64)
+        return hierarchy.linkage(condensed, method=method, optimal_ordering=optimal)
+
+    def leaf_order(self, method="average", optimal=None):
+        """
+        Returns
+        -------
+            order (ndarray) - (recordings,) indices with similar recordings
+                next to each other, see linkage
+        """
+        if len(self) < 2:
+            return np.arange(len(self))
+        from scipy.cluster import hierarchy
+
+        return hierarchy.leaves_list(self.linkage(method, optimal))
+
+    def clusters(self, n_clusters, method="average"):
+        """
+        Returns
+        -------
+            labels (ndarray) - (recordings,) cluster of each recording, 1 to
+                n_clusters
+        """
+        if len(self) < 2:
+            return np.ones(len(self), dtype=np.int32)
+        from scipy.cluster import hierarchy
+
+        link = self.linkage(method, optimal=False)
+        return hierarchy.fcluster(link, n_clusters, criterion="maxclust")
+
+    def ordered(self, order=None):
+        """
+        a copy with rows and columns in order (default leaf_order)
+        """
+        order = self.leaf_order() if order is None else np.asarray(order)
+        return DistanceMatrix(
+            self.matrix[np.ix_(order, order)],
+            self.reed_ids[order],
+            self.save_time[order],
+            self.metric,
+        )
+
+    def nearest(self, idx, k=10):
+        """
+        Returns
+        -------
+            matches (list of (int, float)) - index and distance of the k
+                recordings closest to recording idx, closest first
+        """
+        dist = self.matrix[idx].astype(np.float64)
+        dist[idx] = np.inf
+        k = min(k, len(self) - 1)
+        if k <= 0:
+            return []
+        best = np.argpartition(dist, k - 1)[:k]
+        best = best[np.argsort(dist[best])]
+        return [(int(other), float(dist[other])) for other in best]
+
+    def save(self, path):
+        np.savez(
+            path,
+            matrix=self.matrix,
+            reed_ids=self.reed_ids,
+            save_time=self.save_time,
+            metric=self.metric,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["matrix"], data["reed_ids"], data["save_time"], str(data["metric"])
+            )
@@ -0,0 +1,216 @@
+"""
+Per-recording feature sidecars. Each saved recording gets a small .npz sidecar
+under DATA_ROOT/features holding its one-sided spectrum on a fixed
+frequency grid, per-channel rms and average power, dB against the baseline
+that was in use, and pitch (f0 and first harmonic amplitudes, see pitch.py).
+Reviewing history reads these instead of the raw audio.
+
+Sidecars carry FEATURE_HASH plus the size/mtime of their recording. Bump
+FEATURE_VERSION whenever compute_features changes and every sidecar is
+recomputed on its next access.
+"""
+import os
+import hashlib
+import numpy as np
+import reed_reviewer.reed_utils as rutils
+import reed_reviewer.pitch as pitch
+from reed_reviewer.spectrum import spectrum
+
+FEATURE_VERSION = 2
+GRID_STEP_HZ = 10
+GRID_MAX_HZ = 20000
+FREQ_GRID = np.arange(0, GRID_MAX_HZ + GRID_STEP_HZ, GRID_STEP_HZ, dtype=np.float32)
+FEATURE_HASH = hashlib.sha1(
+    f"{FEATURE_VERSION}:{GRID_STEP_HZ}:{GRID_MAX_HZ}".encode()
+).hexdigest()[:12]
+
+
+def compute_rms(raw_data):
+    """
+    per-channel rms, mean is approx 0 so no subtraction needed
+    """
+    return np.sqrt(np.mean(np.square(raw_data, dtype=np.float64), axis=0))
+
+
+def compute_power(raw_data, Fs):
+    """
+    per-channel average power, integral of the squared signal over its duration.
+    Same as ReedRecorder._compute_power but for every channel at once.
+    """
+    from scipy.integrate import simpson  # slow import, first save only
+
+    n_samples = raw_data.shape[0]
+    energy = simpson(np.square(raw_data, dtype=np.float64), dx=1 / Fs, axis=0)
+    return energy / (n_samples / Fs)
+
+
+def to_grid(freq_axis, freq_mag, grid=FREQ_GRID):
+    """
+    resamples a spectrum onto a fixed frequency grid. Each grid point is the mean
+    of the bins within half a grid step of it, so narrow peaks are kept. Grid
+    points with no bins (short recordings) are interpolated. Points above
+    Nyquist are 0.
+
+    Inputs
+    ------
+        freq_axis (ndarray) - (bins,) one-sided frequency axis.
+        freq_mag (ndarray) - (bins, channels) magnitudes.
+        grid (ndarray) - FREQ_GRID - evenly spaced grid frequencies.
+
+    Returns
+    -------
+        grid_mag (ndarray) - (grid, channels) float32
+    """
+    step = grid[1] - grid[0]
+    edges = np.searchsorted(freq_axis, np.append(grid - step / 2, grid[-1] + step / 2))
+    counts = np.diff(edges)
+
+    cum_mag = np.zeros([len(freq_axis) + 1, freq_mag.shape[1]])
+    np.cumsum(freq_mag, axis=0, out=cum_mag[1:])
+    sums = cum_mag[edges[1:]] - cum_mag[edges[:-1]]
+    grid_mag = np.zeros([len(grid), freq_mag.shape[1]], dtype=np.float32)
+    has_bins = counts > 0
+    grid_mag[has_bins] = sums[has_bins] / counts[has_bins, np.newaxis]
+
+    empty = ~has_bins & (grid <= freq_axis[-1])
+    if empty.any():
+        for idx in range(freq_mag.shape[1]):
+            grid_mag[empty, idx] = np.interp(grid[empty], freq_axis, freq_mag[:, idx])
+    return grid_mag
+
+
+def compute_features(raw_data, Fs, ref_power=None):
+    """
+    features of one recording.
+
+    Inputs
+    ------
+        raw_data (ndarray) - (samples, channels) recording.
+        Fs (int) - sampling rate.
+        ref_power (float) - None - baseline power for dB, the mean power of the
+            session's baseline or first noise floor estimate (see
+            noise.NoiseFloor). None (no baseline) leaves dB as nan.
+
+    Returns
+    -------
+        features (dict) - freq (grid,), spectrum (grid, channels), rms
+            (channels,), power (channels,), db (channels,), ref_power (float),
+            f0 (channels,) Hz, harmonics (n_harmonics, channels)
+    """
+    if raw_data.ndim == 1:
+        raw_data = raw_data[:, np.newaxis]
+    freq_axis, freq_mag = spectrum(raw_data, Fs)
+    power = compute_power(raw_data, Fs)
+    ref_power = np.nan if ref_power is None else float(ref_power)
+    f0, harmonics = pitch.summarize(pitch.analyze(raw_data, Fs))
+    return dict(
+        freq=FREQ_GRID,
+        spectrum=to_grid(freq_axis, freq_mag),
+        rms=compute_rms(raw_data),
+        power=power,
+        db=10 * np.log10(power / ref_power),
+        ref_power=ref_power,
+        f0=f0,
+        harmonics=harmonics,
+    )
+
+
+def sidecar_path(rec_path):
+    """
+    DATA_ROOT/reed_1/123.npz -> DATA_ROOT/features/reed_1/123.npz
+    """
+    rec_dir, file_name = os.path.split(os.path.abspath(rec_path))
+    root, sub_dir = os.path.split(rec_dir)
+    name = os.path.splitext(file_name)[0]
+    return os.path.join(root, "features", sub_dir, f"{name}.npz")
+
+
+def is_fresh(rec_path):
+    """
+    True if the recording has an up to date sidecar. Stats the recording and
+    reads the sidecar's stamp (hash, size, mtime), never the recording itself.
+    """
+    side_path = sidecar_path(rec_path)
+    if not os.path.exists(side_path):
+        return False
+    with np.load(side_path) as data:
+        return _source_stamp(rec_path) == (
+            str(data["feature_hash"]),
+            int(data["source_size"]),
+            float(data["source_mtime"]),
+        )
+
+
+def stored_ref_power(rec_path):
+    """
+    baseline power the recording's existing sidecar (stale or not) computed dB
+    against, None if there is no sidecar or it had no baseline
+    """
+    try:
+        with np.load(sidecar_path(rec_path)) as data:
+            ref_power = float(data["ref_power"])
+    except (OSError, KeyError, ValueError):  # no sidecar, or an unreadable one
+        return None
+    return None if np.isnan(ref_power) else ref_power
+
+
+def write_features(rec_path, raw_data, Fs, ref_power=None):
+    """
+    computes and writes the sidecar of a saved recording. Returns the features.
+    """
+    features = compute_features(raw_data, Fs, ref_power)
+    write_sidecar(rec_path, features, Fs)
+    return features
+
+
+def write_sidecar(rec_path, features, Fs):
+    """
+    writes features computed elsewhere (e.g. longtake.ChunkAnalyzer, which never
+    holds the whole recording) as the sidecar of a saved recording
+    """
+    feature_hash, size, mtime = _source_stamp(rec_path)
+
+    side_path = sidecar_path(rec_path)
+    rutils.check_add_dir(os.path.dirname(side_path))
+    np.savez(
+        side_path,
+        feature_hash=feature_hash,
+        source_size=size,
+        source_mtime=mtime,
+        Fs=Fs,
+        **features,
+    )
+
+
+def load_features(rec_path, ref_power=None):
+    """
+    features of a saved recording, from its sidecar. The sidecar is (re)written
+    from the recording first if it is missing or stale.
+
+    Inputs
+    ------
+        rec_path (str) - path of the saved recording.
+        ref_power (float) - None - baseline power for dB. None keeps the dB
+            computed against the baseline used when the sidecar was written,
+            also when a stale sidecar is rewritten.
+    """
+    if is_fresh(rec_path):
+        with np.load(sidecar_path(rec_path)) as data:
+            features = {key: data[key] for key in data.files}
+        features["ref_power"] = float(features["ref_power"])
+    else:
+        raw_data, fingerp = rutils.load_rec(rec_path)
+        if ref_power is None:
+            ref_power = stored_ref_power(rec_path)
+        features = write_features(rec_path, raw_data, int(fingerp["Fs"]), ref_power)
+
+    if ref_power is not None and ref_power != features["ref_power"]:
+        # dB against another baseline only needs the stored power
+        features["db"] = 10 * np.log10(features["power"] / ref_power)
+        features["ref_power"] = float(ref_power)
+    return features
+
+
+def _source_stamp(rec_path):
+    size, mtime = rutils.rec_stat(rec_path)  # packed takes keep the loose file's
+    return FEATURE_HASH, int(size), float(mtime)
@@ -0,0 +1,166 @@
+"""
+Spectrum history of a reed, for overlaying its past takes on the recorder's
+spectrum panels. Every take's spectrum (channel mean, on the feature sidecar's
+FREQ_GRID) is stacked into DATA_ROOT/history/reed_<id>.npz. Like the timeline,
+update only reads the sidecars of takes it doesn't hold yet and drops takes
+gone from the catalog (see catalog.sync_rows), so a week of history is one
+file read.
+
+Drawing it is one artist per panel however many takes there are: a
+LineCollection of every take (coloured old to new), or a shaded percentile
+band plus the median once there are more takes than MAX_LINES. See
+plotting.RecordingPlot.show_history.
+"""
+import os
+import numpy as np
+
+import reed_reviewer.features as features
+import reed_reviewer.reed_utils as rutils
+from reed_reviewer.constants import DATA_ROOT, CLOCK_PRECISION
+from reed_reviewer.catalog import sync_rows, row_key
+
+MAX_LINES = 100  # more takes than this are drawn as percentile bands (draw time)
+PERCENTILES = (10, 50, 90)  # band low, middle line, band high
+DISPLAY_POINTS = 500  # points per line in the full spectrum panel
+
+
+class SpectrumHistory:
+    """
+    Inputs
+    ------
+        reed_id (int/str) - reed number.
+        data_root (str) - DATA_ROOT - root of the data tree.
+    """
+
+    def __init__(self, reed_id, data_root=DATA_ROOT):
+        self.id = str(reed_id)
+        self.path = os.path.join(data_root, "history", f"reed_{self.id}.npz")
+        self.freq = features.FREQ_GRID
+        self.save_time = np.empty(0, dtype=np.int64)
+        self.keys = np.empty(0, dtype=str)  # catalog.row_key of each take
+        self.spectra = np.empty([0, len(self.freq)], dtype=np.float32)
+        self._load()
+
+    def update(self, recordings):
+        """
+        brings the history in line with the catalog: takes it doesn't have are
+        added, takes no longer in recordings (or rewritten) dropped. Saves if
+        anything changed.
+
+        Inputs
+        ------
+            recordings (list of dict) - every catalog row of the reed, see
+                Catalog.recordings.
+
+        Returns
+        -------
+            n_new (int) - takes added
+        """
+        keep, new_rows = sync_rows(self.keys, recordings)
+        removed = not keep.all()
+        save_times, keys, spectra = [], [], []
+        for row in new_rows:
+            try:
+                feats = features.load_features(row["path"])
+            except Exception as err:  # unreadable recording, leave it out
+                print(f"skipping {row['path']}: {err}")
+                continue
+            save_times.append(row["save_time"])
+            keys.append(row_key(row))
+            spectra.append(feats["spectrum"].mean(axis=1))
+        if not spectra and not removed:
+            return 0
+
+        new_spectra = np.array(spectra, dtype=np.float32).reshape(-1, len(self.freq))
+        save_time = np.append(self.save_time[keep], save_times).astype(np.int64)
+        keys = np.append(self.keys[keep], keys)
+        spectra = np.vstack([self.spectra[keep], new_spectra])
+        order = np.argsort(save_time, kind="stable")  # late arrivals
+        self.save_time = save_time[order]
+        self.keys = keys[order]
+        self.spectra = spectra[order]
+        self._save()
+        return len(save_times)
+
+    def select(self, since=None, until=None):
+        """
+        Returns
+        -------
+            save_time (ndarray) - (takes,) save times within [since, until].
+            spectra (ndarray) - (takes, grid) their spectra.
+        """
+        keep = np.ones(self.save_time.shape[0], dtype=bool)
+        if since is not None:
+            keep &= self.save_time >= since
+        if until is not None:
+            keep &= self.save_time <= until
+        return self.save_time[keep], self.spectra[keep]
+
+    def bands(self, percentiles=PERCENTILES, **view_kwargs):
+        """
+        percentiles of the spectra over takes, per frequency. view_kwargs
+        (max_hz, max_points, since, until) pick and reduce the spectra first,
+        see view.
+
+        Returns
+        -------
+            freq (ndarray) - (points,)
+            bands (ndarray) - (len(percentiles), points), nan if no takes
+        """
+        freq, _, spectra = self.view(**view_kwargs)
+        if spectra.shape[0] == 0:
+            return freq, np.full([len(percentiles), freq.shape[0]], np.nan)
+        return freq, np.percentile(spectra, percentiles, axis=0)
+
+    def view(self, max_hz=None, max_points=None, since=None, until=None):
+        """
+        spectra reduced for drawing: cut at max_hz, then every run of grid
+        points max pooled so at most max_points are left (peaks are kept).
+
+        Returns
+        -------
+            freq (ndarray) - (points,)
+            save_time (ndarray) - (takes,)
+            spectra (ndarray) - (takes, points)
+        """
+        save_time, spectra = self.select(since, until)
+        stop = (
+            len(self.freq)
+            if max_hz is None
+            else np.searchsorted(self.freq, max_hz, "right")
+        )
+        freq, spectra = self.freq[:stop], spectra[:, :stop]
+        if max_points is not None and stop > max_points:
+            pool = -(-stop // max_points)
+            starts = np.arange(0, stop, pool)
+            freq = freq[starts]
+            spectra = np.maximum.reduceat(spectra, starts, axis=1)
+        return freq, save_time, spectra
+
+    def times(self, save_time=None):
+        """
+        save_time as datetime64 (for labels)
+        """
+        save_time = self.save_time if save_time is None else save_time
+        return (save_time * CLOCK_PRECISION * 1e3).astype("datetime64[ms]")
+
+    # ____________________________ Support ____________________________#
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            if "keys" not in data or str(data["feature_hash"]) != features.FEATURE_HASH:
+                return  # made by older code or from older sidecars, start over
+            self.save_time = data["save_time"]
+            self.keys = data["keys"]
+            self.spectra = data["spectra"]
+
+    def _save(self):
+        rutils.check_add_dir(os.path.dirname(self.path))
+        np.savez(
+            self.path,
+            feature_hash=features.FEATURE_HASH,
+            save_time=self.save_time,
+            keys=self.keys,
+            spectra=self.spectra,
+        )
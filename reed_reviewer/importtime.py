@@ -0,0 +1,98 @@
+"""
+Import time report. Runs `python -X importtime -c "import <module>"` in a fresh
+interpreter and sums up where the time goes, so a slow cold start can be traced
+back to the import that causes it.
+
+    python -m reed_reviewer.importtime                       # app + recorder
+    python -m reed_reviewer.importtime reed_reviewer.reviewer --top 30
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+DEFAULT_MODULES = ("src_kivy_app.__main__", "reed_reviewer.recorder")
+
+
+def profile_import(module, env=None):
+    """
+    import times of module and everything it pulls in.
+
+    Inputs
+    ------
+        module (str) - dotted module name.
+        env (dict) - None - environment for the child interpreter, None is ours.
+
+    Returns
+    -------
+        times (list of (str, int, int, int)) - (name, self us, cumulative us,
+            depth) in import order. Empty if the import failed.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        print(f"import {module} failed:\n{result.stderr.splitlines()[-1]}")
+        return []
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return times
+
+
+def report(module, top=15, env=None):
+    """
+    prints the total import time of module, its slowest direct imports and the
+    top slowest modules by their own (self) time
+    """
+    times = profile_import(module, env)
+    if not times:
+        return
+    module_idx = [entry[0] for entry in times].index(module)
+    _, _, total_us, module_depth = times[module_idx]
+    print(f"\nimport {module}: {total_us / 1e3:.0f} ms")
+
+    # children are listed before their parent, one level deeper
+    direct = []
+    for entry in reversed(times[:module_idx]):
+        if entry[3] <= module_depth:
+            break
+        if entry[3] == module_depth + 1:
+            direct.append(entry)
+
+    print("  slowest imports it makes (cumulative):")
+    for name, _, cumulative_us, _ in sorted(direct, key=lambda e: -e[2])[:top]:
+        print(f"    {cumulative_us / 1e3:8.1f} ms  {name}")
+
+    print("  slowest modules (self):")
+    for name, self_us, _, _ in sorted(times, key=lambda e: -e[1])[:top]:
+        print(f"    {self_us / 1e3:8.1f} ms  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m reed_reviewer.importtime",
+        description="Where cold start import time goes.",
+    )
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    # run the children from the repo root so both packages import
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    for module in args.modules:
+        report(module, args.top, env)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Lightweight timing for the recorder pipeline. Named spans, counters and
+histograms, cheap enough to leave on in every session:
+
+    with instrument.span("fft"):
+        ...
+
+    @instrument.timed("plot")
+    def update(...):
+
+    instrument.count("takes")
+
+A span costs two perf_counter_ns calls, a lock and a log10. Durations go into
+fixed log spaced buckets (no samples kept), plus the last EVENT_LOG_SIZE spans
+for a per-span log. Everything for the session is written out with
+save_session (json summary + csv of recent spans), the app does this on exit.
+
+Set REED_REVIEWER_INSTRUMENT=0 to turn it all into no-ops, and
+REED_REVIEWER_VERBOSE=1 to print every span as it finishes (what the old
+progress prints used to say).
+"""
+import os
+import csv
+import json
+import math
+import time
+import threading
+import functools
+from collections import deque
+from reed_reviewer.constants import DATA_ROOT
+
+ENABLED = os.environ.get("REED_REVIEWER_INSTRUMENT", "1") != "0"
+VERBOSE = os.environ.get("REED_REVIEWER_VERBOSE", "0") == "1"
+
+BUCKETS_PER_DECADE = 5
+MIN_EXPONENT = -6  # 1 us, faster spans land in the first bucket
+N_BUCKETS = 9 * BUCKETS_PER_DECADE  # up to 1000 s
+EVENT_LOG_SIZE = 10000
+
+
+class Histogram:
+    """
+    Fixed log spaced buckets of durations (seconds), with count, sum, min, max
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max", "last")
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, value):
+        if value > 0:
+            idx = int((math.log10(value) - MIN_EXPONENT) * BUCKETS_PER_DECADE)
+            idx = min(max(idx, 0), N_BUCKETS - 1)
+        else:
+            idx = 0
+        self.counts[idx] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.last = value
+
+    def percentile(self, q):
+        """
+        approximate percentile (0-100), the geometric middle of the bucket it
+        falls in, clipped to the observed min / max
+        """
+        if self.count == 0:
+            return math.nan
+        rank = q / 100 * self.count
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                middle = 10 ** (MIN_EXPONENT + (idx + 0.5) / BUCKETS_PER_DECADE)
+                return min(max(middle, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return dict(
+            count=self.count,
+            total_s=self.total,
+            mean_s=self.total / self.count if self.count else math.nan,
+            min_s=self.min if self.count else math.nan,
+            max_s=self.max,
+            last_s=self.last,
+            p50_s=self.percentile(50),
+            p95_s=self.percentile(95),
+            buckets=self.counts,
+        )
+
+
+class Instruments:
+    """
+    Spans, counters and histograms of one session. Thread safe, use the shared
+    one from the module functions (span, timed, count, observe).
+    """
+
+    def __init__(self, enabled=ENABLED, verbose=VERBOSE):
+        self.enabled = enabled
+        self.verbose = verbose
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self.events = deque(maxlen=EVENT_LOG_SIZE)  # (name, start, seconds, thread)
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter_ns()
+
+    def span(self, name):
+        """
+        context manager timing the block under name
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name, seconds, start_ns=None):
+        """
+        adds one duration (or any positive value) to name's histogram
+        """
+        if not self.enabled:
+            return
+        start = (start_ns - self._t0) / 1e9 if start_ns is not None else None
+        thread = threading.current_thread().name
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+            self.events.append((name, start, seconds, thread))
+        if self.verbose:
+            print(f"{name}: {seconds * 1e3:.1f} ms")
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """
+        Returns
+        -------
+            summary (dict) - started (epoch s), counters, spans (name ->
+                Histogram.summary)
+        """
+        with self._lock:
+            spans = {name: hist.summary() for name, hist in self.histograms.items()}
+            counters = dict(self.counters)
+        return dict(started=self.started, counters=counters, spans=spans)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.events.clear()
+        self.started = time.time()
+        self._t0 = time.perf_counter_ns()
+
+    # ____________________________ Export ____________________________#
+    def export_json(self, path):
+        with open(path, "w") as out_file:
+            json.dump(self.summary(), out_file, indent=2)
+
+    def export_csv(self, path):
+        """
+        one row per recent span: name, start (s into the session), duration
+        (ms), thread
+        """
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w", newline="") as out_file:
+            writer = csv.writer(out_file)
+            writer.writerow(["name", "start_s", "duration_ms", "thread"])
+            for name, start, seconds, thread in events:
+                start = "" if start is None else f"{start:.6f}"
+                writer.writerow([name, start, f"{seconds * 1e3:.3f}", thread])
+
+    def save_session(self, data_root=DATA_ROOT):
+        """
+        writes DATA_ROOT/instrument/session_<start time>.json and .csv
+
+        Returns
+        -------
+            json_path (str)
+        """
+        log_dir = os.path.join(data_root, "instrument")
+        os.makedirs(log_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.started))
+        base = os.path.join(log_dir, f"session_{stamp}")
+        self.export_json(base + ".json")
+        self.export_csv(base + ".csv")
+        return base + ".json"
+
+    def table(self, names=None):
+        """
+        text table (name, count, last, p50, p95 in ms), for the app overlay
+        """
+        spans = self.summary()["spans"]
+        lines = [f"{'span':16s} {'n':>5s} {'last':>7s} {'p50':>7s} {'p95':>7s}"]
+        for name in names or sorted(spans):
+            if name not in spans:
+                continue
+            stats = spans[name]
+            lines.append(
+                f"{name:16s} {stats['count']:5d} {stats['last_s'] * 1e3:7.1f} "
+                f"{stats['p50_s'] * 1e3:7.1f} {stats['p95_s'] * 1e3:7.1f}"
+            )
+        return "\n".join(lines)
+
+
+class _Span:
+    __slots__ = ("instruments", "name", "start")
+
+    def __init__(self, instruments, name):
+        self.instruments = instruments
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = (time.perf_counter_ns() - self.start) / 1e9
+        self.instruments.observe(self.name, elapsed, self.start)
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+_shared = Instruments()
+
+
+def shared_instruments():
+    return _shared
+
+
+def span(name):
+    return _shared.span(name)
+
+
+def count(name, n=1):
+    _shared.count(name, n)
+
+
+def observe(name, seconds):
+    _shared.observe(name, seconds)
+
+
+def timed(name):
+    """
+    decorator, times every call of the function as span name
+    """
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _shared.span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
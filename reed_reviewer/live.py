@@ -0,0 +1,130 @@
+"""
+Live analysis for the rolling spectrogram and level meter. An input stream
+callback only copies blocks into a ring buffer; the UI pulls finished STFT
+columns at its own frame rate. If the UI falls behind, the backlog is dropped
+(only the newest columns are computed) so the audio callback never waits.
+"""
+import numpy as np
+from scipy import fft as sp_fft
+
+from reed_reviewer.stream import RingBuffer
+from reed_reviewer.spectrum import get_window
+import reed_reviewer.audio as audio
+
+DB_FLOOR = -100.0  # dB shown as the bottom of the colour scale / meter
+
+
+class LiveSpectrogram:
+    """
+    Inputs
+    ------
+        Fs (int) - 44100 - sampling rate.
+        nfft (int) - 2048 - STFT frame length.
+        hop (int) - 512 - samples between columns.
+        max_freq (float) - 5000 - highest frequency kept in a column.
+        buffer_sec (float) - 2 - audio held for the UI to catch up on.
+        source (audio.AudioSource) - None - input, None is audio.default_source.
+    """
+
+    def __init__(
+        self, Fs=44100, nfft=2048, hop=512, max_freq=5000, buffer_sec=2, source=None
+    ):
+        self.Fs = Fs
+        self.source = source
+        self.nfft = nfft
+        self.hop = hop
+        self.window = get_window("hann", nfft).astype(np.float32)
+        self.freq_axis = sp_fft.rfftfreq(nfft, 1 / Fs)
+        self.n_bins = int(np.searchsorted(self.freq_axis, max_freq))
+        # window sum scales a full scale sine to 0 dB
+        self.scale = np.float32(2 / self.window.sum())
+        self.buffer_sec = buffer_sec
+
+        self.ring = None
+        self.read_pos = 0  # absolute sample index of the next column's start
+        self.dropped_columns = 0
+        self._stream = None
+
+    # ____________________________ Stream ____________________________#
+    def start(self):
+        """
+        opens the input stream (stereo, falls back to mono on a device)
+        """
+        if self._stream is not None:
+            return
+        if self.source is None:
+            self.source = audio.default_source(self.Fs)
+        self._stream = self.source.open_stream(self.callback)
+        self.reset(self._stream.channels)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is None:
+            return
+        self._stream.stop()
+        self._stream.close()
+        self._stream = None
+
+    def reset(self, channels):
+        self.ring = RingBuffer(int(self.buffer_sec * self.Fs), channels)
+        self.read_pos = 0
+        self.dropped_columns = 0
+
+    def callback(self, indata, frames, time_info, status):
+        """
+        audio thread, copy and return. No locks, no allocation.
+        """
+        self.ring.write(indata)
+
+    # ____________________________ UI side ____________________________#
+    def pull(self, max_columns=8):
+        """
+        STFT columns that are ready since the last pull.
+
+        Inputs
+        ------
+            max_columns (int) - 8 - most columns returned. Older ready columns
+                are skipped (and counted in dropped_columns) so rendering keeps
+                up with the audio instead of lagging further behind.
+
+        Returns
+        -------
+            columns (ndarray) - (n_columns, n_bins) float32 dB, channels averaged.
+                n_columns may be 0.
+        """
+        if self.ring is None:
+            return np.empty([0, self.n_bins], dtype=np.float32)
+
+        newest = self.ring.total
+        # the ring may have wrapped past the read position
+        self.read_pos = max(self.read_pos, self.ring.oldest())
+        ready = max(0, (newest - self.read_pos - self.nfft) // self.hop + 1)
+        if ready > max_columns:
+            self.dropped_columns += ready - max_columns
+            self.read_pos += (ready - max_columns) * self.hop
+            ready = max_columns
+        if ready == 0:
+            return np.empty([0, self.n_bins], dtype=np.float32)
+
+        stop = self.read_pos + (ready - 1) * self.hop + self.nfft
+        block = self.ring.read(self.read_pos, stop).mean(axis=1)
+        self.read_pos += ready * self.hop
+
+        frames = np.lib.stride_tricks.sliding_window_view(block, self.nfft)[:: self.hop]
+        mag = np.abs(sp_fft.rfft(frames * self.window, axis=-1)[:, : self.n_bins])
+        return 20 * np.log10(np.maximum(mag * self.scale, 10 ** (DB_FLOOR / 20)))
+
+    def level(self, window_sec=0.05):
+        """
+        per-channel rms and peak of the newest window_sec of audio, in dBFS
+        """
+        if self.ring is None or self.ring.total == 0:
+            return np.full(1, DB_FLOOR), np.full(1, DB_FLOOR)
+        newest = self.ring.total
+        block = self.ring.read(newest - int(window_sec * self.Fs), newest)
+        floor = 10 ** (DB_FLOOR / 20)
+        rms = np.sqrt(np.mean(np.square(block), axis=0))
+        peak = np.abs(block).max(axis=0)
+        return 20 * np.log10(np.maximum(rms, floor)), 20 * np.log10(
+            np.maximum(peak, floor)
+        )
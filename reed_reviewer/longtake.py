@@ -0,0 +1,306 @@
+"""
+Long takes: whole practice sessions recorded straight to disk. Nothing ever
+holds the take in memory. The audio callback copies blocks onto a queue, a
+thread appends them to the .rrec in fixed size chunks (each one flushed and
+fsynced) and analyzes them as they go by:
+
+    ChunkWriter    .rrec written chunk by chunk. The header goes out first with
+                   n_samples unset and room to spare, and is rewritten in place
+                   with the final fingerprint when the take ends. If the app
+                   dies mid-take the file still loads (storage.read_header works
+                   out n_samples from the file size), up to the last chunk.
+    ChunkAnalyzer  rms, power and a Welch averaged spectrum (plus pitch) from
+                   the chunks, written as the take's feature sidecar, so the
+                   take never has to be loaded to be reviewed.
+    LongTake       one take: stream -> queue -> writer thread.
+
+See ReedRecorder.start_long_take / stop_long_take.
+"""
+import os
+import queue
+import warnings
+import threading
+import numpy as np
+import reed_reviewer.storage as storage
+import reed_reviewer.features as features
+import reed_reviewer.pitch as pitch
+import reed_reviewer.instrument as instrument
+from reed_reviewer.spectrum import get_window, spectrum
+from scipy import fft as sp_fft
+
+CHUNK_SEC = 1
+HEADER_CAPACITY = 2048  # bytes reserved so the final header fits in place
+NPERSEG = 8192  # Welch segment of the averaged spectrum, ~5 Hz bins at 44.1 kHz
+WINDOW = "hann"
+MAX_BACKLOG = 4096  # blocks waiting for the writer thread
+
+
+class ChunkWriter:
+    """
+    Inputs
+    ------
+        rec_path (str) - .rrec file to write.
+        fingerprint (dict) - header fingerprint to start with, see
+            ReedRecorder._fingerprint.
+        channels (int) - channels per block.
+        Fs (int) - sampling rate.
+        dtype (str) - "float32" - sample type on disk, see storage.DTYPES.
+        chunk_sec (float) - CHUNK_SEC - audio held before it is written. At
+            most this much is lost if the app dies.
+    """
+
+    def __init__(
+        self, rec_path, fingerprint, channels, Fs, dtype="float32", chunk_sec=CHUNK_SEC
+    ):
+        self.rec_path = rec_path
+        self.fingerprint = fingerprint
+        self.dtype = dtype
+        self.channels = channels
+        self.n_samples = 0  # on disk
+        self.buffer = np.empty([max(1, int(chunk_sec * Fs)), channels], np.float32)
+        self.fill = 0
+
+        header = storage.encode_header(
+            fingerprint, dtype, channels, None, min_capacity=HEADER_CAPACITY
+        )
+        self.header_size = len(header)
+        self.file = open(rec_path, "wb")
+        self.file.write(header)
+
+    def write(self, block):
+        """
+        adds a (frames, channels) block, full chunks go to disk
+        """
+        while block.shape[0] > 0:
+            n_frames = min(block.shape[0], self.buffer.shape[0] - self.fill)
+            self.buffer[self.fill : self.fill + n_frames] = block[:n_frames]
+            self.fill += n_frames
+            block = block[n_frames:]
+            if self.fill == self.buffer.shape[0]:
+                self._write_chunk()
+
+    def close(self, fingerprint=None):
+        """
+        writes what is left and finalizes the header (n_samples and, if given,
+        a new fingerprint)
+
+        Returns
+        -------
+            shape (tuple) - (samples, channels) of the take
+        """
+        self._write_chunk()
+        fingerprint = self.fingerprint if fingerprint is None else fingerprint
+        capacity = self.header_size - storage.PREAMBLE.size
+        header = storage.encode_header(
+            fingerprint, self.dtype, self.channels, self.n_samples, capacity
+        )
+        if len(header) != self.header_size:
+            raise ValueError(f"final header of {self.rec_path} outgrew its space")
+        self.file.seek(0)
+        self.file.write(header)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        return self.n_samples, self.channels
+
+    def _write_chunk(self):
+        if self.fill == 0:
+            return
+        with instrument.span("long_take_chunk"):
+            self.file.write(storage.to_dtype(self.buffer[: self.fill], self.dtype))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.n_samples += self.fill
+        self.fill = 0
+
+
+class ChunkAnalyzer:
+    """
+    features.compute_features, incrementally. Memory doesn't grow with the
+    take: rms and power are running sums, the spectrum is a running mean of
+    Welch segments (NPERSEG, half overlapped, WINDOW) and pitch keeps one
+    summary per pushed chunk.
+
+    Differences from compute_features on the whole take: the spectrum is
+    segment averaged instead of one fft of everything, power is the mean
+    square (no Simpson integration), and f0 / harmonics are medians of the
+    per-chunk medians.
+
+    Inputs
+    ------
+        Fs (int) - sampling rate.
+        channels (int) - channels per block.
+        ref_power (float) - None - baseline power for dB.
+        nperseg (int) - NPERSEG - Welch segment length.
+    """
+
+    def __init__(self, Fs, channels, ref_power=None, nperseg=NPERSEG):
+        self.Fs = Fs
+        self.channels = channels
+        self.ref_power = np.nan if ref_power is None else float(ref_power)
+        self.nperseg = nperseg
+        self.step = nperseg // 2
+        self.win = get_window(WINDOW, nperseg).astype(np.float32)
+        self.n_samples = 0
+        self.sum_squares = np.zeros(channels)
+        self.mag_sum = np.zeros([nperseg // 2 + 1, channels])
+        self.n_segments = 0
+        self.tail = np.empty([0, channels], dtype=np.float32)
+        self.tracker = pitch.PitchTracker(Fs, channels)
+        self.f0_chunks = []
+        self.harmonic_chunks = []
+
+    def push(self, chunk):
+        """
+        adds a (frames, channels) chunk
+        """
+        chunk = np.asarray(chunk, dtype=np.float32)
+        self.n_samples += chunk.shape[0]
+        self.sum_squares += np.square(chunk, dtype=np.float64).sum(axis=0)
+
+        self.tail = np.concatenate([self.tail, chunk])
+        n_segments = max(0, (self.tail.shape[0] - self.nperseg) // self.step + 1)
+        if n_segments:
+            segments = np.lib.stride_tricks.sliding_window_view(
+                self.tail, self.nperseg, axis=0
+            )[:: self.step][:n_segments]
+            fft_data = sp_fft.rfft(segments * self.win, axis=-1, workers=-1)
+            self.mag_sum += np.abs(fft_data).sum(axis=0).T
+            self.n_segments += n_segments
+            self.tail = self.tail[n_segments * self.step :].copy()
+
+        chunk_pitch = self.tracker.push(chunk)
+        if chunk_pitch["f0"].shape[0]:
+            f0, harmonics = pitch.summarize(chunk_pitch)
+            self.f0_chunks.append(f0)
+            self.harmonic_chunks.append(harmonics)
+
+    def result(self):
+        """
+        Returns
+        -------
+            features (dict) - same keys as features.compute_features
+        """
+        power = self.sum_squares / max(self.n_samples, 1)
+        if self.n_segments:
+            freq_axis = sp_fft.rfftfreq(self.nperseg, 1 / self.Fs)
+            freq_mag = self.mag_sum / self.n_segments * (self.Fs / self.win.sum())
+        elif self.tail.shape[0] > 1:  # shorter than one segment, use what there is
+            freq_axis, freq_mag = spectrum(self.tail, self.Fs, window=WINDOW)
+        else:
+            freq_axis = np.array([0.0, self.Fs / 2])
+            freq_mag = np.zeros([2, self.channels])
+        if self.f0_chunks:
+            with warnings.catch_warnings():  # channels that were never voiced
+                warnings.simplefilter("ignore", RuntimeWarning)
+                f0 = np.nanmedian(np.array(self.f0_chunks), axis=0)
+                harmonics = np.nanmedian(np.array(self.harmonic_chunks), axis=0)
+        else:
+            f0 = np.full(self.channels, np.nan)
+            harmonics = np.full([pitch.N_HARMONICS, self.channels], np.nan)
+        return dict(
+            freq=features.FREQ_GRID,
+            spectrum=features.to_grid(freq_axis, freq_mag.astype(np.float32)),
+            rms=np.sqrt(power),
+            power=power,
+            db=10 * np.log10(power / self.ref_power),
+            ref_power=self.ref_power,
+            f0=f0,
+            harmonics=harmonics.astype(np.float32),
+        )
+
+
+class LongTake:
+    """
+    One long take from a source's stream to rec_path. start returns right
+    away; stop ends the take, finalizes the file and writes its sidecar.
+
+    Inputs
+    ------
+        source (audio.AudioSource) - where the audio comes from.
+        rec_path (str) - .rrec file of the take.
+        fingerprint (dict) - see ReedRecorder._fingerprint.
+        dtype (str) - "float32" - sample type on disk.
+        chunk_sec (float) - CHUNK_SEC - see ChunkWriter.
+        ref_power (float) - None - baseline power for the sidecar's dB.
+    """
+
+    def __init__(
+        self,
+        source,
+        rec_path,
+        fingerprint,
+        dtype="float32",
+        chunk_sec=CHUNK_SEC,
+        ref_power=None,
+    ):
+        self.source = source
+        self.rec_path = rec_path
+        self.fingerprint = fingerprint
+        self.dtype = dtype
+        self.chunk_sec = chunk_sec
+        self.ref_power = ref_power
+        self.shape = None  # (samples, channels), set by stop
+        self.dropped_blocks = 0
+        self._queue = queue.Queue(maxsize=MAX_BACKLOG)
+        self._stream = None
+        self._thread = None
+        self._features = None
+
+    def start(self):
+        self._stream = self.source.open_stream(self._callback)
+        self._writer = ChunkWriter(
+            self.rec_path,
+            self.fingerprint,
+            self._stream.channels,
+            self.source.Fs,
+            self.dtype,
+            self.chunk_sec,
+        )
+        self._analyzer = ChunkAnalyzer(
+            self.source.Fs, self._stream.channels, self.ref_power
+        )
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+        self._stream.start()
+
+    def stop(self):
+        """
+        Returns
+        -------
+            features (dict) - the take's features, also written as its sidecar
+        """
+        self._stream.stop()
+        self._stream.close()
+        self._queue.put(None)  # tells the writer thread to finish
+        self._thread.join()
+        return self._features
+
+    def _callback(self, indata, frames, time_info, status):
+        # audio thread: copy (the stream reuses indata) and hand off, never block
+        try:
+            self._queue.put_nowait(indata.copy())
+        except queue.Full:
+            self.dropped_blocks += 1
+            instrument.count("long_take_dropped_blocks")
+
+    def _work(self):
+        chunk_len = self._writer.buffer.shape[0]
+        pending = []  # blocks not yet analyzed, analysis goes chunk by chunk
+        n_pending = 0
+        while True:
+            block = self._queue.get()
+            if block is None:
+                break
+            self._writer.write(block)
+            pending.append(block)
+            n_pending += block.shape[0]
+            if n_pending >= chunk_len:
+                self._analyzer.push(np.concatenate(pending))
+                pending, n_pending = [], 0
+        if pending:
+            self._analyzer.push(np.concatenate(pending))
+
+        self.shape = self._writer.close()
+        self._features = self._analyzer.result()
+        features.write_sidecar(self.rec_path, self._features, self.source.Fs)
@@ -0,0 +1,175 @@
+"""
+Running room noise floor. Instead of one baseline recording setting the
+threshold for a whole session, the floor is re-estimated all the time from the
+quiet stretches of whatever is being recorded.
+
+Audio is cut into short frames and each channel's frame rms goes into a history
+of the last history_sec of quiet frames. A frame counts as quiet when it is
+under quiet_ratio times the current floor (and the caller isn't inside a take).
+That is well under the trigger threshold (sensitivity_rms times the floor), so
+soft playing that doesn't trigger a take still isn't taken for room noise and
+can't pull the threshold up after it. The floor is a percentile of that
+history per channel, so a door slam or a stray note barely moves it, while a
+slow drift in room noise is followed. A sudden jump of more than quiet_ratio
+(moving to a louder room) is not followed, set_thresh / seed start over.
+
+update runs on the audio thread while seed and reset come from others
+(set_thresh on a task lane), so every change to the estimate happens under one
+lock and estimate reads it as a consistent pair.
+
+    thresh     floor rms * sensitivity_rms, per channel, drives the trigger
+    ref_power  mean power of channel 0 over the quiet audio, what get_db and
+               the sidecars' db compare against. Unlike thresh it is fixed by
+               the first estimate of a session (or the baseline it was seeded
+               from) and only reset / seed change it, so dB values of a
+               session's takes stay comparable.
+"""
+import threading
+import numpy as np
+
+from reed_reviewer.segment import frame_rms
+
+FRAME_SEC = 0.05
+HISTORY_SEC = 30
+PERCENTILE = 20  # low, so notes in the very first second barely count
+MIN_QUIET_SEC = 1  # quiet audio needed before there is an estimate
+UPDATE_SEC = 0.5  # the percentile is recomputed at most this often
+QUIET_RATIO = 3  # frames under this times the floor are room noise (~10 dB)
+
+
+class NoiseFloor:
+    """
+    Inputs
+    ------
+        Fs (int) - sampling rate.
+        sensitivity_rms (float) - 10 - threshold is the floor rms times this,
+            same as ReedRecorder.sensitivity_rms.
+        percentile (float) - PERCENTILE - percentile of the quiet frame rms
+            taken as the floor.
+        history_sec (float) - HISTORY_SEC - how far back quiet audio counts.
+        frame_sec (float) - FRAME_SEC - rms frame length.
+        quiet_ratio (float) - QUIET_RATIO - frames under this times the floor
+            count as room noise.
+    """
+
+    def __init__(
+        self,
+        Fs,
+        sensitivity_rms=10,
+        percentile=PERCENTILE,
+        history_sec=HISTORY_SEC,
+        frame_sec=FRAME_SEC,
+        quiet_ratio=QUIET_RATIO,
+    ):
+        self.Fs = Fs
+        self.sensitivity_rms = sensitivity_rms
+        self.percentile = percentile
+        self.quiet_ratio = quiet_ratio
+        self.frame_len = max(1, int(frame_sec * Fs))
+        self.capacity = max(1, int(history_sec / frame_sec))
+        self.min_frames = max(1, int(MIN_QUIET_SEC / frame_sec))
+        self.update_frames = max(1, int(UPDATE_SEC / frame_sec))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        forgets all history, e.g. after moving to another room
+        """
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.history = None  # (capacity, channels) quiet frame rms, made on first use
+        self.n_frames = 0  # quiet frames ever added
+        self.since_estimate = 0
+        self.floor = None  # (channels,) floor rms
+        self.thresh = None  # (channels,) trigger threshold
+        self.ref_power = None
+        self._pending = None  # samples short of a whole frame, kept for next time
+
+    @property
+    def ready(self):
+        return self.floor is not None
+
+    def estimate(self):
+        """
+        (thresh, ref_power) of the current estimate, None until there is one
+        """
+        with self._lock:
+            if self.floor is None:
+                return None
+            return self.thresh, self.ref_power
+
+    def update(self, block, in_take=False, quiet_only=True):
+        """
+        adds a (samples, channels) block. Cheap enough for an audio callback:
+        a framewise rms and, every UPDATE_SEC, one percentile over the history.
+
+        Inputs
+        ------
+            block (ndarray) - new audio.
+            in_take (bool) - False - caller is recording a take right now, the
+                block is not room noise and is skipped.
+            quiet_only (bool) - True - only frames under quiet_ratio times the
+                current floor count. False takes every frame (a known quiet
+                baseline).
+
+        Returns
+        -------
+            changed (bool) - True if the estimate was updated
+        """
+        with self._lock:
+            return self._update(block, in_take, quiet_only)
+
+    def seed(self, raw_data):
+        """
+        starts over from a known quiet recording (a baseline), every frame counts
+        """
+        with self._lock:
+            self._reset()
+            self._update(raw_data, quiet_only=False)
+            if self.floor is None and self.n_frames > 0:  # short baseline
+                self._estimate()
+
+    # ____________________________ Support ____________________________#
+    def _update(self, block, in_take=False, quiet_only=True):
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        if self._pending is not None and self._pending.shape[1] == block.shape[1]:
+            block = np.concatenate([self._pending, block])
+        n_whole = block.shape[0] // self.frame_len * self.frame_len
+        self._pending = block[n_whole:].copy()
+        if in_take or n_whole == 0:
+            return False
+
+        rms = frame_rms(block[:n_whole], self.frame_len)
+        if quiet_only and self.floor is not None:
+            rms = rms[(rms < self.floor * self.quiet_ratio).all(axis=1)]
+        if rms.shape[0] == 0:
+            return False
+        self._add(rms)
+
+        self.since_estimate += rms.shape[0]
+        due = self.since_estimate >= self.update_frames or not quiet_only
+        if self.n_frames >= self.min_frames and due:
+            self._estimate()
+            return True
+        return False
+
+    def _add(self, rms):
+        if self.history is None or self.history.shape[1] != rms.shape[1]:
+            self.history = np.empty([self.capacity, rms.shape[1]])
+            self.n_frames = 0
+        rms = rms[-self.capacity :]
+        idx = (self.n_frames + np.arange(rms.shape[0])) % self.capacity
+        self.history[idx] = rms
+        self.n_frames += rms.shape[0]
+
+    def _estimate(self):
+        held = self.history[: min(self.n_frames, self.capacity)]
+        self.floor = np.percentile(held, self.percentile, axis=0)
+        self.thresh = self.floor * self.sensitivity_rms
+        if self.ref_power is None:  # mean power, same as a baseline recording's
+            self.ref_power = float(np.mean(np.square(held[:, 0])))
+        self.since_estimate = 0
@@ -0,0 +1,406 @@
+"""
+Per-reed pack. Thousands of small take files make directory listings, opens and
+backups slow, so a reed's takes can be packed into one append-only container,
+reed_<id>/takes.rpack:
+
+    bytes 0-63     preamble: b"RPCK", version (uint16), padding
+    ...            samples of every take, back to back (each 64 aligned), in
+                   the take's on-disk dtype, (samples, channels) order
+    index          JSON: one entry per take, name -> data_offset, dtype,
+                   n_channels, n_samples, scale, fingerprint, size, mtime
+    last 24 bytes  trailer: index offset (uint64), index length (uint64),
+                   b"RPCKIDX1"
+
+Packing more takes appends their samples plus a new index after the old one,
+nothing already in the file is rewritten, so readers holding a memory map of it
+stay valid. The old index is left behind as dead bytes (rewrite drops them).
+
+An append that never finished (crash, full disk) leaves no trailer at the end
+of the file; read_index then scans back to the last complete index, so only
+the takes of that append are missing, and those are still loose.
+
+A packed take keeps its path, reed_<id>/<save_time>.rrec, only the file is
+gone. reed_utils.load_rec, list_recordings and rec_stat look in the pack when
+the loose file isn't there, so the catalog, feature sidecars and everything
+reading recordings don't change. size and mtime are the loose file's, so
+sidecars written before packing stay fresh.
+
+    python -m reed_reviewer.pack compact            # every reed
+    python -m reed_reviewer.pack compact --reed 12 --rewrite
+    python -m reed_reviewer.pack list ~/.reed_reviewer_data/reed_12
+"""
+import os
+import json
+import time
+import struct
+import argparse
+import threading
+import numpy as np
+import reed_reviewer.storage as storage
+from reed_reviewer.constants import DATA_ROOT
+
+PACK_NAME = "takes.rpack"
+MAGIC = b"RPCK"
+VERSION = 1
+PREAMBLE = struct.Struct("<4sH")
+DATA_START = 64
+TRAILER = struct.Struct("<QQ8s")
+TRAILER_MAGIC = b"RPCKIDX1"
+ALIGN = 64
+MIN_AGE_SEC = 10  # newer loose files may still be being written
+
+_open_packs = {}  # pack path -> Pack, reloaded when the file changes
+_open_lock = threading.Lock()
+
+
+class Pack:
+    """
+    read side of a pack, the index is read once and takes are loaded (or
+    memory mapped) straight from the sample region.
+
+    Inputs
+    ------
+        path (str) - path of the .rpack file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        stat = os.stat(path)
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+        self.entries = read_index(path)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def names(self):
+        return sorted(self.entries)
+
+    def load(self, name, mmap_mode=None, offset=0, length=None):
+        """
+        one take, see storage.load_rec for the arguments
+
+        Returns
+        -------
+            recording (ndarray) - (samples, channels)
+            fingerprint (dict)
+        """
+        entry = self.entries[name]
+        recording = storage._load_window(self.path, entry, mmap_mode, offset, length)
+        return recording, entry["fingerprint"]
+
+    def iter_takes(self, names=None):
+        """
+        yields (name, recording, fingerprint) for names (default every take) in
+        file order, reading the sample region in one sequential pass
+        """
+        names = self.names() if names is None else names
+        entries = sorted(
+            (self.entries[name] for name in names), key=lambda e: e["data_offset"]
+        )
+        if not entries:
+            return
+        region = np.memmap(self.path, dtype=np.uint8, mode="r")
+        for entry in entries:
+            dtype = np.dtype(entry["dtype"])
+            n_bytes = entry["n_samples"] * entry["n_channels"] * dtype.itemsize
+            start = entry["data_offset"]
+            data = np.frombuffer(region[start : start + n_bytes], dtype=dtype)
+            data = data.reshape(entry["n_samples"], entry["n_channels"])
+            if dtype == np.int16:
+                data = data.astype(np.float32) * np.float32(entry["scale"])
+            else:
+                data = data.copy()  # don't hand out views of the map
+            yield entry["name"], data, entry["fingerprint"]
+
+
+def pack_path(reed_dir):
+    return os.path.join(reed_dir, PACK_NAME)
+
+
+def open_pack(reed_dir):
+    """
+    the Pack of reed_dir, or None if it has none. Packs are kept open and only
+    re-read when the file changes.
+    """
+    path = pack_path(reed_dir)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    with _open_lock:
+        pack = _open_packs.get(path)
+        if pack is None or pack.stamp != (stat.st_mtime_ns, stat.st_size):
+            pack = _open_packs[path] = Pack(path)
+    return pack
+
+
+def read_index(path):
+    """
+    name -> entry of every take in a pack, entries hold what
+    storage._load_window needs plus fingerprint, size and mtime. If the last
+    append never finished (no trailer at the end), the index before it is
+    used, see _last_index.
+    """
+    with open(path, "rb") as pack_file:
+        magic, version = PREAMBLE.unpack(pack_file.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a reed pack")
+        if version > VERSION:
+            raise ValueError(f"{path} is a newer pack version ({version})")
+        end = pack_file.seek(0, os.SEEK_END)
+        entries = _index_at(pack_file, end)
+        if entries is None:
+            entries = _last_index(pack_file, end)
+        if entries is None:
+            raise ValueError(f"{path} has no index (interrupted pack?)")
+    return {entry["name"]: entry for entry in entries}
+
+
+def _index_at(pack_file, end):
+    """
+    index entries of the trailer ending at end, None if there isn't a valid one
+    """
+    if end < DATA_START + TRAILER.size:
+        return None
+    pack_file.seek(end - TRAILER.size)
+    index_offset, index_len, trailer_magic = TRAILER.unpack(
+        pack_file.read(TRAILER.size)
+    )
+    if trailer_magic != TRAILER_MAGIC:
+        return None
+    if index_offset < DATA_START or index_offset + index_len != end - TRAILER.size:
+        return None
+    pack_file.seek(index_offset)
+    try:
+        return json.loads(pack_file.read(index_len))
+    except ValueError:
+        return None
+
+
+def _last_index(pack_file, end):
+    """
+    scans back from end for the last complete index, what an interrupted append
+    left behind
+    """
+    import mmap
+
+    with mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ) as region:
+        stop = end
+        while True:
+            found = region.rfind(TRAILER_MAGIC, DATA_START, stop)
+            if found < 0:
+                return None
+            entries = _index_at(pack_file, found + len(TRAILER_MAGIC))
+            if entries is not None:
+                return entries
+            stop = found + len(TRAILER_MAGIC) - 1
+
+
+# ____________________________ Packing ____________________________#
+def loose_takes(reed_dir, min_age_sec=MIN_AGE_SEC):
+    """
+    names of loose recordings in reed_dir old enough to pack
+    """
+    newest = time.time() - min_age_sec
+    return sorted(
+        file_name
+        for file_name in os.listdir(reed_dir)
+        if file_name.endswith(storage.EXTENSION) or file_name.endswith(".npz")
+        if os.stat(os.path.join(reed_dir, file_name)).st_mtime <= newest
+    )
+
+
+def _take_bytes(rec_path):
+    """
+    a loose take's samples as stored on disk, plus its entry (no data_offset)
+    """
+    stat = os.stat(rec_path)
+    if rec_path.endswith(storage.EXTENSION):
+        header = storage.read_header(rec_path)
+        dtype = np.dtype(header["dtype"])
+        n_bytes = header["n_samples"] * header["n_channels"] * dtype.itemsize
+        with open(rec_path, "rb") as rec_file:
+            rec_file.seek(header["data_offset"])
+            data = rec_file.read(n_bytes)
+        entry = {key: header[key] for key in ("dtype", "n_channels", "n_samples")}
+        entry.update(scale=header["scale"], fingerprint=header["fingerprint"])
+    else:  # legacy npz, stored as float32
+        with np.load(rec_path, allow_pickle=True) as npz:
+            raw_data = npz["recording"]
+            fingerprint = npz["fingerprint"].tolist()
+        if raw_data.ndim == 1:
+            raw_data = raw_data[:, np.newaxis]
+        data = storage.to_dtype(raw_data, "float32").tobytes()
+        entry = dict(
+            dtype=np.dtype("<f4").str,
+            n_channels=raw_data.shape[1],
+            n_samples=raw_data.shape[0],
+            scale=1.0,
+            fingerprint=fingerprint,
+        )
+    entry.update(
+        name=os.path.basename(rec_path), size=stat.st_size, mtime=stat.st_mtime
+    )
+    return data, entry
+
+
+def append(reed_dir, names):
+    """
+    appends loose takes to reed_dir's pack (made if needed) and writes the new
+    index. A take already in the pack is replaced by the loose one. The loose
+    files are left alone, see compact.
+
+    If anything fails part way (disk full, unreadable take) the pack is cut
+    back to its old size, or removed if it was new. If the process dies
+    instead, read_index still finds the old index and the next append writes
+    past the leftovers.
+
+    Returns
+    -------
+        entries (dict) - the pack's new index
+    """
+    path = pack_path(reed_dir)
+    exists = os.path.exists(path)
+    entries = read_index(path) if exists else {}
+    with open(path, "r+b" if exists else "wb") as pack_file:
+        old_size = pack_file.seek(0, os.SEEK_END)
+        try:
+            if not exists:
+                pack_file.write(PREAMBLE.pack(MAGIC, VERSION).ljust(DATA_START, b"\0"))
+            for name in names:
+                data, entry = _take_bytes(os.path.join(reed_dir, name))
+                _pad(pack_file)
+                entry["data_offset"] = pack_file.tell()
+                pack_file.write(data)
+                entries[name] = entry
+            _write_index(pack_file, entries)
+        except BaseException:
+            if exists:
+                pack_file.truncate(old_size)
+            else:
+                os.remove(path)
+            raise
+    return entries
+
+
+def rewrite(reed_dir):
+    """
+    copies the live takes into a fresh pack, dropping old indexes and replaced
+    takes. Open readers keep the old file until they reload.
+
+    Returns
+    -------
+        freed (int) - bytes saved
+    """
+    path = pack_path(reed_dir)
+    pack = Pack(path)
+    tmp_path = path + ".tmp"
+    entries = {}
+    with open(path, "rb") as old_file, open(tmp_path, "wb") as pack_file:
+        pack_file.write(PREAMBLE.pack(MAGIC, VERSION).ljust(DATA_START, b"\0"))
+        for entry in sorted(pack.entries.values(), key=lambda e: e["data_offset"]):
+            n_bytes = entry["n_samples"] * entry["n_channels"]
+            n_bytes *= np.dtype(entry["dtype"]).itemsize
+            old_file.seek(entry["data_offset"])
+            _pad(pack_file)
+            entry = dict(entry, data_offset=pack_file.tell())
+            pack_file.write(old_file.read(n_bytes))
+            entries[entry["name"]] = entry
+        _write_index(pack_file, entries)
+    freed = os.path.getsize(path) - os.path.getsize(tmp_path)
+    os.replace(tmp_path, path)
+    return freed
+
+
+def compact(reed_dir, rewrite_pack=False, min_age_sec=MIN_AGE_SEC):
+    """
+    packs reed_dir's loose takes. They are only deleted once the pack holding
+    them is on disk and reads back.
+
+    Inputs
+    ------
+        reed_dir (str) - a reed_<id> directory.
+        rewrite_pack (bool) - False - also drop the pack's dead bytes.
+        min_age_sec (float) - MIN_AGE_SEC - skip takes newer than this, the
+            recorder may still be writing them.
+
+    Returns
+    -------
+        n_packed (int) - loose takes moved into the pack
+    """
+    names = loose_takes(reed_dir, min_age_sec)
+    if names:
+        append(reed_dir, names)
+        packed = read_index(pack_path(reed_dir))
+        for name in names:
+            if name in packed:
+                os.remove(os.path.join(reed_dir, name))
+    if rewrite_pack and os.path.exists(pack_path(reed_dir)):
+        rewrite(reed_dir)
+    return len(names)
+
+
+def _pad(pack_file):
+    pack_file.write(b"\0" * (-pack_file.tell() % ALIGN))
+
+
+def _write_index(pack_file, entries):
+    index_offset = pack_file.tell()
+    index = json.dumps(list(entries.values()), default=storage._jsonable).encode()
+    pack_file.write(index)
+    pack_file.write(TRAILER.pack(index_offset, len(index), TRAILER_MAGIC))
+    pack_file.flush()
+    os.fsync(pack_file.fileno())
+
+
+def reed_dirs(data_root=DATA_ROOT, reed_id=None):
+    if reed_id is not None:
+        return [os.path.join(data_root, f"reed_{reed_id}")]
+    return [
+        os.path.join(data_root, sub_dir)
+        for sub_dir in sorted(os.listdir(data_root))
+        if sub_dir.startswith("reed_")
+        and os.path.isdir(os.path.join(data_root, sub_dir))
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m reed_reviewer.pack",
+        description="pack a reed's takes into one indexed file",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    comp = sub.add_parser("compact", help="move loose takes into the reed's pack")
+    comp.add_argument("--root", default=DATA_ROOT, help="data tree root")
+    comp.add_argument("--reed", default=None, help="only this reed id")
+    comp.add_argument(
+        "--rewrite", action="store_true", help="also drop replaced takes / old indexes"
+    )
+    lst = sub.add_parser("list", help="takes in a reed dir's pack")
+    lst.add_argument("reed_dir")
+    args = parser.parse_args(argv)
+
+    if args.command == "compact":
+        for reed_dir in reed_dirs(args.root, args.reed):
+            count = compact(reed_dir, rewrite_pack=args.rewrite)
+            pack = open_pack(reed_dir)
+            total = 0 if pack is None else len(pack)
+            print(f"{os.path.basename(reed_dir)}: packed {count}, {total} in pack")
+    else:
+        pack = open_pack(args.reed_dir)
+        for name in [] if pack is None else pack.names():
+            entry = pack.entries[name]
+            print(
+                name,
+                entry["n_samples"],
+                entry["n_channels"],
+                entry["dtype"],
+                entry["data_offset"],
+            )
+
+
+if __name__ == "__main__":
+    main()
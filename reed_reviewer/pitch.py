@@ -0,0 +1,363 @@
+"""
+Pitch and harmonic balance. YIN fundamental frequency estimates plus the
+amplitudes of the first N_HARMONICS harmonics, per frame and channel.
+
+Everything works on a flat stack of frames, so one recording, a batch of
+recordings and a stream of blocks all go through the same couple of FFTs:
+
+    analyze           one recording, (frames, channels) f0 and harmonics
+    analyze_batch     many recordings at once, frames of all of them stacked
+    PitchTracker      incremental, push blocks as they come in
+
+The frame length is picked from F0_MIN so the lowest note still fits two
+periods in a frame.
+"""
+import os
+import time
+import argparse
+import numpy as np
+from scipy import fft as sp_fft
+
+import reed_reviewer.reed_utils as rutils
+from reed_reviewer.spectrum import get_window
+
+F0_MIN = 50  # Hz, lowest pitch looked for
+F0_MAX = 2000  # Hz, highest pitch looked for
+N_HARMONICS = 10
+YIN_THRESHOLD = 0.15  # cumulative mean normalised difference taken as periodic
+HOP_SEC = 0.01
+SILENCE_RMS = 1e-4  # frames quieter than this are left unvoiced
+BATCH_FRAMES = 4096  # frames transformed together, bounds memory in analyze_batch
+
+
+def frame_length(Fs, f0_min=F0_MIN):
+    """
+    frame length (power of 2) holding two periods of f0_min
+    """
+    return int(2 ** np.ceil(np.log2(2 * Fs / f0_min)))
+
+
+def make_frames(raw_data, frame_len, hop):
+    """
+    (samples, channels) -> (frames, channels, frame_len) view, no copy.
+    Recordings shorter than a frame are zero padded to one frame.
+    """
+    if raw_data.ndim == 1:
+        raw_data = raw_data[:, np.newaxis]
+    if raw_data.shape[0] < frame_len:
+        pad = np.zeros([frame_len - raw_data.shape[0], raw_data.shape[1]])
+        raw_data = np.concatenate([raw_data, pad.astype(raw_data.dtype)])
+    frames = np.lib.stride_tricks.sliding_window_view(raw_data, frame_len, axis=0)
+    return frames[::hop]
+
+
+def yin(frames, Fs, f0_min=F0_MIN, f0_max=F0_MAX, threshold=YIN_THRESHOLD):
+    """
+    YIN f0 of a stack of frames. The difference function comes from one FFT
+    cross-correlation per frame, the threshold / local minimum search is done
+    for all frames at once.
+
+    Inputs
+    ------
+        frames (ndarray) - (..., frame_len) frames, frame_len > Fs / f0_min.
+        Fs (int) - sampling rate.
+        f0_min (float) - F0_MIN - lowest pitch looked for.
+        f0_max (float) - F0_MAX - highest pitch looked for.
+        threshold (float) - YIN_THRESHOLD - dip needed to call a frame periodic.
+
+    Returns
+    -------
+        f0 (ndarray) - (...) Hz, nan where no periodicity was found.
+        periodicity (ndarray) - (...) 1 minus the normalised difference at the
+            chosen lag, close to 1 for a clean tone.
+    """
+    frames = np.asarray(frames, dtype=np.float32)
+    frame_len = frames.shape[-1]
+    tau_max = min(int(Fs / f0_min), frame_len // 2)
+    tau_min = max(2, int(Fs / f0_max))
+    win_len = frame_len - tau_max  # integration window
+
+    # r(tau) = sum_j x[j] x[j + tau] over the window, via FFT cross-correlation
+    n_fft = sp_fft.next_fast_len(frame_len + win_len)
+    spec_all = sp_fft.rfft(frames, n=n_fft, axis=-1, workers=-1)
+    spec_win = sp_fft.rfft(frames[..., :win_len], n=n_fft, axis=-1, workers=-1)
+    acf = sp_fft.irfft(spec_all * np.conj(spec_win), n=n_fft, axis=-1, workers=-1)
+    acf = acf[..., : tau_max + 1]
+
+    # energy of the window and of the lagged window
+    cum_energy = np.cumsum(np.square(frames, dtype=np.float64), axis=-1)
+    cum_energy = np.concatenate([np.zeros(frames.shape[:-1] + (1,)), cum_energy], -1)
+    lags = np.arange(tau_max + 1)
+    energy_lag = cum_energy[..., lags + win_len] - cum_energy[..., lags]
+    diff = np.maximum(energy_lag[..., :1] + energy_lag - 2 * acf, 0)
+
+    # cumulative mean normalised difference, d'(0) = 1
+    cum_diff = np.cumsum(diff[..., 1:], axis=-1)
+    cmnd = np.ones_like(diff)
+    np.divide(
+        diff[..., 1:] * lags[1:],
+        cum_diff,
+        out=cmnd[..., 1:],
+        where=cum_diff > 0,
+    )
+
+    # first lag under threshold that is also a local minimum
+    search = cmnd[..., tau_min:tau_max]
+    is_dip = (search < threshold) & (search <= cmnd[..., tau_min + 1 : tau_max + 1])
+    found = is_dip.any(axis=-1)
+    tau = np.where(found, is_dip.argmax(axis=-1), search.argmin(axis=-1)) + tau_min
+
+    # parabolic interpolation around the chosen lag
+    tau_idx = tau[..., np.newaxis]
+    left, mid, right = (
+        np.take_along_axis(cmnd, tau_idx + offset, axis=-1)[..., 0]
+        for offset in (-1, 0, 1)
+    )
+    curve = left - 2 * mid + right
+    shift = np.zeros_like(mid)
+    np.divide(left - right, 2 * curve, out=shift, where=np.abs(curve) > 1e-12)
+    shift = np.clip(shift, -1, 1)
+
+    quiet = energy_lag[..., 0] < win_len * SILENCE_RMS**2
+    voiced = found & ~quiet
+    f0 = np.where(voiced, Fs / (tau + shift), np.nan)
+    periodicity = np.where(quiet, 0, 1 - np.clip(mid, 0, 1))
+    return f0, periodicity
+
+
+def harmonics(frames, Fs, f0, n_harmonics=N_HARMONICS):
+    """
+    amplitudes of the first n_harmonics harmonics of every frame, the peak
+    magnitude within a bin of h * f0 in a Hann windowed FFT. Scaled so a full
+    scale sine reads 1.
+
+    Inputs
+    ------
+        frames (ndarray) - (..., frame_len) frames.
+        Fs (int) - sampling rate.
+        f0 (ndarray) - (...) f0 per frame, nan frames give nan harmonics.
+        n_harmonics (int) - N_HARMONICS - harmonics measured.
+
+    Returns
+    -------
+        amplitudes (ndarray) - (..., n_harmonics) float32, nan above Nyquist.
+    """
+    frame_len = frames.shape[-1]
+    window = get_window("hann", frame_len).astype(np.float32)
+    mag = np.abs(sp_fft.rfft(frames * window, axis=-1, workers=-1))
+    mag *= np.float32(2 / window.sum())
+    n_bins = mag.shape[-1]
+
+    harmonic_freq = f0[..., np.newaxis] * np.arange(1, n_harmonics + 1)
+    valid = np.isfinite(harmonic_freq) & (harmonic_freq < Fs / 2)
+    centre = np.round(np.where(valid, harmonic_freq, 0) * frame_len / Fs).astype(int)
+    peak = np.zeros(centre.shape, dtype=np.float32)
+    for offset in (-1, 0, 1):
+        bins = np.clip(centre + offset, 0, n_bins - 1)
+        peak = np.maximum(peak, np.take_along_axis(mag, bins, axis=-1))
+    return np.where(valid, peak, np.nan).astype(np.float32)
+
+
+def _analyze_frames(frames, Fs, n_harmonics):
+    f0, periodicity = yin(frames, Fs)
+    return f0, periodicity, harmonics(frames, Fs, f0, n_harmonics)
+
+
+def analyze(raw_data, Fs, hop_sec=HOP_SEC, n_harmonics=N_HARMONICS):
+    """
+    frame by frame pitch of one recording.
+
+    Inputs
+    ------
+        raw_data (ndarray) - (samples, channels) recording.
+        Fs (int) - sampling rate.
+        hop_sec (float) - HOP_SEC - time between frames.
+        n_harmonics (int) - N_HARMONICS - harmonics measured.
+
+    Returns
+    -------
+        pitch (dict) - t (frames,) frame start times, f0 (frames, channels),
+            periodicity (frames, channels), harmonics (frames, channels,
+            n_harmonics)
+    """
+    frame_len = frame_length(Fs)
+    hop = max(1, int(hop_sec * Fs))
+    frames = make_frames(raw_data, frame_len, hop)
+    f0, periodicity, amps = _analyze_frames(frames, Fs, n_harmonics)
+    return dict(
+        t=np.arange(frames.shape[0]) * hop / Fs,
+        f0=f0,
+        periodicity=periodicity,
+        harmonics=amps,
+    )
+
+
+def analyze_batch(recordings, hop_sec=HOP_SEC, n_harmonics=N_HARMONICS):
+    """
+    analyze for many recordings at once. Frames of every recording and channel
+    (with the same Fs) are stacked and transformed BATCH_FRAMES at a time.
+
+    Inputs
+    ------
+        recordings (list of (ndarray, int)) - (raw_data, Fs) pairs.
+
+    Returns
+    -------
+        pitches (list of dict) - analyze output per recording, same order.
+    """
+    pitches = [None] * len(recordings)
+    for Fs in sorted({int(rec_Fs) for _, rec_Fs in recordings}):
+        frame_len = frame_length(Fs)
+        hop = max(1, int(hop_sec * Fs))
+        members = [idx for idx, (_, rec_Fs) in enumerate(recordings) if rec_Fs == Fs]
+        stacks = [make_frames(recordings[idx][0], frame_len, hop) for idx in members]
+        shapes = [stack.shape[:2] for stack in stacks]
+        flat = np.concatenate([stack.reshape(-1, frame_len) for stack in stacks])
+
+        f0 = np.empty(flat.shape[0])
+        periodicity = np.empty(flat.shape[0])
+        amps = np.empty([flat.shape[0], n_harmonics], dtype=np.float32)
+        for start in range(0, flat.shape[0], BATCH_FRAMES):
+            part = slice(start, start + BATCH_FRAMES)
+            f0[part], periodicity[part], amps[part] = _analyze_frames(
+                flat[part], Fs, n_harmonics
+            )
+
+        pos = 0
+        for idx, (n_frames, n_channels) in zip(members, shapes):
+            size = n_frames * n_channels
+            part = slice(pos, pos + size)
+            pitches[idx] = dict(
+                t=np.arange(n_frames) * hop / Fs,
+                f0=f0[part].reshape(n_frames, n_channels),
+                periodicity=periodicity[part].reshape(n_frames, n_channels),
+                harmonics=amps[part].reshape(n_frames, n_channels, n_harmonics),
+            )
+            pos += size
+    return pitches
+
+
+def summarize(pitch):
+    """
+    one f0 and harmonic profile per channel: medians over the voiced frames.
+
+    Returns
+    -------
+        f0 (ndarray) - (channels,) Hz, nan if no frame was voiced.
+        harmonics (ndarray) - (n_harmonics, channels) amplitudes.
+    """
+    voiced = np.isfinite(pitch["f0"])
+    n_channels = voiced.shape[1]
+    n_harmonics = pitch["harmonics"].shape[-1]
+    f0 = np.full(n_channels, np.nan)
+    amps = np.full([n_harmonics, n_channels], np.nan, dtype=np.float32)
+    for idx in range(n_channels):
+        if voiced[:, idx].any():
+            f0[idx] = np.median(pitch["f0"][voiced[:, idx], idx])
+            amps[:, idx] = np.nanmedian(pitch["harmonics"][voiced[:, idx], idx], axis=0)
+    return f0, amps
+
+
+class PitchTracker:
+    """
+    Incremental analyze for streamed audio. Blocks of any size go in, frames
+    that are complete come out; the unfinished tail is kept for the next push.
+
+    Inputs
+    ------
+        Fs (int) - sampling rate.
+        channels (int) - channels per block.
+        hop_sec (float) - HOP_SEC - time between frames.
+        n_harmonics (int) - N_HARMONICS - harmonics measured.
+    """
+
+    def __init__(self, Fs, channels, hop_sec=HOP_SEC, n_harmonics=N_HARMONICS):
+        self.Fs = Fs
+        self.frame_len = frame_length(Fs)
+        self.hop = max(1, int(hop_sec * Fs))
+        self.n_harmonics = n_harmonics
+        self.tail = np.empty([0, channels], dtype=np.float32)
+        self.frames_done = 0  # frames returned so far
+
+    def push(self, block):
+        """
+        Returns
+        -------
+            pitch (dict) - analyze output for the frames completed by this block
+                (may have 0 frames), t counted from the first pushed sample.
+        """
+        self.tail = np.concatenate([self.tail, np.asarray(block, dtype=np.float32)])
+        n_frames = max(0, (self.tail.shape[0] - self.frame_len) // self.hop + 1)
+        channels = self.tail.shape[1]
+        if n_frames == 0:
+            return dict(
+                t=np.empty(0),
+                f0=np.empty([0, channels]),
+                periodicity=np.empty([0, channels]),
+                harmonics=np.empty([0, channels, self.n_harmonics], dtype=np.float32),
+            )
+
+        used = (n_frames - 1) * self.hop + self.frame_len
+        frames = make_frames(self.tail[:used], self.frame_len, self.hop)
+        f0, periodicity, amps = _analyze_frames(frames, self.Fs, self.n_harmonics)
+        t = (self.frames_done + np.arange(n_frames)) * self.hop / self.Fs
+        self.frames_done += n_frames
+        self.tail = self.tail[n_frames * self.hop :].copy()
+        return dict(t=t, f0=f0, periodicity=periodicity, harmonics=amps)
+
+
+def analyze_files(rec_paths, batch_size=32):
+    """
+    summarize for saved recordings, batch_size recordings per analyze_batch.
+
+    Returns
+    -------
+        results (dict) - path -> (f0, harmonics), see summarize.
+    """
+    results = {}
+    audio_sec = 0.0
+    start = time.perf_counter()
+    for first in range(0, len(rec_paths), batch_size):
+        paths, recordings = [], []
+        for rec_path in rec_paths[first : first + batch_size]:
+            try:
+                raw_data, fingerp = rutils.load_rec(rec_path)
+            except Exception as err:  # unreadable recording, leave it out
+                print(f"skipping {rec_path}: {err}")
+                continue
+            paths.append(rec_path)
+            recordings.append((raw_data, int(fingerp["Fs"])))
+            audio_sec += raw_data.shape[0] / int(fingerp["Fs"])
+        for rec_path, pitch in zip(paths, analyze_batch(recordings)):
+            results[rec_path] = summarize(pitch)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"analyzed {len(results)} recordings, {audio_sec:.1f} s of audio in "
+        f"{elapsed:.1f} s ({audio_sec / max(elapsed, 1e-9):.0f}x realtime)"
+    )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m reed_reviewer.pitch",
+        description="Fundamental frequency and harmonics of saved recordings.",
+    )
+    parser.add_argument("reed_dir", help="directory of recordings, e.g. reed_1")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    rec_paths = [
+        os.path.join(args.reed_dir, file_name)
+        for file_name in rutils.list_recordings(args.reed_dir)
+    ]
+    results = analyze_files(rec_paths, batch_size=args.batch_size)
+    for rec_path, (f0, amps) in results.items():
+        profile = 20 * np.log10(np.nanmean(amps, axis=1) / np.nanmean(amps[0]))
+        profile = " ".join(f"{value:6.1f}" for value in profile)
+        print(f"{os.path.basename(rec_path)}  f0 {np.nanmean(f0):8.2f} Hz  {profile}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Persistent-artist version of the ReedRecorder three panel plot. The axes,
+lines and labels are made once per figure; a new recording only swaps line
+data, updates limits, and re-runs tight_layout when the figure was resized.
+
+Lines never hold the whole recording or spectrum. Each panel draws from a
+decimate.MinMaxPyramid, about one min/max pair per pixel of the visible x
+range, and redraws from it whenever its x limits change (toolbar zoom / pan).
+
+A reed's past spectra (history.SpectrumHistory) can be overlaid on the two
+spectrum panels with show_history. However many takes there are, that is one
+LineCollection per panel, or a shaded percentile band and a median line.
+"""
+import weakref
+import numpy as np
+from matplotlib.collections import LineCollection
+
+from reed_reviewer.decimate import MinMaxPyramid
+from reed_reviewer import history as rhistory
+
+# constants, same look as the original ReedRecorder.plot
+PLOT_ALPHA = 0.97
+GRID_ALPHA = 0.1
+TITLE_SIZE = 15
+TEXT_SIZE = 13
+DRAW_STYLE = ["-", "--"]  # plots both left and right mic channel
+HISTORY_ALPHA = 0.3
+HISTORY_CMAP = "viridis"  # oldest take dark, newest light
+HISTORY_COLOR = "0.4"  # band and median
+TRUNC_HZ = 4000  # top of the truncated panel
+
+_plots = weakref.WeakKeyDictionary()  # figure -> RecordingPlot
+
+
+class RecordingPlot:
+    """
+    Artists of the three panel plot for one figure. Use RecordingPlot.for_figure
+    so every recorder drawing into the same figure shares them.
+
+    Top panel: the last sound recording and the current threshold.
+    Middle panel: spectrum up to 20 kHz.
+    Bottom panel: spectrum up to 4 kHz.
+    """
+
+    def __init__(self, fig):
+        self.fig = fig
+        self.layout_size = None  # figure size (pixels) at the last tight_layout
+
+        # strip out figure, other views may have drawn into it
+        for ax in list(fig.axes):
+            ax.remove()
+        self.ax = [fig.add_subplot(311), fig.add_subplot(312), fig.add_subplot(313)]
+
+        self.envelope = []  # one line per channel and panel, made on demand
+        self.full = []
+        self.trunc = []
+        self.pyramids = [None, None, None]  # what each panel draws from
+        self.panel_lines = [[], [], []]  # visible lines of each panel
+        for ax in self.ax:
+            ax.callbacks.connect("xlim_changed", self._on_xlim_changed)
+        self.history_artists = []  # overlay of past spectra, see show_history
+        self.history_top = [0.0, 0.0, 0.0]  # highest history value per panel
+        (self.thresh_line,) = self.ax[0].plot([], [], color="g", visible=False)
+        self.thresh_text = self.ax[0].text(
+            0,
+            0,
+            " Threshold",
+            verticalalignment="center",
+            fontsize=TEXT_SIZE,
+            color="g",
+            visible=False,
+        )
+        self.waiting = [
+            ax.text(
+                0.5,
+                0.5,
+                word,
+                verticalalignment="center",
+                horizontalalignment="center",
+                fontsize=50,
+                transform=ax.transAxes,
+            )
+            for ax, word in zip(self.ax, ["waiting", "on", "data"])
+        ]
+        self._prettyfy()
+
+    @classmethod
+    def for_figure(cls, fig):
+        """
+        the RecordingPlot of fig, made if there isn't one or if its axes have
+        been pulled out of the figure since. Axes hidden by another view
+        (timeline.Timeline.plot) are shown again and that view's hidden.
+        """
+        plot = _plots.get(fig)
+        if plot is None or any(ax not in fig.axes for ax in plot.ax):
+            plot = cls(fig)
+            _plots[fig] = plot
+        elif not all(ax.get_visible() for ax in plot.ax):
+            for ax in fig.axes:
+                ax.set_visible(ax in plot.ax)
+            plot.layout_size = None  # the other view laid the figure out
+        return plot
+
+    def update(self, data):
+        """
+        shows a recording, data is ReedRecorder.plot_data output (None for the
+        waiting on data screen)
+        """
+        has_data = data is not None
+        for text, history_top in zip(self.waiting, self.history_top):
+            text.set_visible(not has_data and not history_top)
+
+        if has_data:
+            self._update_envelope(data)
+            self._update_spectra(data)
+        else:
+            for line in self.envelope + self.full + self.trunc:
+                line.set_visible(False)
+            self.thresh_line.set_visible(False)
+            self.thresh_text.set_visible(False)
+            print("waiting on data")
+
+        self._layout()
+
+    def show_history(self, spectrum_history, mode="auto", since=None, until=None):
+        """
+        overlays a reed's past spectra on the full and truncated spectrum
+        panels, behind the current take. Replaces any earlier overlay; it stays
+        while new takes are plotted, until clear_history.
+
+        Inputs
+        ------
+            spectrum_history (history.SpectrumHistory) - the reed's history.
+            mode (str) - "auto" - "lines" draws every take (coloured old to new),
+                "bands" the median and the outer history.PERCENTILES band.
+                "auto" is lines up to history.MAX_LINES takes, bands past that.
+            since, until (int) - None - save_time range of takes to show.
+        """
+        self.clear_history()
+        save_time, _ = spectrum_history.select(since, until)
+        n_takes = save_time.shape[0]
+        if mode == "auto":
+            mode = "lines" if n_takes <= rhistory.MAX_LINES else "bands"
+
+        for panel, max_hz, max_points in [
+            (1, spectrum_history.freq[-1], rhistory.DISPLAY_POINTS),
+            (2, TRUNC_HZ, None),
+        ]:
+            if n_takes == 0:
+                break
+            view = dict(max_hz=max_hz, max_points=max_points, since=since, until=until)
+            if mode == "lines":
+                self._history_lines(panel, spectrum_history, view)
+            else:
+                self._history_bands(panel, spectrum_history, view)
+            self._fit_history(panel, max_hz)
+
+        if n_takes:
+            days = spectrum_history.times(save_time[[0, -1]]).astype("datetime64[D]")
+            first, last = days
+            label = f"{n_takes} takes, {first} to {last}"
+            if mode == "bands":
+                low, _, high = rhistory.PERCENTILES
+                label += f"\nmedian, {low}-{high}th percentile"
+        else:
+            label = "no past takes"
+        text = self.ax[1].text(
+            0.99,
+            0.95,
+            label,
+            transform=self.ax[1].transAxes,
+            horizontalalignment="right",
+            verticalalignment="top",
+            fontsize=TEXT_SIZE - 3,
+            color=HISTORY_COLOR,
+        )
+        self.history_artists.append(text)
+
+    def clear_history(self):
+        """
+        removes the show_history overlay
+        """
+        for artist in self.history_artists:
+            artist.remove()
+        self.history_artists = []
+        self.history_top = [0.0, 0.0, 0.0]
+
+    def _history_lines(self, panel, spectrum_history, view):
+        freq, save_time, spectra = spectrum_history.view(**view)
+        segments = np.empty([spectra.shape[0], freq.shape[0], 2], dtype=np.float32)
+        segments[:, :, 0] = freq
+        segments[:, :, 1] = spectra
+        lines = LineCollection(
+            segments,
+            cmap=HISTORY_CMAP,
+            alpha=HISTORY_ALPHA,
+            linewidths=0.8,
+            zorder=1.5,  # under the take's lines
+        )
+        lines.set_array(save_time.astype(np.float64))
+        self.ax[panel].add_collection(lines, autolim=False)
+        self.history_artists.append(lines)
+        self.history_top[panel] = float(spectra.max())
+
+    def _history_bands(self, panel, spectrum_history, view):
+        freq, (low, middle, high) = spectrum_history.bands(**view)
+        ax = self.ax[panel]
+        band = ax.fill_between(
+            freq,
+            low,
+            high,
+            color=HISTORY_COLOR,
+            alpha=HISTORY_ALPHA,
+            linewidth=0,
+            zorder=1.5,
+        )
+        (median,) = ax.plot(freq, middle, color=HISTORY_COLOR, linewidth=1, zorder=1.6)
+        self.history_artists += [band, median]
+        self.history_top[panel] = float(np.nanmax(high))
+
+    def _fit_history(self, panel, max_hz):
+        """
+        makes room for the history in a panel, and gives it x limits when no
+        take is shown yet
+        """
+        ax = self.ax[panel]
+        if self.pyramids[panel] is None:
+            ax.set_xlim(0, max_hz, emit=False)
+            self.waiting[panel].set_visible(False)
+            y_max = 0.0
+        else:
+            y_max = ax.get_ylim()[1]
+        y_max = max(y_max, 1.05 * self.history_top[panel])
+        ax.set_ylim(0, y_max or 1)
+
+    def _lines(self, lines, ax, n_channels):
+        """
+        makes sure there are n_channels lines in a panel, hides the extras
+        """
+        while len(lines) < n_channels:
+            idx = len(lines)
+            style = "-" if ax is self.ax[0] else DRAW_STYLE[idx % len(DRAW_STYLE)]
+            (line,) = ax.plot([], [], linestyle=style, alpha=PLOT_ALPHA)
+            lines.append(line)
+        for idx, line in enumerate(lines):
+            line.set_visible(idx < n_channels)
+        return lines[:n_channels]
+
+    def _update_envelope(self, data):
+        t, signal = data["t"], data["signal"]
+        pyramid = data.get("envelope") or MinMaxPyramid(t, signal)
+        self.pyramids[0] = pyramid
+        self.panel_lines[0] = self._lines(self.envelope, self.ax[0], signal.shape[1])
+        x_end = t[-1] if t.shape[0] > 1 else t[0] + 1
+        self.ax[0].set_xlim(t[0], x_end, emit=False)
+        y = self._draw_view(0)
+
+        y_min, y_max = float(y.min()), float(y.max())
+        rms_thresh = data["rms_thresh"]
+        show_thresh = bool(np.size(rms_thresh))
+        self.thresh_line.set_visible(show_thresh)
+        self.thresh_text.set_visible(show_thresh)
+        if show_thresh:
+            rms_thresh = float(np.max(rms_thresh))
+            thresh_plot_max_idx = int(t.shape[0] * 0.96)  # make room for label
+            x_end = t[thresh_plot_max_idx]
+            self.thresh_line.set_data([t[0], x_end], [rms_thresh, rms_thresh])
+            self.thresh_text.set_position((x_end, rms_thresh))
+            y_max = max(y_max, rms_thresh)
+
+        pad = 0.05 * (y_max - y_min or 1)
+        self.ax[0].set_ylim(y_min - pad, y_max + pad)
+
+    def _update_spectra(self, data):
+        freq_axis, freq_mag = data["freq_axis"], data["freq_mag"]
+        pyramid = data.get("spectrum") or MinMaxPyramid(freq_axis, freq_mag)
+        for panel, lines, end_idx in [
+            (1, self.full, data["endfreq_idx"]),
+            (2, self.trunc, data["trunc_endfreq_idx"]),
+        ]:
+            ax = self.ax[panel]
+            self.pyramids[panel] = pyramid
+            self.panel_lines[panel] = self._lines(lines, ax, freq_mag.shape[1])
+            ax.set_xlim(0, freq_axis[max(end_idx - 1, 0)] or 1, emit=False)
+            y = self._draw_view(panel)
+            top = float(y.max()) if y.size else 1.0
+            top = max(top, self.history_top[panel])
+            ax.set_ylim(0, 1.05 * top or 1)
+
+    def _draw_view(self, panel):
+        """
+        gives a panel's lines the decimated data of its current x range
+
+        Returns
+        -------
+            y (ndarray) - (points, channels) drawn, for limits
+        """
+        ax = self.ax[panel]
+        x_min, x_max = ax.get_xlim()
+        x, y = self.pyramids[panel].view(x_min, x_max, ax.bbox.width)
+        for idx, line in enumerate(self.panel_lines[panel]):
+            line.set_data(x, y[:, idx])
+        return y
+
+    def _on_xlim_changed(self, ax):
+        panel = self.ax.index(ax)
+        if self.pyramids[panel] is not None:
+            self._draw_view(panel)
+
+    def _prettyfy(self):
+        ax = self.ax
+        ax[0].set_title("Sound Envelope", fontsize=TITLE_SIZE)
+        ax[0].set_xlabel("Time")
+        ax[0].set_ylabel("Amplitude")
+        ax[1].set_title("Full Frequency Spectrum", fontsize=TITLE_SIZE)
+        ax[1].set_xlabel("Frequency")
+        ax[1].set_ylabel("Power\n")
+        ax[2].set_title(
+            "Truncated Frequency Spectrum (Zoomed In View)", fontsize=TITLE_SIZE
+        )
+        ax[2].set_xlabel("Frequency (smaller range)")
+        ax[2].set_ylabel("Power\n")
+        for an_ax in ax:
+            an_ax.grid(color="k", alpha=GRID_ALPHA)
+            an_ax.spines["top"].set_visible(False)
+            an_ax.spines["right"].set_visible(False)
+            an_ax.spines["left"].set_visible(False)
+
+    def _layout(self):
+        """
+        tight_layout is the slowest part of a redraw, only redo it on resize
+        """
+        size = tuple(np.round(self.fig.get_size_inches() * self.fig.dpi))
+        if size != self.layout_size:
+            self.fig.tight_layout()
+            self.layout_size = size
+
+
+def plot_recording(data, fig=None):
+    """
+    draws ReedRecorder.plot_data output into fig (a new figure if None)
+    """
+    if fig is None:
+        import matplotlib.pyplot as plt  # only when there's no figure to draw into
+
+        fig = plt.figure(figsize=(10, 10))
+    RecordingPlot.for_figure(fig).update(data)
+    return fig
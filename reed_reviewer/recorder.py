@@ -1,14 +1,59 @@
 import os
 import time
+import queue
+import threading
+import argparse
 import numpy as np
-import sounddevice as sd
-import matplotlib.pyplot as plt
 import reed_reviewer.reed_utils as rutils
-from scipy.integrate import simpson
+import reed_reviewer.audio as audio
+import reed_reviewer.instrument as instrument
+from reed_reviewer.stream import StreamTrigger
+from reed_reviewer.noise import NoiseFloor
+from reed_reviewer.segment import find_events
+from reed_reviewer.spectrum import SpectrumCache, SpectrumWorkspace
+from reed_reviewer.catalog import Catalog
+import reed_reviewer.features as features
+import reed_reviewer.storage as storage
+from reed_reviewer.writer import shared_save_queue
+from reed_reviewer.plotting import plot_recording
+from reed_reviewer.decimate import MinMaxPyramid
+from reed_reviewer.similarity import SpectralIndex, band_vector
+from reed_reviewer.longtake import LongTake
+from reed_reviewer.constants import DATA_ROOT, CLOCK_PRECISION
+
+# (path, mtime_ns) of a baseline recording -> its samples. Shared by every
+# recorder, so switching reeds doesn't re-read the baseline from disk.
+_baseline_cache = {}
+
+
+class Take:
+    """
+    A recorder's current recording, one small fixed record instead of loose
+    instance attributes. ReedRecorder.raw_data, save_time, freq_axis and
+    freq_mag read and write these fields.
+
+        raw_data (ndarray) - (samples, channels) samples.
+        save_time (int) - epoch time at the resolution of the system clock.
+        freq_axis, freq_mag (ndarray) - spectrum from the last _fft.
+    """
+
+    __slots__ = ("raw_data", "save_time", "freq_axis", "freq_mag")
+
+    def __init__(self):
+        self.raw_data = np.array([])
+        self.save_time = []
+        self.freq_axis = []
+        self.freq_mag = []
+
 
-CLOCK_PRECISION = time.clock_getres(0)
-HOME = os.path.expanduser("~")
-DATA_ROOT = os.path.join(HOME, ".reed_reviewer_data")
+def _take_field(name):
+    """
+    property forwarding to the field name of ReedRecorder.take
+    """
+    return property(
+        lambda self: getattr(self.take, name),
+        lambda self, value: setattr(self.take, name, value),
+    )
 
 
 class ReedRecorder:
@@ -28,9 +73,66 @@ class ReedRecorder:
 
         rec_wait (float) - miliseconds - _record method sleeps for this ammount of
             time. This prevents button/key clicks from registering in recordings
+
+        fft_window (str) - "boxcar" - window used by _fft, see spectrum.spectrum.
+
+        fft_nperseg (int) - None - Welch segment length for _fft. None transforms
+            the whole recording at once.
+
+        save_dtype (str) - "float32" - sample type of saved recordings, "float64",
+            "float32" or "int16". See storage.write_rec.
+
+        save_queue (SaveQueue) - None - background writer saves go through. None
+            uses the shared one from writer.shared_save_queue.
+
+        backend (module) - None - audio backend with the sounddevice interface
+            (rec, wait, play, InputStream, PortAudioError) for the default
+            device source and sink. None uses sounddevice. bench.FakeSoundDevice
+            stands in for a microphone.
+
+        source (audio.AudioSource) - None - where listen and stream_listen get
+            audio. None is audio.default_source (the device, unless
+            REED_REVIEWER_AUDIO says otherwise).
+
+        sink (audio.AudioSink) - None - where speak plays. None is
+            audio.default_sink.
+
+        adaptive_thresh (bool) - True - keep re-estimating the room noise floor
+            from the quiet parts of everything recorded (see noise.NoiseFloor)
+            and let it set rms_thresh and ref_power. False only changes them on
+            set_thresh.
+
+        data_root (str) - DATA_ROOT - root of the data tree recordings are saved to.
+
+        compact (bool) - False - record into two preallocated float32 capture
+            buffers (alternating, so the last take stays intact while the next
+            is recorded) and do the fft in a reused SpectrumWorkspace, instead
+            of new arrays every take. Memory stays flat over a long session.
+            Saves copy their samples out of the capture buffer.
     """
 
-    def __init__(self, reed_id, rec_duration_sec=1, sensitivity_rms=10, rec_wait=0.1):
+    raw_data = _take_field("raw_data")
+    save_time = _take_field("save_time")
+    freq_axis = _take_field("freq_axis")
+    freq_mag = _take_field("freq_mag")
+
+    def __init__(
+        self,
+        reed_id,
+        rec_duration_sec=1,
+        sensitivity_rms=10,
+        rec_wait=0.1,
+        fft_window="boxcar",
+        fft_nperseg=None,
+        save_dtype="float32",
+        save_queue=None,
+        backend=None,
+        data_root=DATA_ROOT,
+        source=None,
+        sink=None,
+        adaptive_thresh=True,
+        compact=False,
+    ):
         """
         Instance Variables
         ------------------
@@ -43,70 +145,215 @@ class ReedRecorder:
             Fs (int) - 44100 - this is the frequency samples per second. This is
                 the "CD quality" sampling rate. It is twice the frequency that is
                 perceptible to the human ear.
+            take (Take) - the current recording, raw_data, save_time, freq_mag
+                and freq_axis below are its fields.
             raw_data (ndarray) - this holds a numpy array of the last recording.
             save_time (int) - epoch time at the resolution of the system clock.
-            rms_thresh (float) - amplitude threshold for save trigger.
+            rms_thresh (ndarray) - per-channel amplitude threshold for save
+                trigger. Empty list until there is a noise floor estimate.
             ref_power (float) - power of the baseline, or reference, recording.
+                With adaptive_thresh and no baseline, the mean power of the
+                first noise floor estimate, kept for the session (see
+                noise.NoiseFloor).
                 db is a log ratio of powers. In order to implement db level triggering
                 later this is necessary.
             freq_mag (ndarray) - magnitude at each frequency. Frequencies specified
-                in freq_axis. The magnitudes in Fourier domain.
+                in freq_axis. The magnitudes in Fourier domain. One-sided, float32.
             freq_axis (ndarray) - array of frequencies in the fft. The frequency
-                axis in f domain.
+                axis in f domain. 0 to Fs/2.
+            spectrum_cache (SpectrumCache) - spectra of recent recordings, so
+                re-plotting a recording doesn't redo its fft.
+            catalog (Catalog) - index of saved recordings, updated by _save.
+            similarity (SpectralIndex) - nearest-neighbour index of recordings'
+                spectra, new takes are appended by _save.
+            noise_floor (NoiseFloor) - running room noise estimate.
         """
         # initialize static values
         self.id = str(reed_id)
         self.duration = rec_duration_sec  # length of listening TODO: this should be listening in chunks for passing threshold
         self.sensitivity_rms = sensitivity_rms
         self.rec_wait = rec_wait
+        self.data_root = data_root
 
         self.Fs = 44100  # this is a CD quality sampling rate (twice the sampling
         # rate of the max human frequency)
+        self.source = source or audio.default_source(self.Fs, backend)
+        self.sink = sink or audio.default_sink(backend)
 
         # empty arrays
-        self.raw_data = np.array([])  # current recording
-        self.save_time = []
-        self.freq_mag = []  # frequency spectrum magnitudes, normalized for rec time
-        self.freq_axis = []  # frequency axis of fft
+        self.take = Take()  # current recording, spectrum and save time
+        self.fft_window = fft_window
+        self.fft_nperseg = fft_nperseg
+        self.save_dtype = save_dtype
+        self.save_queue = save_queue or shared_save_queue()
+        self.spectrum_cache = SpectrumCache()
+        self.compact = compact
+        if compact:  # buffers for one rec_duration_sec take, they grow if needed
+            n_frames = int(self.duration * self.Fs)
+            self._capture = [
+                np.empty([n_frames, self.source.channels], dtype=np.float32)
+                for _ in range(2)
+            ]
+            self._capture_idx = 0
+            self._time_axis = np.arange(n_frames) / self.Fs
+            self.spectrum_workspace = SpectrumWorkspace(
+                n_frames, self.source.channels, fft_window
+            )
+        self.catalog = Catalog(data_root)
+        self.similarity = SpectralIndex(data_root)
+
+        # streaming capture state, see stream_listen
+        self._stream = None
+        self._trigger = None
+        self._take_queue = None
+        self._take_thread = None
+        self.dropped_takes = 0
+        self._long_take = None  # see start_long_take
+
+        self.adaptive_thresh = adaptive_thresh
+        self.noise_floor = NoiseFloor(self.Fs, sensitivity_rms)
 
         # sets ref_power, and rms_thresh
         self._set_initial_thresh()  # sets to empty if no baseline rec is saved
 
     # ____________________________Bread  n'  Butter____________________________#
-    # def stream_listen(self):
-    #    with sd.InputStream(samplerate=self.Fs, latency=10, channels=2, dtype=np.ndarray, callback=stream_parse):
-    #        time.sleep(10)
-    # def stream_parse(data, frames, time, status):
-    #    print(data.shape)
+    def stream_listen(
+        self, pre_roll_sec=0.1, post_roll_sec=0.25, max_take_sec=5, on_take=None
+    ):
+        """
+        starts continuous capture. An input stream feeds a ring buffer and every
+        time the signal crosses rms_thresh a take (with pre and post roll) is cut,
+        saved to the reed dir, and handed to on_take. Returns right away, call
+        stop_stream to end capture.
+
+        Inputs
+        ------
+            pre_roll_sec (float) - audio kept from before the trigger.
+            post_roll_sec (float) - quiet time that ends a take.
+            max_take_sec (float) - longest single take.
+            on_take (callable) - None - called as on_take(self) after each take
+                is saved. Runs on the take thread, not the audio thread.
+
+        With adaptive_thresh no baseline is needed: nothing triggers until the
+        noise floor has been heard for a moment, then the threshold follows it.
+        """
+        thresh = self._trigger_thresh()
+        if thresh is None:
+            return False
+        if self._stream is not None:
+            return True
+
+        self._take_queue = queue.Queue(maxsize=8)
+        self._stream = self.source.open_stream(self._stream_callback)
+        self._trigger = StreamTrigger(
+            self.Fs,
+            self._stream.channels,
+            thresh,
+            pre_roll_sec=pre_roll_sec,
+            post_roll_sec=post_roll_sec,
+            max_take_sec=max_take_sec,
+        )
+        self._take_thread = threading.Thread(
+            target=self._take_worker, args=(on_take,), daemon=True
+        )
+        self._take_thread.start()
+        self._stream.start()
+        instrument.count("streams")
+        return True
+
+    def stop_stream(self):
+        """
+        stops continuous capture. A take in progress is cut and saved.
+        """
+        if self._stream is None:
+            return
+        self._stream.stop()
+        self._stream.close()
+        for take in self._trigger.flush():
+            self._queue_take(take)
+        self._take_queue.put(None)  # tells the take thread to finish
+        self._take_thread.join()
+        self._stream = None
+        self._trigger = None
+
+    def start_long_take(self, chunk_sec=1):
+        """
+        starts recording everything from the source into one recording in the
+        reed dir, until stop_long_take. It goes to disk chunk_sec at a time and
+        is analyzed as it goes (see longtake), so a take can last a whole
+        practice session with memory staying the same. There is no threshold
+        or segmentation, and raw_data isn't replaced.
+
+        Returns
+        -------
+            sv_path (str) - where the take is being written
+        """
+        if self._long_take is not None:
+            return self._long_take.rec_path
+        save_time = rutils.epoch_time_int()
+        fingerp = self._fingerprint(save_time)
+        fingerp["long_take"] = True
+        reed_dir = os.path.join(self.data_root, f"reed_{self.id}")
+        rutils.check_add_dir(reed_dir)
+        ref_power = None if isinstance(self.ref_power, list) else self.ref_power
+        self._long_take = LongTake(
+            self.source,
+            os.path.join(reed_dir, f"{save_time}{storage.EXTENSION}"),
+            fingerp,
+            self.save_dtype,
+            chunk_sec,
+            ref_power,
+        )
+        self._long_take.start()
+        instrument.count("long_takes")
+        return self._long_take.rec_path
+
+    def stop_long_take(self):
+        """
+        ends the long take, finalizes its file and sidecar and indexes it
+
+        Returns
+        -------
+            sv_path (str) - the take's file, None if there was no long take
+        """
+        take, self._long_take = self._long_take, None
+        if take is None:
+            return None
+        feats = take.stop()
+        self.catalog.add(take.rec_path, take.fingerprint, take.shape)
+        self.similarity.add(
+            take.rec_path, band_vector(feats["freq"], feats["spectrum"])
+        )
+        return take.rec_path
 
     def listen(self, save_bool=True):
         """
         records, checks if recording passes save threshold and if so, saves
         """
-        raw_data = self._record(self.duration)
-        print(f"recording... please wait {self.duration} seconds")
-        sd.wait()
-        print("done")
+        with instrument.span("record"):
+            raw_data = self._record(self.duration)
+            self.source.wait()
 
         # data and time
         self.save_time = rutils.epoch_time_int()
         self.raw_data = raw_data
-        self._thresh_save()
+        if self.adaptive_thresh and self.noise_floor.update(raw_data):
+            self._apply_noise_floor()
+        if save_bool:
+            self._thresh_save()
 
     def set_thresh(self):
         """
-        takes baseline recording, sets threshold, saves it to baseline dir
+        takes baseline recording, sets threshold, saves it to baseline dir.
+        The noise floor restarts from the baseline (every channel).
         """
         self.listen(
             save_bool=False
         )  # save_bool prevents saving baseline rec as reed rec
 
-        # rms val
-        rms = self.get_rms()
-        self.rms_thresh = rms[0] * self.sensitivity_rms
-
-        # power
-        self.ref_power = self.get_power()
+        # rms_thresh and ref_power from the baseline's noise floor
+        self.noise_floor.seed(self.raw_data)
+        self._apply_noise_floor()
 
         # save
         self._save_baseline_rec()
@@ -115,10 +362,117 @@ class ReedRecorder:
         """
         plays back last recording on system speakers
         """
-        sd.play(self.raw_data, self.Fs)
+        self.sink.play(self.raw_data, self.Fs)
+
+    def replay(
+        self,
+        source,
+        blocksize=4096,
+        pre_roll_sec=0.1,
+        post_roll_sec=0.25,
+        max_take_sec=5,
+        on_take=None,
+        verbose=True,
+    ):
+        """
+        runs a whole session from source through the same trigger, segmentation
+        and saves as stream_listen, as fast as the CPU allows. Re-run threshold or
+        segmentation changes against an archived session by replaying it into a
+        scratch data_root.
+
+        Inputs
+        ------
+            source (audio.AudioSource) - finite source, e.g. audio.FileSource.
+            blocksize (int) - 4096 - samples pushed through the trigger at once.
+            pre_roll_sec, post_roll_sec, max_take_sec - see stream_listen.
+            on_take (callable) - None - called as on_take(self) after each take.
+            verbose (bool) - True - print the session length, takes and speed.
+
+        Returns
+        -------
+            n_takes (int) - takes cut from the session. Every save is written
+                before this returns.
+        """
+        thresh = self._trigger_thresh()
+        if thresh is None:
+            return 0
+        if source.Fs != self.Fs:
+            raise ValueError(f"source is {source.Fs} Hz, recorder is {self.Fs} Hz")
+
+        trigger = StreamTrigger(
+            self.Fs,
+            source.channels,
+            thresh,
+            pre_roll_sec=pre_roll_sec,
+            post_roll_sec=post_roll_sec,
+            max_take_sec=max_take_sec,
+        )
+        session_time = source.start_time()
+        n_takes = 0
+        start = time.perf_counter()
+        for block in source.blocks(blocksize):
+            for take in trigger.push(block):
+                self._replay_take(take, session_time, trigger.last_start, on_take)
+                n_takes += 1
+            if self.adaptive_thresh and self.noise_floor.update(block, trigger.active):
+                self._apply_noise_floor()
+                trigger.rms_thresh = self.rms_thresh
+        for take in trigger.flush():
+            self._replay_take(take, session_time, trigger.last_start, on_take)
+            n_takes += 1
+        self.save_queue.flush()
+
+        if verbose:
+            session_sec = trigger.ring.total / self.Fs
+            elapsed = time.perf_counter() - start
+            print(
+                f"replayed {session_sec:.1f} s in {elapsed:.1f} s, {n_takes} takes "
+                f"({session_sec / max(elapsed, 1e-9):.0f}x realtime)"
+            )
+        return n_takes
 
     # ____________________________Plotting  Methods____________________________#
-    def plot(self, fig=None):
+    @instrument.timed("plot_data")
+    def plot_data(self):
+        """
+        everything plot draws, computed up front. Safe to call off the main thread
+        (fft included), the drawing itself then only happens in plot.
+
+        Returns
+        -------
+        data (dict) - None if no recording yet. Otherwise t, signal, rms_thresh,
+            freq_axis, freq_mag, endfreq_idx (20 kHz), trunc_endfreq_idx (4 kHz)
+            and the envelope and spectrum decimate.MinMaxPyramid the panels
+            draw from.
+        """
+        signal = self.raw_data  # one reference, a new take can replace raw_data
+        if signal.size == 0:
+            return None
+        if self.compact:
+            # raw_data is a capture buffer and the spectrum a workspace view,
+            # later takes record / transform over both while the plot still
+            # zooms and pans from them, so the plot gets its own copies
+            signal = signal.copy()
+
+        freq_axis, freq_mag = self._fft(signal)
+        if self.compact:
+            freq_mag = freq_mag.copy()
+        t = self._times(signal.shape[0])
+        return dict(
+            t=t,
+            signal=signal,
+            rms_thresh=self.rms_thresh,
+            freq_axis=freq_axis,
+            freq_mag=freq_mag,
+            # define x-axes for power spectrum (freq_axis is one-sided)
+            endfreq_idx=np.searchsorted(freq_axis, 20000),
+            trunc_endfreq_idx=np.searchsorted(freq_axis, 4000),
+            envelope=MinMaxPyramid(t, signal),
+            spectrum=MinMaxPyramid(freq_axis, freq_mag),
+        )
+
+    @instrument.timed("plot")
+    def plot(self, fig=None, data=None):
         """
         Nice plotting method. Specifically designed for use with kivy.
 
@@ -134,129 +488,17 @@ class ReedRecorder:
         fig (matplotlib.figure.Figure) - None - this is an instance of the figure class.
            by default it is set to none and one is created. However, for use with kivy
            app development environment a figure input makes the kivy code much cleaner.
-        """
+        data (dict) - None - output of plot_data, so the heavy lifting can be done
+           on another thread. None computes it here.
 
-        # This block is because I need to preserve figure canvas for the app
-        if fig == None:
-            fig, ax = plt.subplots(3, 1, figsize=(10, 10))
-        else:
-            # strip out figure
-            for ax in fig.axes:
-                ax.remove()
-            # repopulate for ReedReviewer plot method
-            fig.add_subplot(311)
-            fig.add_subplot(312)
-            fig.add_subplot(313)
-            ax = fig.get_axes()
-
-        # constants
-        plot_alpha = 0.97
-        grid_alpha = 0.1
-        title_size = 15
-        text_size = 13
-
-        # Plotting block
-        if self.raw_data.size > 0:  # data has been taken
-            self._fft(self.raw_data)
-            print("plotting")
-
-            time_samples = self.raw_data.shape[0]
-            t = [idx / self.Fs for idx in range(time_samples)]
-
-            ax[0].plot(t, self.raw_data, alpha=plot_alpha)
-
-            # plot rms thresh as labeled line
-            if self.rms_thresh:  # runs if isnt empty
-                thresh_plot_max_idx = int(time_samples * 0.96)  # make room for label
-                rms_thresh = [self.rms_thresh for idx in range(thresh_plot_max_idx)]
-                ax[0].plot(t[:thresh_plot_max_idx], rms_thresh, color="g")
-                label_x_idx = int(thresh_plot_max_idx * 1)
-                ax[0].text(
-                    t[label_x_idx],
-                    rms_thresh[0],
-                    " Threshold",
-                    verticalalignment="center",
-                    fontsize=text_size,
-                    color="g",
-                )
-
-            # define x-axes for power spectrum
-            startfreq_idx = int(self.freq_axis.shape[0] / 2)
-            endfreq_idx = (
-                int(20000 * startfreq_idx / max(self.freq_axis)) + startfreq_idx
-            )
-            trunc_startfreq_idx = int(self.freq_axis.shape[0] / 2)
-            trunc_endfreq_idx = (
-                int(4000 * trunc_startfreq_idx / max(self.freq_axis))
-                + trunc_startfreq_idx
-            )
-
-            # plot
-            draw_style = ["-", "--"]  # plots both left and right mic channel
-            for idx in range(self.raw_data.shape[1]):  # plot for each channel
-                ax[1].plot(
-                    self.freq_axis[startfreq_idx:endfreq_idx],
-                    self.freq_mag[startfreq_idx:endfreq_idx, idx],
-                    linestyle=draw_style[idx],
-                    alpha=plot_alpha,
-                )
-                ax[2].plot(
-                    self.freq_axis[trunc_startfreq_idx:trunc_endfreq_idx],
-                    self.freq_mag[trunc_startfreq_idx:trunc_endfreq_idx, idx],
-                    linestyle=draw_style[idx],
-                    alpha=plot_alpha,
-                )
-        else:  # no data yet plot
-            ax[0].text(
-                0.5,
-                0.5,
-                "waiting",
-                verticalalignment="center",
-                horizontalalignment="center",
-                fontsize=50,
-            )
-            ax[1].text(
-                0.5,
-                0.5,
-                "on",
-                verticalalignment="center",
-                horizontalalignment="center",
-                fontsize=50,
-            )
-            ax[2].text(
-                0.5,
-                0.5,
-                "data",
-                verticalalignment="center",
-                horizontalalignment="center",
-                fontsize=50,
-            )
-            print("waiting on data")
-
-        # Prettyfy
-        ax[0].set_title("Sound Envelope", fontsize=title_size)
-        ax[0].set_xlabel("Time")
-        ax[0].set_ylabel("Amplitude")
-        ax[0].grid(color="k", alpha=grid_alpha)
-        ax[1].set_title("Full Frequency Spectrum", fontsize=title_size)
-        ax[1].set_xlabel("Frequency")
-        ax[1].set_ylabel("Power\n")
-        ax[1].grid(color="k", alpha=grid_alpha)
-        ax[2].set_title(
-            "Truncated Frequency Spectrum (Zoomed In View)", fontsize=title_size
-        )
-        ax[2].set_xlabel("Frequency (smaller range)")
-        ax[2].set_ylabel("Power\n")
-        ax[2].grid(color="k", alpha=grid_alpha)
-
-        for an_ax in fig.axes:
-            an_ax.spines["top"].set_visible(False)
-            an_ax.spines["right"].set_visible(False)
-            an_ax.spines["left"].set_visible(False)
-
-        plt.tight_layout()
+        Repeat calls with the same figure reuse its lines, see plotting.RecordingPlot.
+        """
+        if data is None:
+            data = self.plot_data()
 
-        return fig
+        # artists are made once per figure and only get new data after that,
+        # this keeps the figure canvas the app hands in
+        return plot_recording(data, fig)
 
     # ____________________________ Return Methods  ____________________________#
     def get_id(self):
@@ -283,18 +525,83 @@ class ReedRecorder:
         return self.raw_db
 
     # ____________________________ Support  Methods ____________________________#
+    def _stream_callback(self, indata, frames, time_info, status):
+        """
+        stream callback, runs on the audio thread. Only copies into the ring
+        buffer and hands finished takes off, anything slow happens in _take_worker.
+        """
+        with instrument.span("stream_callback"):
+            trigger = self._trigger
+            for take in trigger.push(indata):
+                self._queue_take(take)
+            if self.adaptive_thresh and self.noise_floor.update(indata, trigger.active):
+                self._apply_noise_floor()
+
+    def _queue_take(self, take):
+        try:
+            self._take_queue.put_nowait((rutils.epoch_time_int(), take))
+        except queue.Full:  # never block the audio thread
+            self.dropped_takes += 1
+            instrument.count("dropped_takes")
+
+    def _take_worker(self, on_take):
+        """
+        drains takes cut by the stream and saves them
+        """
+        while True:
+            item = self._take_queue.get()
+            if item is None:
+                break
+            self.save_time, self.raw_data = item
+            self._thresh_save()
+            if on_take is not None:
+                on_take(self)
+
+    def _replay_take(self, take, session_time, take_start, on_take):
+        """
+        saves one replayed take, its save_time is the session's start time plus
+        where the take starts in it
+        """
+        offset = round(take_start / self.Fs / CLOCK_PRECISION)
+        self.save_time, self.raw_data = session_time + offset, take
+        self._thresh_save()
+        if on_take is not None:
+            on_take(self)
+
     def _record(self, duration):
         """
         waits a moment and records
         """
-        time.sleep(self.rec_wait)  # prevent keyclicks from registering
-        try:
-            raw_data = sd.rec(int(duration * self.Fs), samplerate=self.Fs, channels=2)
-        except sd.PortAudioError:
-            raw_data = sd.rec(int(duration * self.Fs), samplerate=self.Fs, channels=1)
-        return raw_data
+        if self.source.realtime:
+            time.sleep(self.rec_wait)  # prevent keyclicks from registering
+        n_frames = int(duration * self.Fs)
+        if self.compact:
+            return self.source.record_into(self._capture_buffer(n_frames))
+        return self.source.record(n_frames)
         # save_squeak(self.reed_id, self.Fs, self.save_time, self.raw_data)
 
+    def _capture_buffer(self, n_frames):
+        """
+        compact mode: the capture buffer the next take is recorded into. There
+        are two, used in turn, remade only if the take length or the source's
+        channels change.
+        """
+        shape = (n_frames, self.source.channels)
+        if self._capture[0].shape != shape:
+            self._capture = [np.empty(shape, dtype=np.float32) for _ in range(2)]
+        self._capture_idx ^= 1
+        return self._capture[self._capture_idx]
+
+    def _times(self, n_samples):
+        """
+        time axis (s) of a recording, in compact mode a slice of one kept array
+        """
+        if not self.compact:
+            return np.arange(n_samples) / self.Fs
+        if self._time_axis.shape[0] < n_samples:
+            self._time_axis = np.arange(n_samples) / self.Fs
+        return self._time_axis[:n_samples]
+
     def _compute_rms(self, raw_data):
         squared_error = raw_data ** 2  # mean is approx 0 so no subtraction needed
         mean_squared_error = squared_error.mean(0)  # mean of the squared error
@@ -317,6 +624,8 @@ class ReedRecorder:
                 In the frequency domain...to come later, maybe
 
         """
+        from scipy.integrate import simpson  # slow import, first use only
+
         Ns = signal.shape[0]
         abs_signal_squared = np.abs(signal) ** 2
         signal_integral = simpson(abs_signal_squared, dx=1 / self.Fs)
@@ -324,23 +633,30 @@ class ReedRecorder:
 
         return signal_integral / signal_duration
 
+    @instrument.timed("fft")
     def _fft(self, signal):
         """
-        implements a fast Fourier transform. Boiler plate from python docs.
-        """
+        one-sided magnitude spectrum of every channel, see spectrum.spectrum.
+        Results are cached on (reed id, save_time) so a recording is only
+        transformed once. Returns (freq_axis, freq_mag) as well as setting them.
 
-        print("computing fft")
-        n_samples, n_channels = signal.shape
-        fft_raw_data = np.empty([n_samples, n_channels], dtype=complex)  # holds fft later
-        self.freq_mag = np.zeros([n_samples, n_channels])
-        for idx in range(n_channels):  # fft on each channel
-            fft_raw_data[:, idx] = np.fft.fft(self.raw_data[:, idx])
-            self.freq_mag[:, idx] = np.fft.fftshift(np.abs(fft_raw_data[:, idx])) / (
-                n_samples / self.Fs
-            )  # Ns * Fs corrects for time so this is a density
-        self.freq_axis = np.fft.fftshift(
-            np.fft.fftfreq(n_samples, 1 / self.Fs)
-        )  # freq axis shared
+        In compact mode (whole recording ffts) the spectrum is computed into the
+        reused spectrum_workspace, freq_mag is only valid until the next take's.
+        """
+        if self.compact and self.fft_nperseg is None:
+            freq_axis, freq_mag = self.spectrum_workspace.get(
+                (self.id, self.save_time), signal, self.Fs
+            )
+        else:
+            freq_axis, freq_mag = self.spectrum_cache.get(
+                (self.id, self.save_time),
+                signal,
+                self.Fs,
+                window=self.fft_window,
+                nperseg=self.fft_nperseg,
+            )
+        self.freq_axis, self.freq_mag = freq_axis, freq_mag
+        return freq_axis, freq_mag
 
     def _set_initial_thresh(self):
         """
@@ -350,7 +666,7 @@ class ReedRecorder:
         """
 
         # form path in os agnostic way
-        baseline_dir = os.path.join(DATA_ROOT, "baseline")
+        baseline_dir = os.path.join(self.data_root, "baseline")
 
         # make dir if doesnt exist
         rutils.check_add_dir(baseline_dir)
@@ -359,36 +675,70 @@ class ReedRecorder:
         newest_file_name = rutils.newest_recording_name(baseline_dir)
 
         if not newest_file_name == []:  # if dir isnt empty
-            print("setting initial threshold")
-
             newest_baseline_path = os.path.join(baseline_dir, newest_file_name)
-            # load recording
-            baseline_rec, fingerprint = rutils.load_rec(newest_baseline_path)
+            stamp = (newest_baseline_path, os.stat(newest_baseline_path).st_mtime_ns)
+            if stamp not in _baseline_cache:
+                # load recording
+                _baseline_cache[stamp] = rutils.load_rec(newest_baseline_path)[0]
 
-            # set rms_threshold
-            rms = self._compute_rms(baseline_rec)
-            self.rms_thresh = rms[0] * self.sensitivity_rms
-
-            # set ref_power
-            signal = baseline_rec[:, 0]
-            Ns = signal.shape[0]
-            Fs = fingerprint["Fs"]
-            signal_duration = Ns / int(Fs)
-            self.ref_power = self._compute_power(signal, signal_duration)
-            print("done")
+            # set rms_threshold and ref_power, the noise floor starts from it
+            with instrument.span("baseline"):
+                self.noise_floor.seed(_baseline_cache[stamp])
+                self._apply_noise_floor()
 
         else:  # else empty dir
             print("no baseline file, please set threshold")
             self.rms_thresh = []
             self.ref_power = []
 
+    def _trigger_thresh(self):
+        """
+        threshold a new StreamTrigger starts with: rms_thresh, or (adaptive, no
+        estimate yet) inf until the noise floor is known. None if there is
+        neither.
+        """
+        if not isinstance(self.rms_thresh, list):
+            return self.rms_thresh
+        if self.adaptive_thresh:
+            print("listening for the room noise floor")
+            return np.inf
+        print("no baseline file, please set threshold")
+        return None
+
+    def _apply_noise_floor(self):
+        """
+        rms_thresh and ref_power from the current noise floor estimate. Runs on
+        whichever thread updated the estimate, attributes are swapped whole.
+        """
+        estimate = self.noise_floor.estimate()
+        if estimate is None:
+            return
+        self.rms_thresh, self.ref_power = estimate
+        trigger = self._trigger
+        if trigger is not None:
+            trigger.rms_thresh = self.rms_thresh
+
+    @instrument.timed("thresh_save")
     def _thresh_save(self):
         """
-        Save if current recording passes threshold.
+        Save every note event in the current recording that passes threshold.
+        Each event is saved as its own recording, see segment.find_events. Its
+        save_time is the take's save_time offset by where the event starts.
         """
-        thresh_vals = [val for val in self.raw_data[:, 0] if val > self.rms_thresh]
-        if thresh_vals:  # check if empty
-            self._save_rec()
+        if isinstance(self.rms_thresh, list):  # empty, threshold never set
+            print("no baseline file, please set threshold")
+            return
+
+        events = find_events(self.raw_data, self.Fs, self.rms_thresh)
+        instrument.count("takes")
+        instrument.count("events", len(events))
+        for start, stop in events:
+            offset = round(start / self.Fs / CLOCK_PRECISION)
+            self._save_rec(
+                raw_data=self.raw_data[start:stop],
+                save_time=self.save_time + offset,
+                segment=(self.save_time, start, stop),
+            )
 
     def _save_baseline_rec(self):
         """
@@ -397,44 +747,106 @@ class ReedRecorder:
         """
         self._save("baseline")
 
-    def _save_rec(self):
+    def _save_rec(self, raw_data=None, save_time=None, segment=None):
         """
-        save into current reed dir
+        save into current reed dir. Saves the whole current recording unless
+        raw_data/save_time are given, see _save.
         """
         reed_dir = f"reed_{self.id}"
-        self._save(reed_dir)
+        return self._save(
+            reed_dir,
+            raw_data=raw_data,
+            save_time=save_time,
+            segment=segment,
+            is_take=True,
+        )
 
-    def _save(self, sub_dir, tag=None):
+    def _save(
+        self,
+        sub_dir,
+        tag=None,
+        raw_data=None,
+        save_time=None,
+        segment=None,
+        is_take=False,
+    ):
         """
-        handles save filename creation. Preps data for saving. saves raw_data.
+        handles save filename creation. Preps data for saving. Queues raw_data on
+        the background writer, the file is written by _write on its thread.
 
         Inputs
         ------
         tag - (string) - a string that can be appended to filename.
+        raw_data - (ndarray) - None - samples to save, defaults to self.raw_data.
+        save_time - (int) - None - save time of the samples, defaults to
+            self.save_time.
+        segment - (tuple) - None - (take save_time, start, stop) when raw_data
+            is one event cut out of a longer take.
+        is_take - (bool) - False - a reed take: also cataloged, added to the
+            similarity index and given a feature sidecar. Baseline recordings
+            are room noise, not takes, so they are only written.
+
+        Returns
+        -------
+        sv_path - (str) - path the file will be saved to
         """
-        print("saving")
+        if raw_data is None:
+            raw_data = self.raw_data
+        if save_time is None:
+            save_time = self.save_time
 
         # add fingerprint for futureproofing
-        fingerp = self._fingerprint()  # fingerprint
+        fingerp = self._fingerprint(save_time, segment)  # fingerprint
 
-        # check for / add reed directory
-        dir_path = os.path.join(DATA_ROOT, sub_dir)
-        rutils.check_add_dir(dir_path)
+        dir_path = os.path.join(self.data_root, sub_dir)
 
         # add tags to save name
         if tag == None:
-            sv_filename = f"{self.save_time}"
+            sv_filename = f"{save_time}"
         else:
-            sv_filename = f"baseline_{self.save_time}_{tag}"
-
-        # save
-        sv_path = os.path.join(dir_path, sv_filename)
+            sv_filename = f"baseline_{save_time}_{tag}"
+
+        # raw_data is never written to after a take (listen makes a new array),
+        # so the writer can hold on to it without a copy. Except in compact
+        # mode, where the capture buffer is recorded over two takes later.
+        if self.compact and any(
+            np.may_share_memory(raw_data, buffer) for buffer in self._capture
+        ):
+            raw_data = raw_data.copy()
+        sv_path = os.path.join(dir_path, sv_filename + storage.EXTENSION)
+        ref_power = None if isinstance(self.ref_power, list) else self.ref_power
+        with instrument.span("save"):  # only blocks when the writer is backed up
+            self.save_queue.submit(
+                sv_path,
+                self._write,
+                sv_path,
+                raw_data,
+                fingerp,
+                is_take,
+                ref_power,
+            )
+        return sv_path
 
-        # take advantage of savez multiple array save
-        # allowing fingerp to be array of strings
-        np.savez_compressed(f"{sv_path}", recording=self.raw_data, fingerprint=fingerp)
+    def _write(self, sv_path, raw_data, fingerp, is_take, ref_power):
+        """
+        runs on the writer thread. Saves raw samples plus a json header holding the
+        fingerprint. A take is also indexed and gets its feature sidecar.
+        """
+        # check for / add reed directory
+        rutils.check_add_dir(os.path.dirname(sv_path))
+        with instrument.span("write"):
+            storage.write_rec(sv_path, raw_data, fingerp, self.save_dtype)
+            if is_take:
+                self.catalog.add(sv_path, fingerp, raw_data.shape)
+        if is_take:
+            # feature sidecar, so reviewing doesn't need the raw audio
+            with instrument.span("features"):
+                feats = features.write_features(sv_path, raw_data, self.Fs, ref_power)
+                self.similarity.add(
+                    sv_path, band_vector(feats["freq"], feats["spectrum"])
+                )
 
-    def _fingerprint(self):
+    def _fingerprint(self, save_time=None, segment=None):
         """
         Makes a "fingerprint". It's the little things. Will help me out if
             files get shuffled.
@@ -445,7 +857,66 @@ class ReedRecorder:
             save_time - in case data gets shuffled.
             Fs - verify the sampling rate of the recording
             rms_threshold - what value the recording passed to be saved
+            take_time, start, stop - only for events cut out of a longer take,
+                the take's save_time and the event's sample range in it.
         """
-        return dict(
-            id=self.id, save_time=self.save_time, Fs=self.Fs, rms_thresh=self.rms_thresh
+        if save_time is None:
+            save_time = self.save_time
+        fingerp = dict(
+            id=self.id, save_time=save_time, Fs=self.Fs, rms_thresh=self.rms_thresh
         )
+        if segment is not None:
+            fingerp["take_time"], fingerp["start"], fingerp["stop"] = segment
+        return fingerp
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m reed_reviewer.recorder",
+        description="Recorder tools that don't need a microphone.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_cmd = commands.add_parser(
+        "replay", help="run a recorded session through trigger, segmentation and saves"
+    )
+    replay_cmd.add_argument("session", help="WAV, .rrec or .npz recording")
+    replay_cmd.add_argument("--reed-id", default="replay")
+    replay_cmd.add_argument(
+        "--data-root", default=DATA_ROOT, help="where takes are saved (scratch dir)"
+    )
+    replay_cmd.add_argument(
+        "--thresh",
+        type=float,
+        help="fixed rms_thresh to use instead of the baseline's or the noise floor's",
+    )
+    replay_cmd.add_argument("--post-roll", type=float, default=0.25)
+    replay_cmd.add_argument("--max-take", type=float, default=5)
+    replay_cmd.add_argument(
+        "--timings", action="store_true", help="print span timings and save the log"
+    )
+    args = parser.parse_args(argv)
+
+    # an explicit threshold is kept for the whole session, the noise floor
+    # would otherwise replace it on the first quiet blocks
+    recorder = ReedRecorder(
+        args.reed_id,
+        data_root=args.data_root,
+        source=audio.NullSource(),
+        sink=audio.NullSink(),
+        adaptive_thresh=args.thresh is None,
+    )
+    if args.thresh is not None:
+        recorder.rms_thresh = args.thresh
+    recorder.replay(
+        audio.FileSource(args.session),
+        post_roll_sec=args.post_roll,
+        max_take_sec=args.max_take,
+    )
+    if args.timings:
+        instruments = instrument.shared_instruments()
+        print(instruments.table())
+        print(f"timing log: {instruments.save_session(args.data_root)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import os
 import time
 import numpy as np
-import matplotlib.pyplot as plt
+from reed_reviewer.constants import HOME, DATA_ROOT, CLOCK_PRECISION
+import reed_reviewer.storage as storage
+import reed_reviewer.pack as pack
+import reed_reviewer.instrument as instrument
 
-HOME = os.path.expanduser("~")
-DATA_ROOT = os.path.join(HOME, ".reed_reviewer_data")
+REC_EXTENSIONS = (storage.EXTENSION, ".npz")  # current format first, then legacy
 
 
 def epoch_time_int():
@@ -12,10 +14,7 @@ def epoch_time_int():
     epoch time is a float. This corrects this to the integer at the computer
     clock resolution
     """
-    clock_precision = time.clock_getres(0)
-    int_time = round(
-        time.time() / clock_precision
-    )  # epoch time at cpu clock resolution
+    int_time = round(time.time() / CLOCK_PRECISION)  # at cpu clock resolution
 
     return int_time
 
@@ -42,14 +41,116 @@ def newest_recording_name(dir_path):
         return []
 
 
-def load_rec(rec_path):
+def is_recording(file_name):
+    """
+    True for recording files, in either the current or the legacy format
+    """
+    return file_name.endswith(REC_EXTENSIONS)
+
+
+def list_recordings(dir_path):
+    """
+    sorted names of the recordings in dir_path, loose files and packed takes
+    (see pack) alike. Join them to dir_path to get paths load_rec takes.
+    """
+    names = {name for name in os.listdir(dir_path) if is_recording(name)}
+    packed = pack.open_pack(dir_path)
+    if packed is not None:
+        names.update(packed.entries)
+    return sorted(names)
+
+
+def rec_stat(rec_path):
+    """
+    (size, mtime) of a recording. A packed take has those of the loose file it
+    was packed from.
+    """
+    try:
+        stat = os.stat(rec_path)
+        return stat.st_size, stat.st_mtime
+    except FileNotFoundError:
+        entry = _packed(rec_path).entries[os.path.basename(rec_path)]
+        return entry["size"], entry["mtime"]
+
+
+def iter_recordings(dir_path):
+    """
+    yields (path, recording, fingerprint) for every recording in dir_path.
+    Packed takes come from one sequential read of the pack.
+    """
+    loose = sorted(name for name in os.listdir(dir_path) if is_recording(name))
+    for name in loose:
+        rec_path = os.path.join(dir_path, name)
+        yield (rec_path, *load_rec(rec_path))
+    packed = pack.open_pack(dir_path)
+    if packed is not None:
+        loose = set(loose)
+        names = [name for name in packed.names() if name not in loose]
+        for name, recording, fingerp in packed.iter_takes(names):
+            yield os.path.join(dir_path, name), recording, fingerp
+
+
+@instrument.timed("load_rec")
+def load_rec(rec_path, mmap_mode=None, offset=0, length=None):
     """
     load saved recording.
 
-    NOTE: allow_pickle=True - this allows the fingerprint dict to load
+    Inputs
+    ------
+        rec_path (str) - path of a .rrec recording (or a legacy .npz).
+        mmap_mode (str) - None - memory map the samples instead of reading them,
+            see storage.load_rec. Ignored for .npz files.
+        offset (int) - 0 - first sample to return.
+        length (int) - None - number of samples to return, None is to the end.
+
+    NOTE: .npz files are legacy (savez_compressed). They have to be decompressed
+    in full and need allow_pickle=True for the fingerprint dict to load.
+
+    A recording that was packed (see pack) is read from its reed's pack, under
+    the same path. A loose file wins over a packed take of the same name.
+    """
+    try:
+        return _load_loose(rec_path, mmap_mode, offset, length)
+    except FileNotFoundError:
+        return _packed(rec_path).load(
+            os.path.basename(rec_path), mmap_mode, offset, length
+        )
+
+
+def locate_rec(rec_path):
+    """
+    where a .rrec recording's samples are, loose or packed. Anything reading a
+    recording by path in pieces (see audio.FileSource) goes through this, so
+    packed takes open like loose ones.
+
+    Returns
+    -------
+        data_path (str) - file holding the samples, rec_path or its reed's pack
+        header (dict) - see storage.read_header, data_offset is into data_path
+    """
+    try:
+        return rec_path, storage.read_header(rec_path)
+    except FileNotFoundError:
+        packed = _packed(rec_path)
+        return packed.path, packed.entries[os.path.basename(rec_path)]
+
+
+def _packed(rec_path):
     """
+    the pack holding rec_path, FileNotFoundError if it isn't packed either
+    """
+    packed = pack.open_pack(os.path.dirname(rec_path))
+    if packed is None or os.path.basename(rec_path) not in packed:
+        raise FileNotFoundError(f"no recording {rec_path}")
+    return packed
+
+
+def _load_loose(rec_path, mmap_mode, offset, length):
+    if rec_path.endswith(storage.EXTENSION):
+        return storage.load_rec(rec_path, mmap_mode, offset, length)
 
     with np.load(rec_path, allow_pickle=True) as data:
         fingerp_array = data["fingerprint"]
         fingerp_dict = fingerp_array.tolist()
-        return data["recording"], fingerp_dict
+        stop = None if length is None else offset + length
+        return data["recording"][offset:stop], fingerp_dict
@@ -1,16 +1,153 @@
-import sounddevice as sd
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
 import reed_reviewer.reed_utils as rutils
-import time
-from scipy.integrate import simps
-
-CLOCK_PRECISION = time.clock_getres(0)
+from reed_reviewer.constants import DATA_ROOT
+from reed_reviewer.catalog import Catalog
+import reed_reviewer.features as features
+from reed_reviewer.similarity import SpectralIndex
+from reed_reviewer.timeline import Timeline
+from reed_reviewer.history import SpectrumHistory
+from reed_reviewer.distance import DistanceMatrix
 
 
 class ReedReviewer:
-    def __init__(self, reed_id):
+    def __init__(self, reed_id, data_root=DATA_ROOT):
         self.id = reed_id
+        self.data_root = data_root
+        self.catalog = Catalog(data_root)
+        self.similarity = SpectralIndex(data_root)
+
+    def recordings(self, since=None, until=None):
+        """
+        this reed's recordings from the catalog, oldest first. See Catalog.recordings.
+        """
+        return self.catalog.recordings(reed_id=self.id, since=since, until=until)
+
+    def features(self, since=None, until=None, ref_power=None):
+        """
+        feature sidecars (spectrum, rms, power, dB) of this reed's recordings,
+        oldest first. Recordings without a current sidecar get one written.
+        See features.load_features.
+
+        Returns
+        -------
+            rows (list of dict) - catalog row with its features under "features"
+        """
+        rows = self.recordings(since=since, until=until)
+        for row in rows:
+            row["features"] = features.load_features(row["path"], ref_power)
+        return rows
+
+    def takes(self):
+        """
+        yields (path, recording, fingerprint) of every recording of this reed,
+        loose files first, then packed takes in one sequential read of the pack.
+        See reed_utils.iter_recordings.
+        """
+        reed_dir = os.path.join(self.data_root, f"reed_{self.id}")
+        if os.path.isdir(reed_dir):
+            yield from rutils.iter_recordings(reed_dir)
+
+    def timeline(self):
+        """
+        this reed's development timeline, brought in line with the catalog
+        (takes saved, removed or rewritten since it was last opened). See
+        timeline.Timeline.
+        """
+        reed_timeline = Timeline(self.id, self.data_root)
+        reed_timeline.update(self.recordings())
+        return reed_timeline
+
+    def spectrum_history(self):
+        """
+        this reed's past spectra, brought in line with the catalog (takes
+        saved, removed or rewritten since it was last opened). Overlay it on a
+        recording plot with plotting.RecordingPlot.show_history. See
+        history.SpectrumHistory.
+        """
+        reed_history = SpectrumHistory(self.id, self.data_root)
+        reed_history.update(self.recordings())
+        return reed_history
+
+    def spectrum_bands(self, since=None, until=None, percentiles=None):
+        """
+        median and percentile bands of this reed's spectra over takes, on the
+        feature sidecar frequency grid
+
+        Returns
+        -------
+            freq (ndarray) - (grid,)
+            bands (ndarray) - (len(percentiles), grid), default
+                history.PERCENTILES
+        """
+        kwargs = {} if percentiles is None else dict(percentiles=percentiles)
+        return self.spectrum_history().bands(since=since, until=until, **kwargs)
+
+    def distance_matrix(
+        self, *other_reeds, metric="cosine", since=None, until=None, workers=1
+    ):
+        """
+        pairwise spectral distances between every recording of this reed (and
+        of other_reeds), from their spectrum histories. See
+        distance.DistanceMatrix for ordering and clustering the result.
+
+        Inputs
+        ------
+            other_reeds (int/str) - more reeds to include.
+            metric (str) - "cosine" - "cosine" or "log_spectral", see distance.py.
+            since, until (int) - None - save_time range of recordings.
+            workers (int) - 1 - threads, see distance.pairwise.
+
+        Returns
+        -------
+            matrix (DistanceMatrix) - recordings in reed order, oldest first
+        """
+        reed_ids, save_times, spectra, rates = [], [], [], []
+        for reed_id in (self.id,) + other_reeds:
+            reviewer = self
+            if reed_id != self.id:
+                reviewer = ReedReviewer(reed_id, self.data_root)
+            save_time, reed_spectra = reviewer.spectrum_history().select(since, until)
+            fs_by_time = {
+                row["save_time"]: row["Fs"]
+                for row in reviewer.recordings(since=since, until=until)
+            }
+            for take_time, take_spectrum in zip(save_time, reed_spectra):
+                if take_time not in fs_by_time:  # no longer in the catalog
+                    continue
+                reed_ids.append(str(reed_id))
+                save_times.append(take_time)
+                spectra.append(take_spectrum)
+                rates.append(fs_by_time[take_time])
+
+        n_grid = len(features.FREQ_GRID)
+        spectra = np.array(spectra, dtype=np.float32).reshape(-1, n_grid)
+        return DistanceMatrix.from_spectra(
+            features.FREQ_GRID,
+            spectra,
+            np.array(rates),
+            reed_ids=reed_ids,
+            save_time=save_times,
+            metric=metric,
+            workers=workers,
+        )
+
+    def similar(self, file_path, k=10):
+        """
+        the k historical takes (any reed) that sound closest to a recording.
+        See similarity.SpectralIndex.
+
+        Returns
+        -------
+            matches (list of (str, float)) - path and distance, closest first
+        """
+        return self.similarity.query_file(file_path, k=k)
+
+    def features_from_file(self, file_path, ref_power=None):
+        return features.load_features(file_path, ref_power)
 
     def fingerprint_from_file(self, file_path):
         raw_data, fingerp = rutils.load_rec(file_path)
@@ -22,3 +159,144 @@ class ReedReviewer:
 
         print(reed_id, save_time, Fs, thresh)
         print(f"data shape = {raw_data.shape}")
+
+
+# ____________________________ Batch  Reprocessing ____________________________#
+def reed_recording_paths(data_root=DATA_ROOT):
+    """
+    paths of every recording in every reed_* dir, oldest first within a reed
+    """
+    paths = []
+    if not os.path.exists(data_root):
+        return paths
+    for sub_dir in sorted(os.listdir(data_root)):
+        dir_path = os.path.join(data_root, sub_dir)
+        if sub_dir.startswith("reed_") and os.path.isdir(dir_path):
+            for file_name in rutils.list_recordings(dir_path):
+                paths.append(os.path.join(dir_path, file_name))
+    return paths
+
+
+def _reprocess_one(rec_path):
+    """
+    worker: rewrites one recording's feature sidecar. dB keeps the baseline the
+    old sidecar was made with, if there was one.
+    """
+    try:
+        ref_power = features.stored_ref_power(rec_path)
+        raw_data, fingerp = rutils.load_rec(rec_path)
+        features.write_features(rec_path, raw_data, int(fingerp["Fs"]), ref_power)
+        return rec_path, fingerp, raw_data.shape, None
+    except Exception as err:  # report, don't kill the whole batch
+        return rec_path, None, None, repr(err)
+
+
+def reprocess(data_root=DATA_ROOT, workers=None, force=False, chunksize=8):
+    """
+    brings every feature sidecar in the data tree up to date. Recordings whose
+    sidecar is current (same FEATURE_HASH, size and mtime) are skipped unless
+    force is set, so a rerun after a few new takes only touches those takes.
+    The rest are fanned out over a process pool and added to the catalog.
+
+    Inputs
+    ------
+        data_root (str) - DATA_ROOT - root of the data tree.
+        workers (int) - None - processes, None uses every core.
+        force (bool) - False - reprocess everything.
+        chunksize (int) - 8 - recordings handed to a worker at a time.
+
+    Returns
+    -------
+        summary (dict) - counts of total, skipped, done and failed recordings,
+            elapsed seconds, recordings/s and seconds of audio per second.
+    """
+    start = time.perf_counter()
+    paths = reed_recording_paths(data_root)
+    todo = paths if force else [path for path in paths if not features.is_fresh(path)]
+    print(f"{len(paths)} recordings, {len(paths) - len(todo)} up to date")
+
+    catalog = Catalog(data_root)
+    done, failed, audio_sec = 0, 0, 0.0
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_reprocess_one, todo, chunksize=chunksize)
+            for rec_path, fingerp, shape, err in results:
+                if err is not None:
+                    failed += 1
+                    print(f"failed {rec_path}: {err}")
+                    continue
+                catalog.add(rec_path, fingerp, shape)
+                audio_sec += shape[0] / int(fingerp["Fs"])
+                done += 1
+
+    elapsed = time.perf_counter() - start
+    summary = dict(
+        total=len(paths),
+        skipped=len(paths) - len(todo),
+        done=done,
+        failed=failed,
+        elapsed=elapsed,
+        recs_per_sec=done / elapsed if elapsed > 0 else 0.0,
+        audio_sec_per_sec=audio_sec / elapsed if elapsed > 0 else 0.0,
+    )
+    print(
+        f"reprocessed {done} ({failed} failed) in {elapsed:.1f}s: "
+        f"{summary['recs_per_sec']:.1f} recordings/s, "
+        f"{summary['audio_sec_per_sec']:.1f}x realtime"
+    )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m reed_reviewer.reviewer",
+        description="batch tools for the reed reviewer data tree",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    rep = sub.add_parser("reprocess", help="update every feature sidecar")
+    rep.add_argument("--root", default=DATA_ROOT, help="data tree root")
+    rep.add_argument("--workers", type=int, default=None, help="processes")
+    rep.add_argument("--force", action="store_true", help="ignore up to date sidecars")
+    idx = sub.add_parser("index", help="rebuild the similarity index")
+    idx.add_argument("--root", default=DATA_ROOT, help="data tree root")
+    sim = sub.add_parser("similar", help="closest takes to a recording")
+    sim.add_argument("path", help="recording to match")
+    sim.add_argument("-k", type=int, default=10, help="number of matches")
+    sim.add_argument("--root", default=DATA_ROOT, help="data tree root")
+    dist = sub.add_parser("distance", help="pairwise distances between recordings")
+    dist.add_argument("reeds", nargs="+", help="reed ids")
+    dist.add_argument("--metric", default="cosine", choices=("cosine", "log_spectral"))
+    dist.add_argument("--workers", type=int, default=1, help="threads")
+    dist.add_argument("--clusters", type=int, default=None, help="clusters to label")
+    dist.add_argument("--out", default="distances.npz", help="leaf ordered matrix")
+    dist.add_argument("--root", default=DATA_ROOT, help="data tree root")
+    args = parser.parse_args(argv)
+
+    if args.command == "reprocess":
+        reprocess(args.root, workers=args.workers, force=args.force)
+    elif args.command == "index":
+        count = SpectralIndex(args.root).rebuild(reed_recording_paths(args.root))
+        print(f"indexed {count} recordings")
+    elif args.command == "similar":
+        for path, dist in SpectralIndex(args.root).query_file(args.path, k=args.k):
+            print(f"{dist:8.3f}  {path}")
+    elif args.command == "distance":
+        reviewer = ReedReviewer(args.reeds[0], args.root)
+        start = time.perf_counter()
+        matrix = reviewer.distance_matrix(
+            *args.reeds[1:], metric=args.metric, workers=args.workers
+        )
+        print(f"{len(matrix)} recordings in {time.perf_counter() - start:.1f}s")
+        if args.clusters and len(matrix):
+            labels = matrix.clusters(args.clusters)
+            for label in np.unique(labels):
+                members = matrix.reed_ids[labels == label]
+                reeds, counts = np.unique(members, return_counts=True)
+                members = ", ".join(f"reed {r}: {c}" for r, c in zip(reeds, counts))
+                print(f"cluster {label}  {members}")
+        matrix.ordered().save(args.out)
+        print(f"matrix written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
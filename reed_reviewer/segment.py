@@ -0,0 +1,126 @@
+"""
+Note segmentation. Finds the note events in a take from framewise levels so
+each note can be saved as its own recording. Everything here works on whole
+numpy arrays (all channels at once), there are no per-sample python loops.
+"""
+import numpy as np
+
+
+def frame_rms(raw_data, frame_len):
+    """
+    rms of consecutive, non-overlapping frames.
+
+    Inputs
+    ------
+        raw_data (ndarray) - (samples, channels) recording.
+        frame_len (int) - samples per frame. A short last frame is kept.
+
+    Returns
+    -------
+        rms (ndarray) - (frames, channels)
+    """
+    if raw_data.ndim == 1:
+        raw_data = raw_data[:, np.newaxis]
+    n_samples, n_channels = raw_data.shape
+    n_full = n_samples // frame_len
+
+    squared = np.square(raw_data, dtype=np.float64)
+    mean_sq = squared[: n_full * frame_len].reshape(n_full, frame_len, n_channels)
+    mean_sq = mean_sq.mean(axis=1)
+    if n_samples % frame_len:  # short last frame
+        tail = squared[n_full * frame_len :].mean(axis=0, keepdims=True)
+        mean_sq = np.concatenate([mean_sq, tail])
+    return np.sqrt(mean_sq)
+
+
+def frame_peak(raw_data, frame_len):
+    """
+    peak amplitude (max of abs) of consecutive, non-overlapping frames. Same
+    framing as frame_rms.
+
+    Returns
+    -------
+        peak (ndarray) - (frames, channels)
+    """
+    if raw_data.ndim == 1:
+        raw_data = raw_data[:, np.newaxis]
+    n_samples, n_channels = raw_data.shape
+    n_frames = -(-n_samples // frame_len)
+    starts = np.arange(n_frames) * frame_len
+    if n_samples == 0:
+        return np.empty([0, n_channels])
+    return np.maximum.reduceat(np.abs(raw_data), starts, axis=0)
+
+
+def find_events(
+    raw_data,
+    Fs,
+    on_thresh,
+    off_ratio=0.5,
+    frame_sec=0.01,
+    min_event_sec=0.05,
+    min_gap_sec=0.05,
+    pad_sec=0.02,
+):
+    """
+    finds note events in a recording.
+
+    A frame is "on" when any channel's peak amplitude in it passes on_thresh,
+    the same test stream.StreamTrigger cuts takes on, so a take the trigger
+    cut always has an "on" frame. An event is a run of frames whose peak stays
+    above on_thresh * off_ratio (hysteresis) and contains at least one "on"
+    frame. Events closer than min_gap_sec are merged, then events shorter than
+    min_event_sec are dropped.
+
+    Inputs
+    ------
+        raw_data (ndarray) - (samples, channels) recording.
+        Fs (int) - sampling rate.
+        on_thresh (float or ndarray) - amplitude threshold that starts an
+            event, ReedRecorder.rms_thresh. A per-channel array also works.
+        off_ratio (float) - fraction of on_thresh the signal has to fall under
+            before an event ends.
+        frame_sec (float) - analysis frame length.
+        min_event_sec (float) - shortest event that is kept.
+        min_gap_sec (float) - events separated by less than this are merged.
+        pad_sec (float) - padding added to both ends of each event.
+
+    Returns
+    -------
+        events (list of (int, int)) - (start, stop) sample indices, stop exclusive
+    """
+    n_samples = raw_data.shape[0]
+    frame_len = max(1, int(frame_sec * Fs))
+    peak = frame_peak(raw_data, frame_len)
+
+    on_thresh = np.asarray(on_thresh, dtype=np.float64)
+    above_on = (peak > on_thresh).any(axis=1)
+    above_off = (peak > on_thresh * off_ratio).any(axis=1)
+    if not above_on.any():
+        return []
+
+    # runs of above_off frames, as [start, stop) frame indices
+    edges = np.diff(above_off.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+
+    # hysteresis: keep only runs that reached on_thresh
+    on_count = np.concatenate([[0], np.cumsum(above_on)])
+    reached_on = (on_count[stops] - on_count[starts]) > 0
+    starts, stops = starts[reached_on], stops[reached_on]
+
+    # merge events separated by short gaps
+    min_gap = int(np.ceil(min_gap_sec / frame_sec))
+    keep_break = (starts[1:] - stops[:-1]) >= min_gap
+    starts = starts[np.concatenate([[True], keep_break])]
+    stops = stops[np.concatenate([keep_break, [True]])]
+
+    # frames to samples, drop short events, pad
+    starts = starts * frame_len
+    stops = np.minimum(stops * frame_len, n_samples)
+    long_enough = (stops - starts) >= int(min_event_sec * Fs)
+    pad = int(pad_sec * Fs)
+    starts = np.maximum(starts[long_enough] - pad, 0)
+    stops = np.minimum(stops[long_enough] + pad, n_samples)
+
+    return list(zip(starts.tolist(), stops.tolist()))
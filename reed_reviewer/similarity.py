@@ -0,0 +1,272 @@
+"""
+"Which reed sounds like this one". A nearest-neighbour index over compact
+spectral fingerprints (log band energies) of every recording.
+
+The index lives in DATA_ROOT as two files:
+
+    similarity.npz      vectors and paths the BallTree is built from
+    similarity.journal  append-only log of recordings saved since
+
+Saving a take only appends one record to the journal. Queries search the
+BallTree plus a brute force pass over the journal, and once the journal grows
+past a fraction of the base it is folded in (compact). Nothing reads raw audio
+at query time.
+
+A take saved again (reprocessed, rewritten) is simply journaled again, the
+last record of a path wins. Recordings deleted since they were indexed are
+dropped whenever the index is loaded or compacted.
+"""
+import os
+import struct
+import threading
+import numpy as np
+
+import reed_reviewer.features as features
+import reed_reviewer.reed_utils as rutils
+from reed_reviewer.constants import DATA_ROOT
+
+INDEX_NAME = "similarity.npz"
+JOURNAL_NAME = "similarity.journal"
+
+N_BANDS = 32
+BAND_EDGES_HZ = np.geomspace(50, 16000, N_BANDS + 1)
+COMPACT_FRACTION = 0.1  # fold the journal in once it's this big relative to the base
+_PATH_LEN = struct.Struct("<H")
+_VECTOR_BYTES = N_BANDS * 4
+# held while the journal is appended to or moved aside, so a save thread's add
+# can't write into a journal compact has already read
+_journal_lock = threading.Lock()
+
+
+def band_vector(freq, spectrum):
+    """
+    spectral fingerprint of one recording: log energy in N_BANDS log spaced
+    bands from 50 Hz to 16 kHz, channels averaged, mean removed so overall
+    loudness doesn't count, only spectral shape.
+
+    Inputs
+    ------
+        freq (ndarray) - (bins,) frequency grid, e.g. features.FREQ_GRID.
+        spectrum (ndarray) - (bins, channels) or (bins,) magnitudes.
+
+    Returns
+    -------
+        vector (ndarray) - (N_BANDS,) float32
+    """
+    if spectrum.ndim > 1:
+        spectrum = spectrum.mean(axis=1)
+    energy = np.square(spectrum, dtype=np.float64)
+    edges = np.searchsorted(freq, BAND_EDGES_HZ)
+    cum_energy = np.concatenate([[0], np.cumsum(energy)])
+    band_energy = cum_energy[edges[1:]] - cum_energy[edges[:-1]]
+    log_energy = np.log10(band_energy + 1e-12)
+    return (log_energy - log_energy.mean()).astype(np.float32)
+
+
+def vector_from_file(rec_path):
+    """
+    fingerprint of a saved recording, from its feature sidecar. A missing or
+    stale sidecar is (re)written first, see features.load_features.
+    """
+    feats = features.load_features(rec_path)
+    return band_vector(feats["freq"], feats["spectrum"])
+
+
+class SpectralIndex:
+    """
+    Inputs
+    ------
+        data_root (str) - DATA_ROOT - root of the data tree, the index files live
+            here and paths are stored relative to it.
+    """
+
+    def __init__(self, data_root=DATA_ROOT):
+        self.data_root = data_root
+        self.index_path = os.path.join(data_root, INDEX_NAME)
+        self.journal_path = os.path.join(data_root, JOURNAL_NAME)
+        self.compacting_path = self.journal_path + ".compacting"
+
+        self.paths = []  # base paths, rows of the tree
+        self.vectors = np.empty([0, N_BANDS], dtype=np.float32)
+        self.tree = None
+        self.new_paths = []  # journal entries, searched by brute force
+        self.new_vectors = np.empty([0, N_BANDS], dtype=np.float32)
+        self._loaded_stamp = None
+
+    # ____________________________ Updates ____________________________#
+    def add(self, rec_path, vector=None):
+        """
+        appends one recording to the journal. Cheap enough to run on every save.
+        """
+        if vector is None:
+            vector = vector_from_file(rec_path)
+        path_bytes = os.path.relpath(rec_path, self.data_root).encode()
+        record = _PATH_LEN.pack(len(path_bytes)) + path_bytes
+        record += np.asarray(vector, dtype="<f4").tobytes()
+        os.makedirs(self.data_root, exist_ok=True)
+        with _journal_lock, open(self.journal_path, "ab") as journal:
+            journal.write(record)
+
+    def rebuild(self, rec_paths):
+        """
+        fingerprints every recording (from sidecars) and writes a fresh base
+        index, the journal is cleared.
+
+        Returns
+        -------
+            count (int) - recordings indexed
+        """
+        paths, vectors = [], []
+        for rec_path in rec_paths:
+            try:
+                vectors.append(vector_from_file(rec_path))
+            except Exception as err:  # unreadable recording, leave it out
+                print(f"skipping {rec_path}: {err}")
+                continue
+            paths.append(os.path.relpath(rec_path, self.data_root))
+        vectors = np.array(vectors, dtype=np.float32).reshape(-1, N_BANDS)
+        with _journal_lock:
+            self._write_base(paths, vectors)
+            for journal_path in (self.journal_path, self.compacting_path):
+                if os.path.exists(journal_path):
+                    os.remove(journal_path)
+        return len(paths)
+
+    def compact(self):
+        """
+        folds the journal into the base index. Holds the journal lock
+        throughout, so takes saved meanwhile wait and then start a new journal
+        instead of being appended to the one being folded in (and lost).
+        """
+        with _journal_lock:
+            if os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.compacting_path)
+            paths, vectors = self._read_base()
+            new_paths, new_vectors = self._read_journal(self.compacting_path)
+            paths += new_paths
+            keep = self._latest(paths)
+            vectors = np.concatenate([vectors, new_vectors])[keep]
+            self._write_base([paths[idx] for idx in keep], vectors)
+            os.remove(self.compacting_path)
+
+    # ____________________________ Queries ____________________________#
+    def load(self):
+        """
+        (re)loads the index if its files changed since the last load
+        """
+        stamp = tuple(
+            os.stat(path).st_mtime_ns if os.path.exists(path) else None
+            for path in (self.index_path, self.journal_path)
+        )
+        if stamp == self._loaded_stamp:
+            return
+        self._loaded_stamp = stamp
+
+        paths, vectors = self._read_base()
+        new_paths, new_vectors = self._read_journal(self.journal_path)
+        n_base = len(paths)
+        paths += new_paths
+        vectors = np.concatenate([vectors, new_vectors])
+        keep = self._latest(paths)
+        base_keep, new_keep = keep[keep < n_base], keep[keep >= n_base]
+
+        self.paths = [paths[idx] for idx in base_keep]
+        self.vectors = vectors[base_keep]
+        self.tree = None
+        if len(self.paths):
+            from sklearn.neighbors import BallTree  # slow import, queries only
+
+            self.tree = BallTree(self.vectors)
+        self.new_paths = [paths[idx] for idx in new_keep]
+        self.new_vectors = vectors[new_keep]
+
+        n_new = len(self.new_paths)
+        if n_new > 100 and n_new > COMPACT_FRACTION * len(self.paths):
+            self.compact()
+
+    def query(self, vector, k=10):
+        """
+        the k closest recordings to a fingerprint.
+
+        Returns
+        -------
+            matches (list of (str, float)) - absolute path and distance, closest
+                first
+        """
+        self.load()
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        dist, paths = [], []
+        if self.tree is not None:
+            tree_dist, tree_idx = self.tree.query(vector, k=min(k, len(self.paths)))
+            dist.extend(tree_dist[0])
+            paths.extend(self.paths[idx] for idx in tree_idx[0])
+        if len(self.new_paths):
+            new_dist = np.linalg.norm(self.new_vectors - vector, axis=1)
+            dist.extend(new_dist)
+            paths.extend(self.new_paths)
+
+        order = np.argsort(dist)[:k]
+        return [
+            (os.path.join(self.data_root, paths[idx]), float(dist[idx]))
+            for idx in order
+        ]
+
+    def query_file(self, rec_path, k=10):
+        """
+        the k recordings closest to a saved recording, itself excluded. Writes
+        rec_path's feature sidecar if it is missing or stale (vector_from_file).
+        """
+        rec_path = os.path.abspath(rec_path)
+        matches = self.query(vector_from_file(rec_path), k=k + 1)
+        matches = [match for match in matches if os.path.abspath(match[0]) != rec_path]
+        return matches[:k]
+
+    # ____________________________ Support ____________________________#
+    def _latest(self, paths):
+        """
+        indices of the last entry of every path, in order, leaving out
+        recordings that no longer exist (loose or packed)
+        """
+        last = {path: idx for idx, path in enumerate(paths)}
+        keep = []
+        for idx in sorted(last.values()):
+            try:
+                rutils.rec_stat(os.path.join(self.data_root, paths[idx]))
+            except FileNotFoundError:
+                continue
+            keep.append(idx)
+        return np.array(keep, dtype=int)
+
+    def _read_base(self):
+        if not os.path.exists(self.index_path):
+            return [], np.empty([0, N_BANDS], dtype=np.float32)
+        with np.load(self.index_path) as data:
+            return data["paths"].tolist(), data["vectors"]
+
+    def _write_base(self, paths, vectors):
+        os.makedirs(self.data_root, exist_ok=True)
+        tmp_path = self.index_path + ".tmp.npz"
+        np.savez(tmp_path, vectors=vectors, paths=np.array(paths, dtype=str))
+        os.replace(tmp_path, self.index_path)
+        self._loaded_stamp = None
+
+    def _read_journal(self, journal_path):
+        """
+        journal records, a half written last record (save in progress) is skipped
+        """
+        paths, vectors = [], []
+        if os.path.exists(journal_path):
+            with open(journal_path, "rb") as journal:
+                raw = journal.read()
+            pos = 0
+            while pos + _PATH_LEN.size <= len(raw):
+                (path_len,) = _PATH_LEN.unpack_from(raw, pos)
+                end = pos + _PATH_LEN.size + path_len + _VECTOR_BYTES
+                if end > len(raw):
+                    break
+                path_end = pos + _PATH_LEN.size + path_len
+                paths.append(raw[pos + _PATH_LEN.size : path_end].decode())
+                vectors.append(np.frombuffer(raw[path_end:end], dtype="<f4"))
+                pos = end
+        vectors = np.array(vectors, dtype=np.float32).reshape(-1, N_BANDS)
+        return paths, vectors
@@ -0,0 +1,177 @@
+"""
+Spectrum engine. One real fft across all channels at once, optional Welch
+(segment averaged) spectra, and a small cache so the same recording is never
+transformed twice.
+"""
+from collections import OrderedDict
+
+import numpy as np
+from scipy import fft as sp_fft
+
+
+def get_window(window, n_samples):
+    """
+    periodic window of n_samples, same as scipy.signal.get_window. boxcar and
+    hann are made here, so scipy.signal (slow to import) only loads for other
+    windows.
+    """
+    if window == "boxcar":
+        return np.ones(n_samples)
+    if window in ("hann", "hanning"):
+        return 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_samples) / n_samples)
+    from scipy.signal import get_window as scipy_get_window
+
+    return scipy_get_window(window, n_samples)
+
+
+def spectrum(raw_data, Fs, window="boxcar", nperseg=None, overlap=0.5):
+    """
+    one-sided magnitude spectrum of every channel.
+
+    Inputs
+    ------
+        raw_data (ndarray) - (samples, channels) recording.
+        Fs (int) - sampling rate.
+        window (str/tuple) - "boxcar" - any window scipy.signal.get_window knows,
+            see get_window.
+        nperseg (int) - None - segment length for Welch averaging. None uses the
+            whole recording as one segment (a plain windowed rfft).
+        overlap (float) - 0.5 - fraction of overlap between Welch segments.
+
+    Returns
+    -------
+        freq_axis (ndarray) - (bins,) frequencies, 0 to Fs/2.
+        freq_mag (ndarray) - (bins, channels) float32 magnitudes. Like the old two
+            sided _fft these are divided by the (window weighted) segment duration
+            so they read as a density.
+    """
+    if raw_data.ndim == 1:
+        raw_data = raw_data[:, np.newaxis]
+    n_samples = raw_data.shape[0]
+    if nperseg is None or nperseg >= n_samples:
+        nperseg = n_samples
+
+    win = get_window(window, nperseg).astype(np.float32)
+    scale = np.float32(Fs / win.sum())  # boxcar: Fs / Ns, same as before
+    signal = raw_data.astype(np.float32, copy=False)
+
+    if nperseg == n_samples:
+        fft_data = sp_fft.rfft(signal * win[:, np.newaxis], axis=0, workers=-1)
+        freq_mag = np.abs(fft_data)
+    else:
+        step = max(1, int(nperseg * (1 - overlap)))
+        # (segments, channels, nperseg) view, no copy until the window multiply
+        segments = np.lib.stride_tricks.sliding_window_view(signal, nperseg, axis=0)
+        segments = segments[::step] * win
+        fft_data = sp_fft.rfft(segments, axis=-1, workers=-1)
+        freq_mag = np.abs(fft_data).mean(axis=0).T
+
+    freq_mag *= scale
+    freq_axis = sp_fft.rfftfreq(nperseg, 1 / Fs)
+    return freq_axis, freq_mag.astype(np.float32, copy=False)
+
+
+class SpectrumCache:
+    """
+    Least recently used cache of spectra. Entries are keyed on the identity of
+    the recording (reed id, save time, shape) plus the spectrum settings, so a
+    repeat plot of the same take is a lookup.
+
+    Inputs
+    ------
+        max_entries (int) - 16 - number of spectra kept.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, rec_key, raw_data, Fs, window="boxcar", nperseg=None):
+        """
+        returns (freq_axis, freq_mag) for raw_data, computing only on a miss.
+        rec_key is anything hashable that identifies the recording.
+        """
+        key = (rec_key, raw_data.shape, Fs, window, nperseg)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        result = spectrum(raw_data, Fs, window=window, nperseg=nperseg)
+        self._entries[key] = result
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        self._entries.clear()
+
+
+class SpectrumWorkspace:
+    """
+    spectrum (whole recording, no Welch) with the float32 input and magnitude
+    buffers reused from one recording to the next, see
+    ReedRecorder(compact=True). Buffers only grow, for a recording longer than
+    any before. The complex fft output is the one allocation left per
+    recording: np.fft.rfft(out=...) allocates more than that internally.
+
+    The returned freq_mag is a view of the workspace: it stays valid until the
+    next get for a different recording overwrites it. Asking again for the same
+    rec_key returns it without redoing the fft.
+
+    Inputs
+    ------
+        n_samples (int) - longest recording expected.
+        channels (int) - channels per recording.
+        window (str/tuple) - "boxcar" - see get_window.
+    """
+
+    def __init__(self, n_samples, channels, window="boxcar"):
+        self.window = window
+        self.key = None
+        self.result = None
+        self._shape = None  # (n_samples, Fs) the window and freq axis are for
+        self._win = None
+        self._freq_axis = None
+        self._allocate(n_samples, channels)
+
+    def _allocate(self, n_samples, channels):
+        self.capacity, self.channels = n_samples, channels
+        self.windowed = np.empty([n_samples, channels], dtype=np.float32)
+        self.freq_mag = np.empty([n_samples // 2 + 1, channels], dtype=np.float32)
+        self.key = None
+
+    def get(self, rec_key, raw_data, Fs):
+        """
+        returns (freq_axis, freq_mag) like spectrum(raw_data, Fs, window)
+        """
+        if raw_data.ndim == 1:
+            raw_data = raw_data[:, np.newaxis]
+        n_samples, channels = raw_data.shape
+        key = (rec_key, raw_data.shape, Fs)
+        if key == self.key:
+            return self.result
+        if n_samples > self.capacity or channels != self.channels:
+            self._allocate(max(n_samples, self.capacity), channels)
+        if self._shape != (n_samples, Fs):
+            self._win = get_window(self.window, n_samples).astype(np.float32)
+            self._freq_axis = sp_fft.rfftfreq(n_samples, 1 / Fs)
+            self._shape = (n_samples, Fs)
+
+        signal = raw_data
+        if self.window != "boxcar" or raw_data.dtype != np.float32:
+            signal = self.windowed[:n_samples]
+            np.copyto(signal, raw_data, casting="same_kind")
+            if self.window != "boxcar":
+                signal *= self._win[:, np.newaxis]
+
+        fft_data = sp_fft.rfft(signal, axis=0, workers=-1)
+        freq_mag = np.abs(fft_data, out=self.freq_mag[: fft_data.shape[0]])
+        freq_mag *= np.float32(Fs / self._win.sum())
+
+        self.key = key
+        self.result = (self._freq_axis, freq_mag)
+        return self.result
@@ -0,0 +1,287 @@
+"""
+On-disk recording format. A .rrec file is a small fixed preamble, a JSON
+header (fingerprint, dtype, shape), then raw little-endian PCM samples in
+(samples, channels) order. Nothing is compressed or pickled, so saving is a
+plain write and reading can memory map the file or read just a window of it.
+
+    bytes 0-15     preamble: b"RREC", version (uint16), reserved (uint16),
+                   header capacity (uint32), reserved (uint32)
+    bytes 16-...   JSON header, space padded to the header capacity
+    data_offset    PCM samples, data_offset = 16 + header capacity (64 aligned)
+
+Convert an existing tree of .npz recordings with:
+
+    python -m reed_reviewer.storage migrate
+"""
+import os
+import json
+import struct
+import argparse
+import numpy as np
+from reed_reviewer.constants import DATA_ROOT
+
+MAGIC = b"RREC"
+VERSION = 1
+PREAMBLE = struct.Struct("<4sHHII")
+EXTENSION = ".rrec"
+INT16_SCALE = 32767
+DTYPES = ("float64", "float32", "int16")
+KEPT_SUFFIX = ".premigrate"  # migrate --keep renames x.npz to x.npz.premigrate
+
+
+def _jsonable(value):
+    """
+    fingerprint values to json types (numpy scalars and arrays to python)
+    """
+    if isinstance(value, np.ndarray) or isinstance(value, np.generic):
+        return value.tolist()
+    raise TypeError(f"can't store {type(value)} in a recording header")
+
+
+def _header_capacity(header_bytes, min_capacity=0):
+    """
+    header bytes rounded up so the sample data starts on a 64 byte boundary
+    """
+    needed = max(len(header_bytes), min_capacity)
+    return -(-(PREAMBLE.size + needed) // 64) * 64 - PREAMBLE.size
+
+
+def encode_header(fingerprint, dtype, n_channels, n_samples, min_capacity=0):
+    """
+    returns the preamble plus padded JSON header as bytes
+    """
+    header = dict(
+        fingerprint=fingerprint,
+        dtype=np.dtype(dtype).newbyteorder("<").str,
+        n_channels=int(n_channels),
+        n_samples=None if n_samples is None else int(n_samples),
+        scale=1 / INT16_SCALE if np.dtype(dtype) == np.int16 else 1.0,
+    )
+    header_bytes = json.dumps(header, default=_jsonable).encode()
+    capacity = _header_capacity(header_bytes, min_capacity)
+    if len(header_bytes) > capacity:
+        raise ValueError("recording header is larger than its capacity")
+    preamble = PREAMBLE.pack(MAGIC, VERSION, 0, capacity, 0)
+    return preamble + header_bytes.ljust(capacity, b" ")
+
+
+def to_dtype(raw_data, dtype):
+    """
+    converts samples for storage. int16 clips to [-1, 1] and scales.
+    """
+    dtype = np.dtype(dtype)
+    if dtype == np.int16:
+        scaled = np.clip(raw_data, -1, 1) * INT16_SCALE
+        return np.round(scaled).astype("<i2")
+    return np.ascontiguousarray(raw_data, dtype=dtype.newbyteorder("<"))
+
+
+def write_rec(rec_path, raw_data, fingerprint, dtype="float32"):
+    """
+    writes a recording.
+
+    Inputs
+    ------
+        rec_path (str) - file path, should end in .rrec.
+        raw_data (ndarray) - (samples, channels) or (samples,) recording.
+        fingerprint (dict) - see ReedRecorder._fingerprint.
+        dtype (str) - "float32" - sample type on disk, one of DTYPES.
+    """
+    if raw_data.ndim == 1:
+        raw_data = raw_data[:, np.newaxis]
+    n_samples, n_channels = raw_data.shape
+    tmp_path = rec_path + ".tmp"  # a crash never leaves a half written rec_path
+    with open(tmp_path, "wb") as rec_file:
+        rec_file.write(encode_header(fingerprint, dtype, n_channels, n_samples))
+        rec_file.write(to_dtype(raw_data, dtype).tobytes())
+    os.replace(tmp_path, rec_path)
+
+
+def read_header(rec_path):
+    """
+    reads just the header of a recording (a few hundred bytes).
+
+    Returns
+    -------
+        header (dict) - fingerprint, dtype, n_channels, n_samples, scale and
+            data_offset. n_samples is worked out from the file size if the
+            recording was never finalized (see long takes).
+    """
+    with open(rec_path, "rb") as rec_file:
+        header = _read_header(rec_file)
+    if header["n_samples"] is None:
+        frame_bytes = np.dtype(header["dtype"]).itemsize * header["n_channels"]
+        data_bytes = os.path.getsize(rec_path) - header["data_offset"]
+        header["n_samples"] = data_bytes // frame_bytes
+    return header
+
+
+def _read_header(rec_file, start=0):
+    rec_file.seek(start)
+    magic, version, _, capacity, _ = PREAMBLE.unpack(rec_file.read(PREAMBLE.size))
+    if magic != MAGIC:
+        raise ValueError(f"{rec_file.name} is not a reed recording")
+    if version > VERSION:
+        raise ValueError(f"{rec_file.name} is a newer recording version ({version})")
+    header = json.loads(rec_file.read(capacity))
+    header["data_offset"] = start + PREAMBLE.size + capacity
+    return header
+
+
+def load_rec(rec_path, mmap_mode=None, offset=0, length=None):
+    """
+    loads a recording, or a window of it. Loose files only, reed_utils.load_rec
+    also finds packed takes.
+
+    Inputs
+    ------
+        rec_path (str) - path of a .rrec file.
+        mmap_mode (str) - None - "r", "r+" or "c" returns a np.memmap over the
+            file instead of reading it. Only pages that are touched are read.
+        offset (int) - 0 - first sample of the window.
+        length (int) - None - samples in the window, None reads to the end.
+
+    Returns
+    -------
+        recording (ndarray) - (samples, channels). int16 files are returned as
+            float32 in [-1, 1], which always copies the window.
+        fingerprint (dict)
+    """
+    header = read_header(rec_path)
+    recording = _load_window(rec_path, header, mmap_mode, offset, length)
+    return recording, header["fingerprint"]
+
+
+def _load_window(rec_path, header, mmap_mode, offset, length):
+    dtype = np.dtype(header["dtype"])
+    n_samples, n_channels = header["n_samples"], header["n_channels"]
+    offset = min(max(0, offset), n_samples)
+    if length is None or offset + length > n_samples:
+        length = n_samples - offset
+    start_byte = header["data_offset"] + offset * n_channels * dtype.itemsize
+
+    if length == 0:
+        data = np.empty([0, n_channels], dtype=dtype)
+    elif mmap_mode is not None:
+        data = np.memmap(
+            rec_path,
+            dtype=dtype,
+            mode=mmap_mode,
+            offset=start_byte,
+            shape=(length, n_channels),
+        )
+    else:
+        data = np.fromfile(
+            rec_path, dtype=dtype, count=length * n_channels, offset=start_byte
+        ).reshape(length, n_channels)
+
+    if dtype == np.int16:
+        data = data.astype(np.float32) * np.float32(header["scale"])
+    return data
+
+
+# ____________________________ Migration ____________________________#
+def migrate_npz(npz_path, dtype="float32", keep=False):
+    """
+    rewrites one savez_compressed recording as a .rrec next to it. The new
+    file keeps the old one's mtime. Returns the new path.
+
+    keep renames the .npz to x.npz.premigrate (KEPT_SUFFIX) instead of
+    deleting it, so it is no longer listed as a recording of its own next to
+    the .rrec (both would share one feature sidecar).
+    """
+    with np.load(npz_path, allow_pickle=True) as data:
+        raw_data = data["recording"]
+        fingerprint = data["fingerprint"].tolist()
+
+    rec_path = os.path.splitext(npz_path)[0] + EXTENSION
+    write_rec(rec_path, raw_data, fingerprint, dtype)
+    stat = os.stat(npz_path)
+    os.utime(rec_path, (stat.st_atime, stat.st_mtime))
+    if keep:
+        os.replace(npz_path, npz_path + KEPT_SUFFIX)
+    else:
+        os.remove(npz_path)
+    return rec_path
+
+
+def recording_dirs(data_root=DATA_ROOT):
+    """
+    the dirs of data_root holding recordings: reed_*, baseline and the
+    archived baselines in archive/*. Everything else (feature sidecars,
+    indexes, timelines, benchmarks) is left alone.
+    """
+    if not os.path.exists(data_root):
+        return []
+    dir_paths = []
+    for sub_dir in sorted(os.listdir(data_root)):
+        dir_path = os.path.join(data_root, sub_dir)
+        if not os.path.isdir(dir_path):
+            continue
+        if sub_dir.startswith("reed_") or sub_dir == "baseline":
+            dir_paths.append(dir_path)
+        elif sub_dir == "archive":
+            dir_paths += [
+                os.path.join(dir_path, name)
+                for name in sorted(os.listdir(dir_path))
+                if os.path.isdir(os.path.join(dir_path, name))
+            ]
+    return dir_paths
+
+
+def migrate_tree(data_root=DATA_ROOT, dtype="float32", keep=False):
+    """
+    migrates every .npz recording in the recording dirs of data_root (see
+    recording_dirs) and updates the catalog.
+
+    Returns
+    -------
+        count (int) - number of recordings migrated
+    """
+    from reed_reviewer.catalog import Catalog
+
+    catalog = Catalog(data_root)
+    count = 0
+    for dir_path in recording_dirs(data_root):
+        for file_name in sorted(os.listdir(dir_path)):
+            if not file_name.endswith(".npz"):
+                continue
+            npz_path = os.path.join(dir_path, file_name)
+            try:
+                rec_path = migrate_npz(npz_path, dtype, keep)
+            except Exception as err:  # leave unreadable files where they are
+                print(f"skipping {npz_path}: {err}")
+                continue
+            catalog.remove(npz_path)
+            if os.path.basename(dir_path).startswith("reed_"):  # takes only
+                header = read_header(rec_path)
+                catalog.add(
+                    rec_path,
+                    header["fingerprint"],
+                    (header["n_samples"], header["n_channels"]),
+                )
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m reed_reviewer.storage",
+        description="reed recording file tools",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    mig = sub.add_parser("migrate", help="convert .npz recordings to .rrec")
+    mig.add_argument("--root", default=DATA_ROOT, help="data tree root")
+    mig.add_argument("--dtype", default="float32", choices=DTYPES)
+    mig.add_argument(
+        "--keep", action="store_true", help=f"keep the .npz files as *{KEPT_SUFFIX}"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        count = migrate_tree(args.root, dtype=args.dtype, keep=args.keep)
+        print(f"migrated {count} recordings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Streaming capture support for ReedRecorder. The audio callback feeds a
+preallocated ring buffer and a trigger cuts takes out of it when the signal
+crosses the save threshold. Nothing in here touches the audio device, so the
+same trigger can be fed from a live stream or from blocks read off of disk.
+"""
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed size, preallocated circular buffer of multichannel samples. Samples
+    are addressed by their absolute index in the stream (number of samples
+    written before them) so callers never deal with wrap around.
+
+    Inputs
+    ------
+        capacity (int) - number of samples (per channel) the buffer holds.
+        channels (int) - number of channels.
+        dtype (numpy dtype) - float32 - sample type of the buffer.
+    """
+
+    def __init__(self, capacity, channels, dtype=np.float32):
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        self.data = np.zeros([self.capacity, self.channels], dtype=dtype)
+        self.total = 0  # absolute count of samples written
+
+    def write(self, block):
+        """
+        copy a (frames, channels) block into the buffer, wrapping as needed.
+        Blocks longer than the buffer only keep their newest samples.
+        """
+        n_frames = block.shape[0]
+        if n_frames >= self.capacity:
+            block = block[-self.capacity :]
+            self.total += n_frames - self.capacity
+            n_frames = self.capacity
+
+        start = self.total % self.capacity
+        first = min(n_frames, self.capacity - start)
+        self.data[start : start + first] = block[:first]
+        self.data[: n_frames - first] = block[first:]
+        self.total += n_frames
+
+    def oldest(self):
+        """
+        absolute index of the oldest sample still held in the buffer
+        """
+        return max(0, self.total - self.capacity)
+
+    def read(self, start_abs, stop_abs):
+        """
+        returns a copy of samples [start_abs, stop_abs). The range is clipped
+        to what is still held in the buffer.
+        """
+        start_abs = max(start_abs, self.oldest())
+        stop_abs = min(stop_abs, self.total)
+        n_frames = max(0, stop_abs - start_abs)
+
+        start = start_abs % self.capacity
+        first = min(n_frames, self.capacity - start)
+        out = np.empty([n_frames, self.channels], dtype=self.data.dtype)
+        out[:first] = self.data[start : start + first]
+        out[first:] = self.data[: n_frames - first]
+        return out
+
+
+class StreamTrigger:
+    """
+    Cuts takes out of a continuous stream. A take starts the first time any
+    channel crosses rms_thresh and ends once the signal has stayed under the
+    threshold for post_roll_sec (or the take reaches max_take_sec). Every take
+    also keeps pre_roll_sec of audio from before the trigger so note attacks
+    aren't clipped.
+
+    Inputs
+    ------
+        Fs (int) - sampling rate of the stream.
+        channels (int) - number of channels in each block.
+        rms_thresh (float or ndarray) - amplitude threshold, same meaning as
+            ReedRecorder.rms_thresh. A per-channel array also works.
+        pre_roll_sec (float) - audio kept from before the trigger.
+        post_roll_sec (float) - quiet time that ends a take.
+        max_take_sec (float) - longest take that will be cut. Sizes the ring.
+    """
+
+    def __init__(
+        self,
+        Fs,
+        channels,
+        rms_thresh,
+        pre_roll_sec=0.1,
+        post_roll_sec=0.25,
+        max_take_sec=5,
+    ):
+        self.Fs = Fs
+        self.rms_thresh = rms_thresh
+        self.pre_roll = int(pre_roll_sec * Fs)
+        self.post_roll = int(post_roll_sec * Fs)
+        self.max_take = int(max_take_sec * Fs)
+
+        capacity = self.max_take + self.pre_roll + self.post_roll
+        self.ring = RingBuffer(capacity, channels)
+
+        self.active = False  # currently inside a take
+        self.take_start = 0  # absolute sample index
+        self.last_loud = 0  # absolute sample index of last sample over thresh
+        self.last_stop = 0  # absolute sample index where the last take ended
+        self.last_start = 0  # absolute sample index where the last take began
+
+    def push(self, block):
+        """
+        feed one (frames, channels) block. Returns a list of finished takes,
+        usually empty. Each take is a (frames, channels) float32 array.
+        """
+        block_start = self.ring.total
+        self.ring.write(block)
+
+        loud = np.flatnonzero((np.abs(block) > self.rms_thresh).any(axis=1))
+
+        takes = []
+        if loud.size > 0:
+            if not self.active:
+                self.active = True
+                self.take_start = max(
+                    block_start + loud[0] - self.pre_roll,
+                    self.ring.oldest(),
+                    self.last_stop,
+                )
+            self.last_loud = block_start + loud[-1]
+
+        if self.active:
+            quiet_for = self.ring.total - 1 - self.last_loud
+            take_len = self.ring.total - self.take_start
+            if quiet_for >= self.post_roll or take_len >= self.max_take:
+                stop = min(
+                    self.last_loud + 1 + self.post_roll,
+                    self.take_start + self.max_take,
+                    self.ring.total,
+                )
+                takes.append(self.ring.read(self.take_start, stop))
+                self.last_start = self.take_start
+                self.last_stop = stop
+                self.active = False
+
+        return takes
+
+    def flush(self):
+        """
+        end the stream. Returns the take in progress, if there is one.
+        """
+        takes = []
+        if self.active:
+            takes.append(self.ring.read(self.take_start, self.ring.total))
+            self.last_start = self.take_start
+            self.active = False
+        return takes
@@ -0,0 +1,266 @@
+"""
+Per-reed development timeline. For every take of a reed: spectral centroid,
+dominant frequency, band energies and dB against baseline, over save_time.
+
+The timeline is kept in DATA_ROOT/timelines/reed_<id>.npz together with running
+aggregates (count, mean, variance per metric) and the catalog key of every
+take in it. update only analyses takes the timeline doesn't have yet (see
+catalog.sync_rows), so opening it after a session costs the new takes, not
+the whole history; takes removed or rewritten since are dropped. Metrics come
+from the feature sidecars, not the raw audio, and a new FEATURE_HASH starts the
+timeline over.
+"""
+import os
+import weakref
+import numpy as np
+
+import reed_reviewer.features as features
+import reed_reviewer.reed_utils as rutils
+from reed_reviewer.constants import DATA_ROOT, CLOCK_PRECISION
+from reed_reviewer.catalog import sync_rows, row_key
+
+# band edges (Hz) of the band energy series
+BAND_EDGES_HZ = np.array([0, 250, 500, 1000, 2000, 4000, 8000, 16000, 20000])
+BAND_LABELS = [
+    f"{lo / 1000:g}-{hi / 1000:g} kHz"
+    for lo, hi in zip(BAND_EDGES_HZ, BAND_EDGES_HZ[1:])
+]
+SCALARS = ("centroid", "dominant", "db")  # per take metrics with running aggregates
+SERIES = ("save_time", "keys", "bands") + SCALARS  # one entry per take
+
+_panels = weakref.WeakKeyDictionary()  # figure -> its three timeline axes
+
+
+def take_metrics(feats):
+    """
+    timeline metrics of one take from its features (see features.load_features)
+
+    Returns
+    -------
+        metrics (dict) - centroid (Hz), dominant (Hz), db (mean over channels),
+            bands (dB energy per BAND_EDGES_HZ band)
+    """
+    freq = feats["freq"]
+    mag = feats["spectrum"].mean(axis=1).astype(np.float64)
+    total = mag.sum()
+    centroid = float((freq * mag).sum() / total) if total > 0 else np.nan
+
+    energy = np.square(mag)
+    edges = np.searchsorted(freq, BAND_EDGES_HZ)
+    cum_energy = np.concatenate([[0], np.cumsum(energy)])
+    band_energy = cum_energy[edges[1:]] - cum_energy[edges[:-1]]
+    return dict(
+        centroid=centroid,
+        dominant=float(freq[np.argmax(mag)]),
+        db=float(np.mean(feats["db"])),
+        bands=10 * np.log10(band_energy + 1e-12),
+    )
+
+
+class Timeline:
+    """
+    Inputs
+    ------
+        reed_id (int/str) - reed number.
+        data_root (str) - DATA_ROOT - root of the data tree.
+    """
+
+    def __init__(self, reed_id, data_root=DATA_ROOT):
+        self.id = str(reed_id)
+        self.path = os.path.join(data_root, "timelines", f"reed_{self.id}.npz")
+        n_bands = len(BAND_LABELS)
+
+        self.save_time = np.empty(0, dtype=np.int64)
+        self.keys = np.empty(0, dtype=str)  # catalog.row_key of each take
+        self.centroid = np.empty(0)
+        self.dominant = np.empty(0)
+        self.db = np.empty(0)
+        self.bands = np.empty([0, n_bands])
+        # running aggregates (count, mean, sum of squared deviations) per scalar
+        self.count = np.zeros(len(SCALARS), dtype=np.int64)
+        self.mean = np.zeros(len(SCALARS))
+        self.m2 = np.zeros(len(SCALARS))
+        self._load()
+
+    def update(self, recordings):
+        """
+        brings the timeline in line with the catalog: takes it doesn't have are
+        analysed and added, takes no longer in recordings (or rewritten) are
+        dropped. Saves if anything changed.
+
+        Inputs
+        ------
+            recordings (list of dict) - every catalog row of the reed, see
+                Catalog.recordings. Only rows not in the timeline are read.
+
+        Returns
+        -------
+            n_new (int) - takes added
+        """
+        keep, new_rows = sync_rows(self.keys, recordings)
+        removed = not keep.all()
+        if removed:
+            for name in SERIES:
+                setattr(self, name, getattr(self, name)[keep])
+
+        save_times, keys, metrics = [], [], []
+        for row in new_rows:
+            try:
+                feats = features.load_features(row["path"])
+            except Exception as err:  # unreadable recording, leave it out
+                print(f"skipping {row['path']}: {err}")
+                continue
+            save_times.append(row["save_time"])
+            keys.append(row_key(row))
+            metrics.append(take_metrics(feats))
+        if not metrics and not removed:
+            return 0
+
+        if metrics:
+            self.save_time = np.append(self.save_time, save_times)
+            self.keys = np.append(self.keys, keys)
+            for name in SCALARS:
+                values = [take[name] for take in metrics]
+                setattr(self, name, np.append(getattr(self, name), values))
+            self.bands = np.vstack([self.bands] + [take["bands"] for take in metrics])
+            order = np.argsort(self.save_time, kind="stable")  # late arrivals
+            for name in SERIES:
+                setattr(self, name, getattr(self, name)[order])
+
+        if removed:  # running aggregates can't drop takes, start them over
+            self.count[:], self.mean[:], self.m2[:] = 0, 0, 0
+            self._aggregate(np.column_stack([getattr(self, name) for name in SCALARS]))
+        else:
+            batch = [[take[name] for name in SCALARS] for take in metrics]
+            self._aggregate(np.array(batch))
+        self._save()
+        return len(metrics)
+
+    def summary(self):
+        """
+        running mean and standard deviation of the scalar metrics
+
+        Returns
+        -------
+            summary (dict) - name -> (count, mean, std)
+        """
+        std = np.sqrt(self.m2 / np.maximum(self.count - 1, 1))
+        return {
+            name: (int(self.count[idx]), float(self.mean[idx]), float(std[idx]))
+            for idx, name in enumerate(SCALARS)
+        }
+
+    def times(self):
+        """
+        save_time as datetime64 (for plotting)
+        """
+        seconds = self.save_time * CLOCK_PRECISION
+        return (seconds * 1e3).astype("datetime64[ms]")
+
+    def plot(self, fig=None):
+        """
+        three panels, same look as ReedRecorder.plot: pitch-ish frequencies
+        (centroid and dominant), band energies, and dB against baseline.
+
+        In a shared figure the axes of other views (plotting.RecordingPlot) are
+        hidden, not removed, so they come back as they were when shown again.
+
+        Inputs
+        ------
+        fig (matplotlib.figure.Figure) - None - figure to draw into, made if None.
+        """
+        if fig is None:
+            import matplotlib.pyplot as plt  # only when there's no figure to draw into
+
+            fig = plt.figure(figsize=(10, 10))
+        ax = _timeline_axes(fig)
+
+        t = self.times()
+        ax[0].plot(t, self.centroid, ".-", label="Spectral centroid")
+        ax[0].plot(t, self.dominant, ".--", label="Dominant frequency")
+        ax[0].legend(fontsize=9, frameon=False)
+        for idx, label in enumerate(BAND_LABELS):
+            ax[1].plot(t, self.bands[:, idx], ".-", label=label, alpha=0.8)
+        ax[1].legend(fontsize=7, frameon=False, ncol=4)
+        ax[2].plot(t, self.db, ".-", color="g")
+
+        title_size = 15
+        titles = [
+            f"Reed {self.id} Development",
+            "Band Energies",
+            "Level (dB against baseline)",
+        ]
+        ylabels = ["Frequency", "Energy (dB)", "dB"]
+        for an_ax, title, ylabel in zip(ax, titles, ylabels):
+            an_ax.set_title(title, fontsize=title_size)
+            an_ax.set_ylabel(ylabel)
+            an_ax.grid(color="k", alpha=0.1)
+            an_ax.spines["top"].set_visible(False)
+            an_ax.spines["right"].set_visible(False)
+            an_ax.spines["left"].set_visible(False)
+        ax[2].set_xlabel("Save time")
+        fig.autofmt_xdate()
+        fig.tight_layout()
+        return fig
+
+    # ____________________________ Support ____________________________#
+    def _aggregate(self, values):
+        """
+        merges a batch of (takes, SCALARS) values into the running aggregates
+        (Chan et al. parallel variance update), nans are skipped
+        """
+        for idx in range(len(SCALARS)):
+            batch = values[:, idx]
+            batch = batch[~np.isnan(batch)]
+            if batch.size == 0:
+                continue
+            n_a, n_b = self.count[idx], batch.size
+            mean_b = batch.mean()
+            m2_b = np.square(batch - mean_b).sum()
+            delta = mean_b - self.mean[idx]
+            n_ab = n_a + n_b
+            self.mean[idx] += delta * n_b / n_ab
+            self.m2[idx] += m2_b + delta**2 * n_a * n_b / n_ab
+            self.count[idx] = n_ab
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            if "keys" not in data or str(data["feature_hash"]) != features.FEATURE_HASH:
+                return  # made by older code or from older sidecars, start over
+            for name in SERIES + ("count", "mean", "m2"):
+                setattr(self, name, data[name])
+
+    def _save(self):
+        rutils.check_add_dir(os.path.dirname(self.path))
+        np.savez(
+            self.path,
+            feature_hash=features.FEATURE_HASH,
+            save_time=self.save_time,
+            keys=self.keys,
+            centroid=self.centroid,
+            dominant=self.dominant,
+            db=self.db,
+            bands=self.bands,
+            count=self.count,
+            mean=self.mean,
+            m2=self.m2,
+        )
+
+
+def _timeline_axes(fig):
+    """
+    the (cleared) timeline panels of fig, made the first time or if they have
+    been pulled out of the figure since. Every other axes of fig is hidden.
+    """
+    ax = _panels.get(fig)
+    if ax is None or any(an_ax not in fig.axes for an_ax in ax):
+        ax = [fig.add_subplot(311)]
+        ax += [fig.add_subplot(312, sharex=ax[0]), fig.add_subplot(313, sharex=ax[0])]
+        _panels[fig] = ax
+    for an_ax in fig.axes:
+        an_ax.set_visible(an_ax in ax)
+    for an_ax in ax:
+        an_ax.clear()
+    return ax
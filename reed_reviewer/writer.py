@@ -0,0 +1,98 @@
+"""
+Background writer. Saves are queued and written by a worker thread so capture
+and the UI never wait on the disk. The queue is bounded: when the disk falls
+behind, submit blocks (backpressure) instead of letting takes pile up in RAM.
+Everything still queued is written before the interpreter exits.
+"""
+import atexit
+import queue
+import threading
+import traceback
+
+_shared_queue = None
+_shared_lock = threading.Lock()
+
+
+class SaveQueue:
+    """
+    Bounded job queue drained by a single worker thread.
+
+    Inputs
+    ------
+        maxsize (int) - 16 - jobs that can wait before submit blocks.
+        put_timeout (float) - None - seconds submit waits for room. None waits
+            as long as it takes, otherwise queue.Full is raised.
+        on_error (callable) - None - called as on_error(err, description) on the
+            worker thread when a job raises. None prints the traceback.
+    """
+
+    def __init__(self, maxsize=16, put_timeout=None, on_error=None):
+        self.put_timeout = put_timeout
+        self.on_error = on_error
+        self.errors = []  # (description, exception) of failed jobs
+        self.written = 0
+
+        self._jobs = queue.Queue(maxsize=maxsize)
+        self._worker = threading.Thread(target=self._drain, daemon=True)
+        self._worker.start()
+        self._closed = False
+        atexit.register(self.close)
+
+    def submit(self, description, fn, *args, **kwargs):
+        """
+        queues fn(*args, **kwargs). description shows up in error reports.
+        Blocks while the queue is full.
+        """
+        if self._closed:
+            raise RuntimeError("save queue is closed")
+        self._jobs.put((description, fn, args, kwargs), timeout=self.put_timeout)
+
+    def pending(self):
+        return self._jobs.qsize()
+
+    def flush(self):
+        """
+        blocks until every queued job has been written
+        """
+        self._jobs.join()
+
+    def close(self):
+        """
+        writes what is queued and stops the worker
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._jobs.put(None)
+        self._worker.join()
+
+    def _drain(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    return
+                description, fn, args, kwargs = job
+                try:
+                    fn(*args, **kwargs)
+                    self.written += 1
+                except Exception as err:  # keep writing the rest of the queue
+                    self.errors.append((description, err))
+                    if self.on_error is None:
+                        print(f"save failed: {description}")
+                        traceback.print_exc()
+                    else:
+                        self.on_error(err, description)
+            finally:
+                self._jobs.task_done()
+
+
+def shared_save_queue():
+    """
+    the process wide SaveQueue every ReedRecorder writes through by default
+    """
+    global _shared_queue
+    with _shared_lock:
+        if _shared_queue is None or _shared_queue._closed:
+            _shared_queue = SaveQueue()
+        return _shared_queue
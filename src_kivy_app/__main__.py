@@ -18,6 +18,9 @@ QUESTIONS:
 
 """
 import time
+
+START_TIME = time.perf_counter()  # for the startup report in on_start
+
 import os
 import kivy
 
@@ -25,6 +28,7 @@ kivy.require("1.11.0")
 
 from kivy.app import App
 from kivy.config import Config
+from kivy.clock import Clock
 
 ICON_PATH = os.path.join("app_images", "oboeapp.icns")
 Config.set("kivy", "window_icon", ICON_PATH)
@@ -39,16 +43,23 @@ from kivy.properties import ObjectProperty
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
-from kivy_garden.matplotlib.backend_kivyagg import FigureCanvas, NavigationToolbar2Kivy
-
-import matplotlib
-
-matplotlib.use("module://kivy_garden.matplotlib.backend_kivy")
-
-import matplotlib.pyplot as plt
+from kivy.uix.label import Label
+from kivy.uix.popup import Popup
+from kivy.factory import Factory
 
-import reed_reviewer.recorder as rec
 import reed_reviewer.reed_utils as rutils
+import reed_reviewer.instrument as instrument
+from reed_reviewer.constants import DATA_ROOT
+from reed_reviewer.writer import shared_save_queue
+from src_kivy_app.tasks import TaskRunner
+
+# matplotlib, the recorder and the live analyzer are slow to import. Their
+# widgets are registered by module name, kivy imports the module the first time
+# a screen that uses them is built (see ReedTrackerApp.switch_to).
+Factory.register("RecorderFigure", module="src_kivy_app.figure")
+Factory.register("SpectrogramView", module="src_kivy_app.live_view")
+Factory.register("LiveWindow", module="src_kivy_app.live_view")
+Factory.register("TimingOverlay", module="src_kivy_app.overlay")
 
 # TODO: find a way to have this in separate .kv file that pyinstaller can still see
 Builder.load_string(
@@ -70,15 +81,23 @@ Builder.load_string(
                 on_release:
                     root.set_reed()
                     root.manager.transition.direction = "left"
-                    app.root.current = "reedrecorder"
+                    app.switch_to("reedrecorder")
 <RecorderWindow>:
     figure: rec_figure
+    status: status
+    timings: timings
 
     name: "reedrecorder"
     BoxLayout:
         orientation: "vertical"
         RecorderFigure:
             id: rec_figure
+        Label:
+            id: status
+            text: "ready"
+            size_hint_y: .04
+        TimingOverlay:
+            id: timings
         BoxLayout:
             orientation: "horizontal"
             size_hint_y: .1
@@ -86,26 +105,78 @@ Builder.load_string(
                 text: "Plot Last Recording"
                 on_release:
                     root.figure.bring_in_reedrecorder()
+            Button:
+                text: "Reed Timeline"
+                on_release:
+                    root.figure.bring_in_timeline()
+            ToggleButton:
+                text: "Compare History"
+                on_state:
+                    root.figure.compare_history(self.state == "down")
             Button:
                 text: "Record"
                 on_release:
                     root.listen()
+            ToggleButton:
+                id: auto_record
+                text: "Auto Record"
+                on_state:
+                    root.auto_listen(self.state == "down")
+            ToggleButton:
+                id: long_take_toggle
+                text: "Long Take"
+                on_state:
+                    root.long_take(self.state == "down")
             Button:
                 text: "Set Room Volume"
                 on_release:
                     root.threshold()
+            ToggleButton:
+                id: timings_toggle
+                text: "Timings"
+                on_state:
+                    root.timings.show(self.state == "down")
+            Button:
+                text: "Live View"
+                on_release:
+                    root.manager.transition.direction = "left"
+                    app.switch_to("liveview")
             Button:
                 text: "Change Reed"
                 on_release:
                     root.manager.transition.direction = "right"
-                    app.root.current = "welcomewindow"
+                    app.switch_to("welcomewindow")
+<LiveWindow>:
+    name: "liveview"
+    BoxLayout:
+        orientation: "vertical"
+        SpectrogramView:
+            id: spectrogram
+        BoxLayout:
+            orientation: "horizontal"
+            size_hint_y: .05
+            ProgressBar:
+                id: meter_left
+                max: 60
+            ProgressBar:
+                id: meter_right
+                max: 60
+            Label:
+                id: peak
+                text: ""
+                size_hint_x: .3
+        BoxLayout:
+            orientation: "horizontal"
+            size_hint_y: .1
+            Button:
+                text: "Back"
+                on_release:
+                    root.manager.transition.direction = "right"
+                    app.switch_to("reedrecorder")
 
 """
 )
 
-HOME = os.path.expanduser("~")
-DATA_ROOT = os.path.join(HOME, ".reed_reviewer_data")
-
 
 def window_sizer(width, height):
     """
@@ -135,27 +206,6 @@ def clear_baseline_recordings():
         os.rename(baseline_path, archive_path)
 
 
-class RecorderFigure(FigureCanvas):
-    """
-    Ok so this is a hack solution to a kinda frustrating issue with kivy.  To
-    be used in .kv a Widget can't have a positional argument FigureCanvas does,
-    it requires figure as an argument). I have written this class that
-    automatically brings in an already instantiated figure. This gets around
-    the frustrations of FigureCanvas and allows me to work in .kv for
-    formatting. Nice!
-    """
-
-    def __init__(self, **kwargs):
-        app = App.get_running_app()
-        self.fig = app.global_fig
-        super(RecorderFigure, self).__init__(self.fig, **kwargs)
-
-    def bring_in_reedrecorder(self, **kwargs):
-        app = App.get_running_app()
-        app.global_recorder.plot(self.fig)
-        self.draw_idle()
-
-
 class WelcomeWindow(Screen):
     def __init__(self):
         super(WelcomeWindow, self).__init__()
@@ -178,30 +228,181 @@ class RecorderWindow(Screen):
 
     def on_pre_enter(self):
         app = App.get_running_app()
-        app.global_recorder = rec.ReedRecorder(app.global_reed_id, rec_duration_sec=0.5)
+        app.load_recorder(app.global_reed_id)
         window_sizer(800, 800)
 
     def threshold(self):
         app = App.get_running_app()
-        app.global_recorder.set_thresh()
+        app.tasks.submit(
+            "audio",
+            "setting room volume",
+            app.global_recorder.set_thresh,
+            supersede=False,
+        )
 
     def listen(self):
+        """
+        records on the "audio" lane. A new take makes any pending plot stale, so
+        that is dropped and the take is plotted once it's in.
+        """
+        app = App.get_running_app()
+        app.tasks.cancel("plot")
+        app.tasks.submit(
+            "audio",
+            "recording",
+            app.global_recorder.listen,
+            on_done=lambda result: self.figure.bring_in_reedrecorder(),
+            supersede=False,
+        )
+
+    def show_busy(self, running):
+        """
+        in-progress indicator, running maps lane to what it's doing
+        """
+        if running:
+            self.status.text = ", ".join(running.values()) + "..."
+        else:
+            self.status.text = "ready"
+
+    def auto_listen(self, on):
+        """
+        continuous capture, every take that crosses threshold is saved and plotted
+        """
+        app = App.get_running_app()
+        if on:
+            app.global_recorder.stream_listen(on_take=self._on_take)
+        else:
+            app.global_recorder.stop_stream()
+
+    def long_take(self, on):
+        """
+        records everything (no threshold) to one file until toggled off, for a
+        whole practice session. Stopping finalizes the file on the "audio" lane.
+        """
         app = App.get_running_app()
-        app.global_recorder.listen()
+        if on:
+            app.global_recorder.start_long_take()
+        else:
+            app.tasks.submit(
+                "audio",
+                "saving long take",
+                app.global_recorder.stop_long_take,
+                supersede=False,
+            )
+
+    def _on_take(self, recorder):
+        # called off the main thread, kivy widgets must be touched from the main thread
+        Clock.schedule_once(lambda dt: self.figure.bring_in_reedrecorder())
+
+    def on_leave(self):
+        """
+        stops capture by releasing the toggles, so their handlers run as if
+        clicked: the stream stops and a long take is finalized on the "audio"
+        lane, not on the UI thread, and the buttons read right on return
+        """
+        for toggle in ("auto_record", "long_take_toggle", "timings_toggle"):
+            self.ids[toggle].state = "normal"
 
 
 class ReedTrackerApp(App):
+    """
+    Nothing heavy happens until it's needed: the recorder screen (matplotlib),
+    the live screen and the recorder itself are made the first time they are
+    used. The welcome window only needs kivy.
+    """
+
     global_reed_id = 0
-    global_recorder = rec.ReedRecorder(1, rec_duration_sec=1)
-    global_fig = plt.figure()
+
+    def __init__(self, **kwargs):
+        super(ReedTrackerApp, self).__init__(**kwargs)
+        self._recorder = None
+        self._fig = None
+        self.screens = {}  # name -> screen, made on first switch_to
+
+    @property
+    def global_recorder(self):
+        if self._recorder is None:
+            self.load_recorder(self.global_reed_id)
+        return self._recorder
+
+    @property
+    def global_fig(self):
+        if self._fig is None:
+            from src_kivy_app.figure import make_figure
+
+            self._fig = make_figure()
+        return self._fig
+
+    def load_recorder(self, reed_id):
+        """
+        the recorder of reed_id, kept while the reed doesn't change. A new reed's
+        recorder reuses the baseline already loaded (see recorder._baseline_cache).
+        """
+        if self._recorder is None or self._recorder.get_id() != str(reed_id):
+            from reed_reviewer.recorder import ReedRecorder
+
+            if self._recorder is not None:
+                self._recorder.stop_stream()
+                self._recorder.stop_long_take()
+            self._recorder = ReedRecorder(reed_id, rec_duration_sec=0.5, compact=True)
+        return self._recorder
+
+    def switch_to(self, name):
+        """
+        shows screen name, building it first if this is its first showing
+        """
+        if name not in self.screens:
+            make_screen = {
+                "reedrecorder": RecorderWindow,
+                "liveview": lambda: Factory.LiveWindow(),
+            }[name]
+            self.screens[name] = make_screen()
+            self.root.add_widget(self.screens[name])
+        self.root.current = name
+
+    def show_busy(self, running):
+        recorder_window = self.screens.get("reedrecorder")
+        if recorder_window is not None:
+            recorder_window.show_busy(running)
 
     def build(self):
         clear_baseline_recordings()
+        shared_save_queue().on_error = self.report_save_error
         sm = ScreenManager()
-        sm.add_widget(WelcomeWindow())
-        sm.add_widget(RecorderWindow())
+        self.screens["welcomewindow"] = WelcomeWindow()
+        sm.add_widget(self.screens["welcomewindow"])
+        self.tasks = TaskRunner(on_busy=self.show_busy)
         return sm
 
+    def on_start(self):
+        startup = time.perf_counter() - START_TIME
+        instrument.observe("startup", startup)
+        print(f"window up {startup:.2f} s after import")
+
+    def on_stop(self):
+        self.tasks.shutdown()
+        if self._recorder is not None:
+            self._recorder.stop_stream()
+            self._recorder.stop_long_take()
+        # don't lose takes still waiting on the writer
+        shared_save_queue().flush()
+        # this session's span timings, DATA_ROOT/instrument
+        instrument.shared_instruments().save_session(DATA_ROOT)
+
+    def report_save_error(self, err, description):
+        """
+        called on the writer thread when a save fails, pops up on the main thread
+        """
+
+        def show(dt):
+            Popup(
+                title="Save failed",
+                content=Label(text=f"{description}\n{err}"),
+                size_hint=(0.8, 0.4),
+            ).open()
+
+        Clock.schedule_once(show)
+
 
 def main():  # this is called by entry_point.py
     # clear baseline dir
@@ -0,0 +1,111 @@
+"""
+The matplotlib side of the app. Importing matplotlib, its kivy backend and the
+recorder / reviewer takes a good part of a second, so this module is only
+loaded once the recorder screen is first shown (RecorderFigure is registered
+with the kivy Factory by module name, see __main__).
+"""
+from kivy.app import App
+
+import matplotlib
+
+matplotlib.use("module://kivy_garden.matplotlib.backend_kivy")
+
+import matplotlib.pyplot as plt
+from kivy_garden.matplotlib.backend_kivyagg import FigureCanvas
+
+from reed_reviewer.reviewer import ReedReviewer
+from reed_reviewer.plotting import RecordingPlot
+
+
+def make_figure():
+    """
+    the figure every plot in the app draws into
+    """
+    return plt.figure()
+
+
+class RecorderFigure(FigureCanvas):
+    """
+    Ok so this is a hack solution to a kinda frustrating issue with kivy.  To
+    be used in .kv a Widget can't have a positional argument FigureCanvas does,
+    it requires figure as an argument). I have written this class that
+    automatically brings in an already instantiated figure. This gets around
+    the frustrations of FigureCanvas and allows me to work in .kv for
+    formatting. Nice!
+    """
+
+    def __init__(self, **kwargs):
+        app = App.get_running_app()
+        self.fig = app.global_fig
+        super(RecorderFigure, self).__init__(self.fig, **kwargs)
+
+    def bring_in_reedrecorder(self, **kwargs):
+        """
+        fft and plot prep run on the "plot" lane, drawing happens back on the
+        main thread once they're done
+        """
+        app = App.get_running_app()
+        recorder = app.global_recorder
+        app.tasks.submit(
+            "plot",
+            "plotting",
+            recorder.plot_data,
+            on_done=lambda data: self.draw_recording(recorder, data),
+        )
+
+    def draw_recording(self, recorder, data):
+        recorder.plot(self.fig, data)
+        self.draw_idle()
+
+    def bring_in_timeline(self, **kwargs):
+        """
+        the reed's development timeline. Bringing it up to date (only takes since
+        it was last opened) runs on the "plot" lane.
+        """
+        app = App.get_running_app()
+        reviewer = ReedReviewer(app.global_recorder.get_id())
+        app.tasks.submit(
+            "plot", "updating timeline", reviewer.timeline, on_done=self.draw_timeline
+        )
+
+    def draw_timeline(self, reed_timeline):
+        reed_timeline.plot(self.fig)
+        self.draw_idle()
+
+    def compare_history(self, on):
+        """
+        "Compare History" toggle: overlay of the reed's past spectra on or off
+        """
+        if on:
+            self.bring_in_history()
+        else:
+            self.clear_history()
+
+    def bring_in_history(self, **kwargs):
+        """
+        the last recording with the reed's past spectra behind it. Updating the
+        history and the plot prep run on the "plot" lane.
+        """
+        app = App.get_running_app()
+        recorder = app.global_recorder
+        reviewer = ReedReviewer(recorder.get_id())
+
+        def prepare():
+            return recorder.plot_data(), reviewer.spectrum_history()
+
+        app.tasks.submit(
+            "plot",
+            "loading history",
+            prepare,
+            on_done=lambda result: self.draw_history(recorder, *result),
+        )
+
+    def draw_history(self, recorder, data, reed_history):
+        plot = RecordingPlot.for_figure(self.fig)
+        plot.show_history(reed_history)
+        recorder.plot(self.fig, data)
+        self.draw_idle()
+
+    def clear_history(self, **kwargs):
+        RecordingPlot.for_figure(self.fig).clear_history()
+        self.draw_idle()
@@ -0,0 +1,129 @@
+"""
+Live view screen: a rolling spectrogram and a level meter fed straight from
+the microphone. The spectrogram is a texture that new STFT columns are blitted
+into in place (a circular buffer); scrolling is done by shifting the texture
+coordinates, so nothing is re-plotted.
+"""
+import numpy as np
+from matplotlib import colormaps
+
+from kivy.clock import Clock
+from kivy.graphics import Color, Rectangle
+from kivy.graphics.texture import Texture
+from kivy.uix.screenmanager import Screen
+from kivy.uix.widget import Widget
+
+from reed_reviewer.live import LiveSpectrogram, DB_FLOOR
+
+FRAME_RATE = 30  # ui updates per second
+MAX_COLUMNS_PER_FRAME = 8  # older columns are dropped past this
+METER_RANGE_DB = 60  # meter shows the top 60 dB
+
+
+class SpectrogramView(Widget):
+    """
+    Inputs
+    ------
+        n_columns (int) - 400 - columns of history shown.
+    """
+
+    def __init__(self, n_columns=400, **kwargs):
+        super(SpectrogramView, self).__init__(**kwargs)
+        self.n_columns = n_columns
+        self.cursor = 0  # column the next update is written to
+        self.texture = None
+        self.rect = None
+        lut = colormaps["magma"](np.linspace(0, 1, 256))[:, :3]
+        self.lut = np.round(lut * 255).astype(np.uint8)
+        self.bind(pos=self._place, size=self._place)
+
+    def setup(self, n_bins):
+        """
+        (re)makes a blank texture n_columns wide and n_bins tall
+        """
+        self.texture = Texture.create(size=(self.n_columns, n_bins), colorfmt="rgb")
+        self.texture.wrap = "repeat"
+        blank = np.zeros([n_bins, self.n_columns, 3], dtype=np.uint8)
+        self.texture.blit_buffer(blank.tobytes(), colorfmt="rgb", bufferfmt="ubyte")
+        self.cursor = 0
+
+        self.canvas.clear()
+        with self.canvas:
+            Color(1, 1, 1)
+            self.rect = Rectangle(texture=self.texture, pos=self.pos, size=self.size)
+        self._scroll()
+
+    def add_columns(self, columns):
+        """
+        blits (n_columns, n_bins) dB columns in at the cursor
+        """
+        if self.texture is None or columns.shape[0] == 0:
+            return
+        columns = columns[-self.n_columns :]
+        n_bins = columns.shape[1]
+        shade = (columns - DB_FLOOR) * (255 / -DB_FLOOR)
+        shade = np.clip(shade, 0, 255).astype(np.uint8)
+        # texture rows are bins (low frequencies at the bottom), columns are time
+        rgb = np.ascontiguousarray(self.lut[shade].transpose(1, 0, 2))
+
+        first = min(rgb.shape[1], self.n_columns - self.cursor)
+        for x_pos, piece in [(self.cursor, rgb[:, :first]), (0, rgb[:, first:])]:
+            if piece.shape[1] == 0:
+                continue
+            self.texture.blit_buffer(
+                np.ascontiguousarray(piece).tobytes(),
+                pos=(x_pos, 0),
+                size=(piece.shape[1], n_bins),
+                colorfmt="rgb",
+                bufferfmt="ubyte",
+            )
+        self.cursor = (self.cursor + rgb.shape[1]) % self.n_columns
+        self._scroll()
+        self.canvas.ask_update()
+
+    def _scroll(self):
+        # oldest column at the left edge, the newest at the right
+        u_pos = self.cursor / self.n_columns
+        self.rect.tex_coords = (u_pos, 0, u_pos + 1, 0, u_pos + 1, 1, u_pos, 1)
+
+    def _place(self, *args):
+        if self.rect is not None:
+            self.rect.pos = self.pos
+            self.rect.size = self.size
+
+
+class LiveWindow(Screen):
+    """
+    Screen with the rolling spectrogram and one level meter per channel. The
+    input stream only runs while the screen is shown.
+    """
+
+    def __init__(self):
+        super(LiveWindow, self).__init__()
+        self.analyzer = LiveSpectrogram()
+        self._tick = None
+
+    def on_enter(self):
+        self.analyzer.start()
+        self.ids.spectrogram.setup(self.analyzer.n_bins)
+        self._tick = Clock.schedule_interval(self.update, 1 / FRAME_RATE)
+
+    def on_leave(self):
+        if self._tick is not None:
+            self._tick.cancel()
+            self._tick = None
+        self.analyzer.stop()
+
+    def update(self, dt):
+        """
+        one frame: new spectrogram columns plus meter levels
+        """
+        self.ids.spectrogram.add_columns(
+            self.analyzer.pull(max_columns=MAX_COLUMNS_PER_FRAME)
+        )
+        rms, peak = self.analyzer.level()
+        meters = [self.ids.meter_left, self.ids.meter_right]
+        for idx, meter in enumerate(meters):
+            level = rms[min(idx, rms.shape[0] - 1)]
+            meter.value = float(np.clip(level + METER_RANGE_DB, 0, METER_RANGE_DB))
+        self.ids.peak.text = f"peak {peak.max():.0f} dBFS"
@@ -0,0 +1,52 @@
+"""
+On-screen timing overlay. A label over the recorder screen listing the
+recorder's spans (see reed_reviewer.instrument), refreshed on the kivy Clock
+while it's shown. Hidden, it costs nothing; the spans are recorded either way.
+"""
+from kivy.clock import Clock
+from kivy.uix.label import Label
+
+from reed_reviewer.instrument import shared_instruments
+
+REFRESH_SEC = 0.5
+SPANS = (
+    "record",
+    "stream_callback",
+    "thresh_save",
+    "save",
+    "write",
+    "features",
+    "fft",
+    "plot_data",
+    "plot",
+    "load_rec",
+)
+
+
+class TimingOverlay(Label):
+    """
+    last, median and 95th percentile time (ms) of each span
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("font_name", "RobotoMono-Regular")
+        kwargs.setdefault("font_size", "11sp")
+        super(TimingOverlay, self).__init__(**kwargs)
+        self._event = None
+        self.show(False)
+
+    def show(self, on):
+        if on:
+            self.size_hint_y, self.opacity = 0.25, 1
+            self.refresh()
+            if self._event is None:
+                self._event = Clock.schedule_interval(self.refresh, REFRESH_SEC)
+        else:
+            self.size_hint_y, self.opacity = None, 0
+            self.height = 0
+            if self._event is not None:
+                self._event.cancel()
+                self._event = None
+
+    def refresh(self, dt=None):
+        self.text = shared_instruments().table(SPANS)
@@ -0,0 +1,113 @@
+"""
+Background work for the app. Blocking jobs (recording, fft, plot prep) run on
+worker threads and their results come back to the kivy main thread through
+Clock, so button handlers return right away.
+
+Jobs run in named lanes. Each lane has its own single thread, so jobs in one
+lane run in order (e.g. two takes never fight over the microphone) while
+lanes run side by side. By default submitting to a lane supersedes whatever is
+waiting in it: pending jobs are cancelled and results of jobs that already
+started are dropped instead of delivered (a new take makes a pending plot
+pointless). Lanes whose jobs must all run, like takes, submit with
+supersede=False.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from kivy.clock import Clock
+
+
+class TaskRunner:
+    """
+    Inputs
+    ------
+        on_busy (callable) - None - called on the main thread as
+            on_busy(running) whenever the set of running lanes changes. running
+            maps lane name to the label it was submitted with.
+    """
+
+    def __init__(self, on_busy=None):
+        self.on_busy = on_busy
+        self._executors = {}
+        self._generation = {}  # lane -> id of the job whose result is wanted
+        self._pending = {}  # lane -> futures not yet finished
+        self.running = {}  # lane -> label
+
+    def submit(
+        self, lane, label, fn, *args, on_done=None, on_error=None, supersede=True
+    ):
+        """
+        runs fn(*args) on the lane's thread.
+
+        Inputs
+        ------
+            lane (str) - lane name, e.g. "audio" or "plot".
+            label (str) - shown by the busy indicator, e.g. "recording".
+            fn (callable) - the blocking job.
+            on_done (callable) - None - on_done(result) on the main thread.
+            on_error (callable) - None - on_error(err) on the main thread. None
+                prints the error.
+            supersede (bool) - True - cancel/drop older jobs in the lane.
+        """
+        if supersede:
+            self.cancel(lane)
+        generation = self._generation.setdefault(lane, 0)
+
+        if lane not in self._executors:
+            self._executors[lane] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"app-{lane}"
+            )
+        future = self._executors[lane].submit(fn, *args)
+        self._pending.setdefault(lane, []).append(future)
+        self._set_running(lane, label)
+
+        def finished(fut):
+            # worker thread, hop back to the main thread before touching anything
+            Clock.schedule_once(
+                lambda dt: self._deliver(lane, generation, fut, on_done, on_error)
+            )
+
+        future.add_done_callback(finished)
+        return future
+
+    def cancel(self, lane):
+        """
+        cancels waiting jobs in a lane and drops the result of a running one
+        """
+        for future in self._pending.get(lane, []):
+            future.cancel()
+        self._generation[lane] = self._generation.get(lane, 0) + 1
+        self._set_running(lane, None)
+
+    def is_busy(self, lane):
+        return lane in self.running
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _deliver(self, lane, generation, future, on_done, on_error):
+        pending = self._pending.get(lane, [])
+        if future in pending:
+            pending.remove(future)
+        if not pending:
+            self._set_running(lane, None)
+        if future.cancelled() or generation != self._generation.get(lane):
+            return  # superseded
+
+        err = future.exception()
+        if err is not None:
+            if on_error is None:
+                print(f"{lane} job failed: {err!r}")
+            else:
+                on_error(err)
+        elif on_done is not None:
+            on_done(future.result())
+
+    def _set_running(self, lane, label):
+        if label is None:
+            changed = self.running.pop(lane, None) is not None
+        else:
+            changed = self.running.get(lane) != label
+            self.running[lane] = label
+        if changed and self.on_busy is not None:
+            self.on_busy(dict(self.running))
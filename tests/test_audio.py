@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from scipy.io import wavfile
+
+import reed_reviewer.audio as audio
+import reed_reviewer.pack as pack
+import reed_reviewer.storage as storage
+
+FS = 8000
+
+
+class TestSources(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data = audio.synthetic_take(2000, 2, FS)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_all(self, source, blocksize=300):
+        return np.concatenate(list(source.blocks(blocksize)))
+
+    def test_array_source(self):
+        source = audio.ArraySource(self.data, FS)
+        np.testing.assert_array_equal(self.read_all(source), self.data)
+        self.assertEqual(source.read(10).shape, (0, 2))
+
+        mono = audio.ArraySource(self.data[:, 0], FS)
+        self.assertEqual(mono.read(10).shape, (10, 1))
+
+    def test_loop_wraps_around(self):
+        source = audio.ArraySource(self.data, FS, loop=True)
+        source.read(1500)
+        np.testing.assert_array_equal(
+            source.read(1000), np.concatenate([self.data[1500:], self.data[:500]])
+        )
+
+    def test_record_into(self):
+        out = np.full([2500, 2], 9, dtype=np.float32)
+        filled = audio.ArraySource(self.data, FS).record_into(out)
+        self.assertEqual(filled.shape, (2000, 2))
+        np.testing.assert_array_equal(out[:2000], self.data)
+
+    def test_wav_file(self):
+        path = os.path.join(self.tmp.name, "session.wav")
+        wavfile.write(path, FS, (self.data * 32767).astype(np.int16))
+        source = audio.FileSource(path)
+        self.assertEqual((source.Fs, source.channels), (FS, 2))
+        np.testing.assert_allclose(self.read_all(source), self.data, atol=1e-4)
+
+    def test_rrec_loose_and_packed(self):
+        reed_dir = os.path.join(self.tmp.name, "reed_1")
+        os.makedirs(reed_dir)
+        path = os.path.join(reed_dir, "1234.rrec")
+        fingerprint = dict(id="1", save_time=1234, Fs=FS, rms_thresh=[0.1])
+        storage.write_rec(path, self.data, fingerprint)
+
+        source = audio.FileSource(path)
+        self.assertEqual(source.start_time(), 1234)
+        np.testing.assert_array_equal(self.read_all(source), self.data)
+
+        pack.compact(reed_dir, min_age_sec=0)
+        self.assertFalse(os.path.exists(path))
+        np.testing.assert_array_equal(self.read_all(audio.FileSource(path)), self.data)
+
+    def test_synthetic_source(self):
+        source = audio.SyntheticSource(FS, channels=2, duration_sec=1, chunk_sec=0.3)
+        data = self.read_all(source, blocksize=700)
+        self.assertEqual(data.shape, (FS, 2))
+        chunk = int(0.3 * FS)  # blocks are served from whole generated chunks
+        np.testing.assert_array_equal(
+            data[chunk : 2 * chunk], audio.synthetic_take(chunk, 2, FS, seed=2)
+        )
+
+    def test_null_source_and_sink(self):
+        source = audio.NullSource(FS, channels=2)
+        self.assertFalse(source.read(100).any())
+        out = np.ones([50, 2], dtype=np.float32)
+        self.assertFalse(source.record_into(out).any())
+        sink = audio.NullSink()
+        sink.play(self.data, FS)
+        self.assertEqual(sink.played, 1)
+
+    def test_default_source_from_env(self):
+        with mock.patch.dict(os.environ, {audio.AUDIO_ENV: "null"}):
+            self.assertIsInstance(audio.default_source(FS), audio.NullSource)
+            self.assertIsInstance(audio.default_sink(), audio.NullSink)
+        with mock.patch.dict(os.environ, {audio.AUDIO_ENV: "synthetic"}):
+            self.assertIsInstance(audio.default_source(FS), audio.SyntheticSource)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import io
+import contextlib
+import unittest
+
+import reed_reviewer.bench as bench
+
+
+class TestBench(unittest.TestCase):
+    def test_replay_case_is_quiet(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            results = bench.run(
+                durations=(0.5,), channels=(1,), repeats=1, only=["replay"]
+            )
+        self.assertEqual(list(results["results"]), ["replay/0.5s/1ch"])
+        self.assertNotIn("replayed", out.getvalue())
+
+    def test_compare(self):
+        baseline = dict(results={"fft": dict(median_s=1.0), "gone": dict(median_s=1)})
+        results = dict(
+            results={
+                "fft": dict(median_s=1.3),
+                "plot": dict(median_s=9.0),  # no baseline
+            }
+        )
+        self.assertEqual(bench.compare(results, baseline), [("fft", 1.0, 1.3)])
+        self.assertEqual(bench.compare(results, baseline, threshold=0.5), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+import reed_reviewer.audio as audio
+import reed_reviewer.pack as pack
+import reed_reviewer.storage as storage
+from reed_reviewer.catalog import Catalog, row_key, sync_rows
+from reed_reviewer.recorder import ReedRecorder
+from reed_reviewer.writer import SaveQueue
+
+
+def write_take(data_root, reed_id, save_time, n_samples=4410):
+    reed_dir = os.path.join(data_root, f"reed_{reed_id}")
+    os.makedirs(reed_dir, exist_ok=True)
+    rec_path = os.path.join(reed_dir, f"{save_time}.rrec")
+    fingerprint = dict(id=reed_id, save_time=save_time, Fs=44100, rms_thresh=[0.1])
+    storage.write_rec(rec_path, np.zeros([n_samples, 2], np.float32), fingerprint)
+    return rec_path, fingerprint
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_root = self.tmp.name
+        self.catalog = Catalog(self.data_root)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add(self, reed_id, save_time, n_samples=4410):
+        rec_path, fingerprint = write_take(
+            self.data_root, reed_id, save_time, n_samples
+        )
+        self.catalog.add(rec_path, fingerprint, (n_samples, 2))
+        return rec_path
+
+    def test_queries(self):
+        self.add("1", 300)
+        first = self.add("1", 100)
+        self.add("2", 200)
+
+        rows = self.catalog.recordings(reed_id=1)
+        self.assertEqual([row["save_time"] for row in rows], [100, 300])
+        self.assertEqual(rows[0]["path"], first)
+        self.assertEqual(rows[0]["duration"], 0.1)
+        self.assertEqual(rows[0]["n_channels"], 2)
+        self.assertEqual(len(self.catalog.recordings(since=200)), 2)
+        self.assertEqual(len(self.catalog.recordings(since=150, until=250)), 1)
+        self.assertEqual(self.catalog.newest("1")["save_time"], 300)
+        self.assertIsNone(self.catalog.newest("3"))
+        self.assertEqual(self.catalog.reed_ids(), ["1", "2"])
+
+    def test_add_replaces_and_remove(self):
+        rec_path = self.add("1", 100)
+        self.add("1", 100, n_samples=8820)
+        rows = self.catalog.recordings()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["n_samples"], 8820)
+        self.catalog.remove(rec_path)
+        self.assertEqual(self.catalog.recordings(), [])
+
+    def test_rebuild_and_verify(self):
+        self.add("1", 100)
+        gone = self.add("1", 200)
+        write_take(self.data_root, "1", 300)  # never indexed
+        write_take(self.data_root, "2", 400)
+        pack.compact(os.path.join(self.data_root, "reed_2"), min_age_sec=0)
+        os.remove(gone)
+
+        report = self.catalog.verify()
+        self.assertEqual(report["missing"], [gone])
+        self.assertEqual(len(report["unindexed"]), 2)  # loose 300, packed 400
+
+        self.assertEqual(self.catalog.rebuild(), 3)
+        self.assertEqual(
+            self.catalog.verify(), dict(missing=[], unindexed=[], changed=[])
+        )
+        packed = self.catalog.recordings(reed_id=2)[0]
+        self.assertEqual(packed["n_samples"], 4410)
+
+    def test_sync_rows(self):
+        rows = [dict(path=f"/r/{idx}.rrec", size=1, mtime=0.5) for idx in range(3)]
+        kept = [row_key(rows[0]), row_key(dict(rows[1], size=2)), "/r/gone|1|0.5"]
+        keep, new_rows = sync_rows(kept, rows)
+        self.assertEqual(keep.tolist(), [True, False, False])
+        self.assertEqual(new_rows, rows[1:])  # rewritten and new
+
+
+class TestRecorderCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        quiet = rng.normal(0, 1e-3, [44100, 2])
+        loud = audio.synthetic_take(44100, 2, seed=1)
+        source = audio.ArraySource(np.concatenate([quiet, loud]).astype(np.float32))
+        self.save_queue = SaveQueue()
+        self.recorder = ReedRecorder(
+            5,
+            data_root=self.tmp.name,
+            source=source,
+            sink=audio.NullSink(),
+            save_queue=self.save_queue,
+        )
+
+    def tearDown(self):
+        self.save_queue.close()
+        self.tmp.cleanup()
+
+    def test_baseline_is_not_a_take(self):
+        self.recorder.set_thresh()
+        self.save_queue.flush()
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, "baseline"))), 1)
+        self.assertEqual(self.recorder.catalog.recordings(), [])
+        self.assertEqual(self.recorder.catalog.rebuild(), 0)
+
+        self.recorder.listen()
+        self.save_queue.flush()
+        rows = self.recorder.catalog.recordings(reed_id=5)
+        self.assertGreater(len(rows), 0)
+        for row in rows:
+            self.assertEqual(os.path.basename(os.path.dirname(row["path"])), "reed_5")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+import reed_reviewer.audio as audio
+import reed_reviewer.reed_utils as rutils
+from reed_reviewer.recorder import ReedRecorder
+from reed_reviewer.spectrum import SpectrumWorkspace, spectrum
+from reed_reviewer.writer import SaveQueue
+
+FS = 44100
+
+
+class TestSpectrumWorkspace(unittest.TestCase):
+    def test_matches_spectrum(self):
+        for window in ("boxcar", "hann"):
+            workspace = SpectrumWorkspace(FS, 2, window)
+            for seed, n_samples in [(0, FS), (1, FS // 2), (2, 2 * FS)]:
+                raw_data = audio.synthetic_take(n_samples, 2, seed=seed)
+                freq_axis, freq_mag = workspace.get(seed, raw_data, FS)
+                expected_axis, expected_mag = spectrum(raw_data, FS, window)
+                np.testing.assert_allclose(freq_axis, expected_axis)
+                np.testing.assert_allclose(freq_mag, expected_mag, rtol=1e-4, atol=1e-6)
+            self.assertEqual(workspace.capacity, 2 * FS)  # grew for the long one
+
+    def test_buffers_reused(self):
+        workspace = SpectrumWorkspace(FS, 2)
+        first = workspace.get("a", audio.synthetic_take(FS, 2, seed=0), FS)
+        self.assertIs(
+            workspace.get("a", audio.synthetic_take(FS, 2, seed=0), FS), first
+        )
+        second = workspace.get("b", audio.synthetic_take(FS, 2, seed=1), FS)
+        self.assertTrue(np.shares_memory(first[1], second[1]))
+        self.assertTrue(np.shares_memory(second[1], workspace.freq_mag))
+
+
+class TestCompactRecorder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        quiet = rng.normal(0, 1e-3, [FS // 2, 2]).astype(np.float32)
+        takes = [audio.synthetic_take(FS // 2, 2, seed=seed) for seed in range(4)]
+        self.data = np.concatenate([quiet] + takes)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def session(self, compact):
+        """
+        baseline then four takes, returns the recorder and its saved takes
+        """
+        save_queue = SaveQueue()
+        self.addCleanup(save_queue.close)
+        recorder = ReedRecorder(
+            3,
+            rec_duration_sec=0.5,
+            rec_wait=0,
+            data_root=os.path.join(self.tmp.name, str(compact)),
+            source=audio.ArraySource(self.data),
+            sink=audio.NullSink(),
+            save_queue=save_queue,
+            adaptive_thresh=False,
+            compact=compact,
+        )
+        recorder.set_thresh()
+        buffers = []
+        for _ in range(4):
+            recorder.listen()
+            buffers.append(recorder.raw_data)
+        save_queue.flush()
+        reed_dir = os.path.join(recorder.data_root, "reed_3")
+        saved = [
+            rutils.load_rec(os.path.join(reed_dir, name))[0]
+            for name in rutils.list_recordings(reed_dir)
+        ]
+        return recorder, buffers, saved
+
+    def test_same_takes_as_default_mode(self):
+        _, _, expected = self.session(compact=False)
+        recorder, buffers, saved = self.session(compact=True)
+        self.assertGreater(len(saved), 0)
+        self.assertEqual(len(saved), len(expected))
+        for take, expected_take in zip(saved, expected):
+            np.testing.assert_array_equal(take, expected_take)
+
+        # two capture buffers used in turn
+        self.assertIs(buffers[0].base, buffers[2].base)
+        self.assertIs(buffers[1].base, buffers[3].base)
+        self.assertFalse(np.shares_memory(buffers[0], buffers[1]))
+
+    def test_plot_data_is_a_copy(self):
+        recorder, _, _ = self.session(compact=True)
+        data = recorder.plot_data()
+        for buffer in recorder._capture:
+            self.assertFalse(np.shares_memory(data["signal"], buffer))
+        self.assertFalse(
+            np.shares_memory(data["freq_mag"], recorder.spectrum_workspace.freq_mag)
+        )
+        np.testing.assert_array_equal(data["signal"], recorder.raw_data)
+
+
+if __name__ == "__main__":
+    unittest.main()
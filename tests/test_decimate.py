@@ -0,0 +1,48 @@
+import unittest
+import numpy as np
+
+from reed_reviewer.decimate import MinMaxPyramid, MIN_BINS
+
+
+class TestMinMaxPyramid(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.arange(100000) / 1000
+        self.y = rng.normal(size=[100000, 2]).astype(np.float32)
+        self.y[12345, 0] = 50  # a single sample spike
+        self.y[67890, 1] = -50
+        self.pyramid = MinMaxPyramid(self.x, self.y)
+
+    def test_levels(self):
+        mins, maxs = self.pyramid.levels[0]
+        np.testing.assert_array_equal(mins[:3], self.y[:6].reshape(3, 2, 2).min(1))
+        np.testing.assert_array_equal(maxs[:3], self.y[:6].reshape(3, 2, 2).max(1))
+        self.assertLessEqual(self.pyramid.levels[-1][0].shape[0], MIN_BINS)
+
+    def test_full_view_keeps_peaks(self):
+        x, y = self.pyramid.view(self.x[0], self.x[-1], 500)
+        self.assertLessEqual(len(x), 4 * 500)
+        self.assertEqual(y.shape, (len(x), 2))
+        self.assertEqual(y[:, 0].max(), 50)
+        self.assertEqual(y[:, 1].min(), -50)
+        np.testing.assert_array_equal(y.max(axis=0), self.y.max(axis=0))
+
+    def test_zoomed_view_is_raw(self):
+        x, y = self.pyramid.view(20, 20.5, 500)
+        np.testing.assert_array_equal(x, self.x[19999:20502])
+        np.testing.assert_array_equal(y, self.y[19999:20502])
+
+    def test_view_covers_range(self):
+        x, _ = self.pyramid.view(30, 60, 200)
+        self.assertLessEqual(x[0], 30)
+        self.assertGreaterEqual(x[-1] + (x[-1] - x[-3]), 60)
+
+    def test_short_signal(self):
+        pyramid = MinMaxPyramid(np.arange(10), np.arange(10.0))
+        self.assertEqual(pyramid.levels, [])
+        _, y = pyramid.view(0, 9, 2)
+        self.assertEqual(y.shape, (10, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
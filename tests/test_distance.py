@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from scipy.spatial.distance import cdist
+
+import reed_reviewer.distance as distance
+from reed_reviewer.distance import DistanceMatrix
+
+FREQ = np.arange(0, 24000, 10, dtype=np.float32)
+
+
+def spectra(n_recs=40, seed=0):
+    """
+    two groups of spectra, peaks near 500 Hz and near 2 kHz
+    """
+    rng = np.random.default_rng(seed)
+    peaks = np.where(np.arange(n_recs) % 2, 2000, 500) + rng.normal(0, 20, n_recs)
+    rows = np.exp(-np.square((FREQ - peaks[:, np.newaxis]) / 100))
+    return (rows + rng.uniform(0, 0.01, rows.shape)).astype(np.float32)
+
+
+class TestDistance(unittest.TestCase):
+    def test_common_band(self):
+        keep = distance.common_band(FREQ, np.array([44100, 16000]))
+        self.assertEqual(FREQ[keep][0], distance.MIN_HZ)
+        self.assertLess(FREQ[keep][-1], 8000)
+
+    def test_tiles_match_scipy(self):
+        rows = spectra()
+        for metric, reference in [("cosine", "cosine"), ("log_spectral", "euclidean")]:
+            normed = distance.normalize(rows, metric)
+            expected = cdist(normed, normed, reference)
+            if metric == "log_spectral":
+                expected /= np.sqrt(rows.shape[1])
+            for block, workers in [(None, 1), (7, 1), (7, 3)]:
+                matrix = distance.pairwise(normed, metric, block=block, workers=workers)
+                np.testing.assert_allclose(matrix, expected, atol=1e-4)
+                np.testing.assert_array_equal(matrix, matrix.T)
+                self.assertFalse(np.diag(matrix).any())
+
+        with self.assertRaises(ValueError):
+            distance.normalize(rows, "euclidean")
+
+    def test_loudness_doesnt_count(self):
+        rows = spectra(2)
+        rows[1] = 10 * rows[0]
+        for metric in distance.METRICS:
+            matrix = DistanceMatrix.from_spectra(FREQ, rows, 44100, metric=metric)
+            # float32 products of large norms, a hundredth of a dB is zero here
+            self.assertAlmostEqual(float(matrix.matrix[0, 1]), 0, delta=0.02)
+
+    def test_clusters_and_order(self):
+        matrix = DistanceMatrix.from_spectra(
+            FREQ, spectra(), 48000, reed_ids=["1"] * 40, save_time=np.arange(40)
+        )
+        labels = matrix.clusters(2)
+        self.assertEqual(len(set(labels[0::2])), 1)
+        self.assertEqual(len(set(labels[1::2])), 1)
+        self.assertNotEqual(labels[0], labels[1])
+
+        order = matrix.leaf_order()
+        self.assertEqual(sorted(order), list(range(40)))
+        ordered = matrix.ordered(order)
+        self.assertEqual(np.sum(np.diff(ordered.save_time % 2) != 0), 1)
+
+        nearest = matrix.nearest(0, k=3)
+        self.assertEqual(len(nearest), 3)
+        self.assertTrue(all(idx % 2 == 0 for idx, _ in nearest))
+
+    def test_save_load(self):
+        matrix = DistanceMatrix.from_spectra(
+            FREQ, spectra(6), 44100, metric="log_spectral"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "matrix.npz")
+            matrix.save(path)
+            loaded = DistanceMatrix.load(path)
+        np.testing.assert_array_equal(loaded.matrix, matrix.matrix)
+        self.assertEqual(loaded.metric, "log_spectral")
+
+    def test_tiny_matrices(self):
+        empty = DistanceMatrix.from_spectra(FREQ, np.empty([0, len(FREQ)]), 44100)
+        self.assertEqual(len(empty), 0)
+        one = DistanceMatrix.from_spectra(FREQ, spectra(1), 44100)
+        self.assertEqual(one.leaf_order().tolist(), [0])
+        self.assertEqual(one.nearest(0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+import reed_reviewer.features as features
+import reed_reviewer.storage as storage
+
+FS = 44100
+
+
+def tone(freq=440, amplitude=0.5, seconds=0.5, channels=2):
+    t = np.arange(int(seconds * FS)) / FS
+    wave = amplitude * np.sin(2 * np.pi * freq * t)
+    return np.repeat(wave[:, np.newaxis], channels, axis=1).astype(np.float32)
+
+
+class TestFeatures(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        reed_dir = os.path.join(self.tmp.name, "reed_1")
+        os.makedirs(reed_dir)
+        self.rec_path = os.path.join(reed_dir, "100.rrec")
+        self.raw_data = tone()
+        self.write_rec()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_rec(self, mtime=1000.0):
+        fingerprint = dict(id="1", save_time=100, Fs=FS, rms_thresh=[0.01])
+        storage.write_rec(self.rec_path, self.raw_data, fingerprint)
+        os.utime(self.rec_path, (mtime, mtime))
+
+    def test_compute_features(self):
+        feats = features.compute_features(self.raw_data, FS, ref_power=0.125)
+        np.testing.assert_allclose(feats["rms"], 0.5 / np.sqrt(2), rtol=1e-3)
+        np.testing.assert_allclose(feats["power"], 0.125, rtol=1e-3)
+        np.testing.assert_allclose(feats["db"], 0, atol=0.01)
+        self.assertEqual(feats["spectrum"].shape, (len(features.FREQ_GRID), 2))
+        peak = features.FREQ_GRID[np.argmax(feats["spectrum"][:, 0])]
+        self.assertEqual(peak, 440)
+        np.testing.assert_allclose(feats["f0"], 440, rtol=0.01)
+
+        no_baseline = features.compute_features(self.raw_data, FS)
+        self.assertTrue(np.isnan(no_baseline["db"]).all())
+
+    def test_to_grid_means_bins(self):
+        freq_axis = np.arange(0, 80, 2.5)  # 4 bins per 10 Hz grid step
+        freq_mag = np.ones([len(freq_axis), 1])
+        freq_mag[freq_axis == 50] = 5
+        grid = np.arange(0, 110, 10, dtype=np.float32)
+        grid_mag = features.to_grid(freq_axis, freq_mag, grid)
+        self.assertEqual(grid_mag[5, 0], 2)  # 45, 47.5, 50 and 52.5
+        self.assertEqual(grid_mag[3, 0], 1)
+        self.assertEqual(grid_mag[10, 0], 0)  # above the spectrum
+
+    def test_sidecar_fresh_and_stale(self):
+        self.assertFalse(features.is_fresh(self.rec_path))
+        written = features.write_features(self.rec_path, self.raw_data, FS, 0.0125)
+        self.assertTrue(features.is_fresh(self.rec_path))
+        loaded = features.load_features(self.rec_path)
+        np.testing.assert_array_equal(loaded["spectrum"], written["spectrum"])
+        np.testing.assert_allclose(loaded["db"], 10, atol=0.01)
+
+        self.raw_data = tone(amplitude=0.25)
+        self.write_rec(mtime=2000.0)  # rewritten take, sidecar is stale
+        self.assertFalse(features.is_fresh(self.rec_path))
+        loaded = features.load_features(self.rec_path)
+        self.assertTrue(features.is_fresh(self.rec_path))
+        self.assertEqual(loaded["ref_power"], 0.0125)  # the original baseline
+        np.testing.assert_allclose(
+            loaded["db"], 10 * np.log10(0.03125 / 0.0125), atol=0.01
+        )
+
+    def test_other_baseline(self):
+        features.write_features(self.rec_path, self.raw_data, FS, 0.0125)
+        loaded = features.load_features(self.rec_path, ref_power=0.125)
+        np.testing.assert_allclose(loaded["db"], 0, atol=0.01)
+        self.assertEqual(features.stored_ref_power(self.rec_path), 0.0125)
+
+
+if __name__ == "__main__":
+    unittest.main()
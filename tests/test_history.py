@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+import reed_reviewer.features as features
+import reed_reviewer.storage as storage
+from reed_reviewer.catalog import Catalog
+from reed_reviewer.history import SpectrumHistory
+from reed_reviewer.plotting import RecordingPlot
+
+FS = 44100
+
+
+class TestSpectrumHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_root = self.tmp.name
+        self.catalog = Catalog(self.data_root)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add(self, save_time, freq):
+        reed_dir = os.path.join(self.data_root, "reed_1")
+        os.makedirs(reed_dir, exist_ok=True)
+        rec_path = os.path.join(reed_dir, f"{save_time}.rrec")
+        t = np.arange(FS // 4) / FS
+        raw_data = np.repeat(0.3 * np.sin(2 * np.pi * freq * t)[:, np.newaxis], 2, 1)
+        fingerprint = dict(id="1", save_time=save_time, Fs=FS, rms_thresh=[0.01])
+        storage.write_rec(rec_path, raw_data.astype(np.float32), fingerprint)
+        self.catalog.add(rec_path, fingerprint, raw_data.shape)
+        return rec_path
+
+    def update(self):
+        history = SpectrumHistory(1, self.data_root)
+        n_new = history.update(self.catalog.recordings(reed_id=1))
+        return history, n_new
+
+    def peaks(self, spectra):
+        return features.FREQ_GRID[np.argmax(spectra, axis=1)].tolist()
+
+    def test_incremental_update(self):
+        self.add(300, 1500)
+        gone = self.add(200, 1000)
+        self.assertEqual(self.update()[1], 2)
+        self.add(100, 500)  # late arrival
+        self.catalog.remove(gone)
+        os.remove(gone)
+
+        history, n_new = self.update()
+        self.assertEqual(n_new, 1)
+        self.assertEqual(history.save_time.tolist(), [100, 300])
+        self.assertEqual(self.peaks(history.spectra), [500, 1500])
+        self.assertEqual(self.update()[1], 0)  # read back from disk
+
+    def test_select_view_and_bands(self):
+        for save_time, freq in [(100, 500), (200, 1000), (300, 1500)]:
+            self.add(save_time, freq)
+        history, _ = self.update()
+
+        save_time, spectra = history.select(since=150, until=300)
+        self.assertEqual(save_time.tolist(), [200, 300])
+        self.assertEqual(self.peaks(spectra), [1000, 1500])
+
+        freq, _, spectra = history.view(max_hz=1200, max_points=50)
+        self.assertLessEqual(len(freq), 50)
+        self.assertLessEqual(freq[-1], 1200)
+        # max pooling keeps the peaks of the takes under max_hz
+        np.testing.assert_allclose(
+            spectra.max(axis=1)[:2], history.spectra.max(axis=1)[:2]
+        )
+
+        _, bands = history.bands(percentiles=(0, 50, 100))
+        np.testing.assert_allclose(bands[0], history.spectra.min(axis=0))
+        np.testing.assert_allclose(bands[2], history.spectra.max(axis=0))
+        _, empty = history.bands(since=1000)
+        self.assertTrue(np.isnan(empty).all())
+
+    def test_overlay(self):
+        for save_time in (100, 200, 300):
+            self.add(save_time, 2 * save_time)
+        history, _ = self.update()
+        fig = plt.figure()
+        self.addCleanup(plt.close, fig)
+        plot = RecordingPlot.for_figure(fig)
+
+        plot.show_history(history)
+        self.assertEqual(len(plot.ax[1].collections), 1)  # one LineCollection
+        self.assertEqual(len(plot.ax[1].collections[0].get_segments()), 3)
+
+        plot.show_history(history, mode="bands")
+        self.assertEqual(len(plot.ax[1].collections), 1)  # replaced by the band
+        self.assertEqual(len(plot.ax[1].lines), 1 + len(plot.full))  # the median
+
+        plot.clear_history()
+        self.assertEqual(plot.history_artists, [])
+        self.assertEqual(len(plot.ax[1].collections), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+import reed_reviewer.audio as audio
+import reed_reviewer.features as features
+import reed_reviewer.reed_utils as rutils
+from reed_reviewer.longtake import ChunkWriter, ChunkAnalyzer, LongTake
+
+FS = 8000
+
+
+class ImmediateSource(audio.ArraySource):
+    """
+    ArraySource whose stream hands over every block as soon as it starts
+    instead of at realtime pace
+    """
+
+    def open_stream(self, callback, blocksize=512):
+        return _ImmediateStream(self, callback, blocksize)
+
+
+class _ImmediateStream:
+    def __init__(self, source, callback, blocksize):
+        self.source = source
+        self.callback = callback
+        self.blocksize = blocksize
+        self.channels = source.channels
+
+    def start(self):
+        for block in self.source.blocks(self.blocksize):
+            self.callback(block, block.shape[0], None, None)
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestLongTake(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rec_path = os.path.join(self.tmp.name, "100.rrec")
+        self.fingerprint = dict(id="1", save_time=100, Fs=FS, rms_thresh=[0.1])
+        self.data = audio.synthetic_take(3 * FS + 123, 2, FS)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_chunk_writer(self):
+        writer = ChunkWriter(self.rec_path, self.fingerprint, 2, FS, chunk_sec=1)
+        for start in range(0, self.data.shape[0], 700):
+            writer.write(self.data[start : start + 700])
+        # unfinished take: loads up to the last full chunk
+        raw_data, _ = rutils.load_rec(self.rec_path)
+        np.testing.assert_array_equal(raw_data, self.data[: 3 * FS])
+
+        shape = writer.close(dict(self.fingerprint, long_take=True))
+        self.assertEqual(shape, self.data.shape)
+        raw_data, fingerp = rutils.load_rec(self.rec_path)
+        np.testing.assert_array_equal(raw_data, self.data)
+        self.assertTrue(fingerp["long_take"])
+
+    def test_chunk_analyzer_matches_whole_take(self):
+        analyzer = ChunkAnalyzer(FS, 2, ref_power=1e-3, nperseg=1024)
+        for start in range(0, self.data.shape[0], FS):
+            analyzer.push(self.data[start : start + FS])
+        chunked = analyzer.result()
+        whole = features.compute_features(self.data, FS, ref_power=1e-3)
+
+        self.assertEqual(set(chunked), set(whole))
+        expected_rms = np.sqrt(np.square(self.data, dtype=np.float64).mean(axis=0))
+        np.testing.assert_allclose(chunked["rms"], expected_rms, rtol=1e-6)
+        np.testing.assert_allclose(
+            chunked["db"], 10 * np.log10(expected_rms**2 / 1e-3)
+        )
+        self.assertEqual(chunked["spectrum"].shape, whole["spectrum"].shape)
+        peak = np.argmax(chunked["spectrum"][:, 0])
+        self.assertAlmostEqual(
+            features.FREQ_GRID[peak],
+            features.FREQ_GRID[np.argmax(whole["spectrum"][:, 0])],
+            delta=20,
+        )
+
+    def test_take_to_disk_with_sidecar(self):
+        take = LongTake(
+            ImmediateSource(self.data, FS),
+            self.rec_path,
+            self.fingerprint,
+            chunk_sec=0.5,
+            ref_power=1e-3,
+        )
+        take.start()
+        feats = take.stop()
+        self.assertEqual(take.shape, self.data.shape)
+        self.assertEqual(take.dropped_blocks, 0)
+        raw_data, _ = rutils.load_rec(self.rec_path)
+        np.testing.assert_array_equal(raw_data, self.data)
+
+        self.assertTrue(features.is_fresh(self.rec_path))
+        sidecar = features.load_features(self.rec_path)
+        np.testing.assert_allclose(sidecar["rms"], feats["rms"])
+        self.assertEqual(sidecar["ref_power"], 1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
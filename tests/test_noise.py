@@ -0,0 +1,92 @@
+import threading
+import unittest
+import numpy as np
+
+from reed_reviewer.noise import NoiseFloor
+
+FS = 8000
+
+
+def noise(seconds, rms, channels=2, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, rms, [int(seconds * FS), channels])
+
+
+class TestNoiseFloor(unittest.TestCase):
+    def test_seeded_from_baseline(self):
+        baseline = noise(2, 0.01)
+        floor = NoiseFloor(FS, sensitivity_rms=10)
+        floor.seed(baseline)
+        self.assertTrue(floor.ready)
+        np.testing.assert_allclose(floor.floor, 0.01, rtol=0.2)
+        np.testing.assert_allclose(floor.thresh, floor.floor * 10)
+        self.assertAlmostEqual(
+            floor.ref_power, float(np.mean(np.square(baseline[:, 0]))), delta=1e-5
+        )
+
+    def test_not_ready_before_min_quiet(self):
+        floor = NoiseFloor(FS)
+        floor.update(noise(0.5, 0.01))
+        self.assertFalse(floor.ready)
+
+    def test_takes_and_loud_frames_skipped(self):
+        floor = NoiseFloor(FS, sensitivity_rms=10)
+        floor.seed(noise(2, 0.01))
+        thresh = floor.thresh.copy()
+        self.assertFalse(floor.update(noise(1, 0.5, seed=1), in_take=True))
+        self.assertFalse(floor.update(noise(1, 0.5, seed=2)))  # over threshold
+        np.testing.assert_array_equal(floor.thresh, thresh)
+
+    def test_follows_drift_ref_power_fixed(self):
+        floor = NoiseFloor(FS, sensitivity_rms=10, history_sec=5)
+        floor.seed(noise(2, 0.01))
+        ref_power = floor.ref_power
+        for seed, rms in enumerate(np.repeat([0.015, 0.02, 0.025, 0.03], 12)):
+            floor.update(noise(0.5, rms, seed=seed))  # the room slowly gets louder
+        np.testing.assert_allclose(floor.floor, 0.03, rtol=0.2)
+        self.assertEqual(floor.ref_power, ref_power)
+
+        floor.reset()
+        self.assertFalse(floor.ready)
+        self.assertIsNone(floor.ref_power)
+
+    def test_soft_playing_is_not_room_noise(self):
+        floor = NoiseFloor(FS, sensitivity_rms=10, history_sec=5)
+        floor.seed(noise(2, 0.01))
+        t = np.arange(FS) / FS
+        soft = 0.05 * np.sin(2 * np.pi * 440 * t)  # under the 0.1 threshold
+        for seed in range(10):
+            floor.update(np.column_stack([soft, soft]) + noise(1, 0.01, seed=seed))
+        np.testing.assert_allclose(floor.floor, 0.01, rtol=0.2)
+
+    def test_update_and_seed_from_two_threads(self):
+        floor = NoiseFloor(FS, history_sec=2)
+        floor.seed(noise(2, 0.01))
+        errors = []
+
+        def audio_thread():
+            try:
+                for seed in range(200):
+                    floor.update(noise(0.05, 0.01, seed=seed))
+                    thresh, _ = floor.estimate()
+                    self.assertEqual(thresh.shape, (2,))
+            except Exception as err:
+                errors.append(err)
+
+        thread = threading.Thread(target=audio_thread)
+        thread.start()
+        for seed in range(20):
+            floor.seed(noise(0.3, 0.01, seed=seed))
+        thread.join()
+        self.assertEqual(errors, [])
+
+    def test_partial_frames_carried_over(self):
+        floor = NoiseFloor(FS)
+        block = noise(1.5, 0.01)
+        for start in range(0, block.shape[0], 333):
+            floor.update(block[start : start + 333])
+        self.assertEqual(floor.n_frames, block.shape[0] // floor.frame_len)
+
+
+if __name__ == "__main__":
+    unittest.main()
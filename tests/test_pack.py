@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+import reed_reviewer.pack as pack
+import reed_reviewer.storage as storage
+import reed_reviewer.reed_utils as rutils
+
+
+def write_take(reed_dir, save_time, n_samples=500, dtype="float32"):
+    """
+    a loose take of noise, returns its samples as written
+    """
+    rng = np.random.default_rng(save_time)
+    raw_data = rng.uniform(-0.5, 0.5, [n_samples, 2]).astype(np.float32)
+    fingerprint = dict(id="3", Fs=44100, save_time=save_time, rms_thresh=[0.01])
+    rec_path = os.path.join(reed_dir, f"{save_time}.rrec")
+    storage.write_rec(rec_path, raw_data, fingerprint, dtype)
+    return raw_data
+
+
+class TestPack(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.reed_dir = os.path.join(self.tmp.name, "reed_3")
+        os.makedirs(self.reed_dir)
+        self.path = pack.pack_path(self.reed_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        takes = {f"{t}.rrec": write_take(self.reed_dir, t) for t in (100, 200)}
+        takes["300.rrec"] = write_take(self.reed_dir, 300, dtype="int16")
+        self.assertEqual(pack.compact(self.reed_dir, min_age_sec=0), 3)
+        self.assertEqual(os.listdir(self.reed_dir), [pack.PACK_NAME])
+
+        self.assertEqual(rutils.list_recordings(self.reed_dir), sorted(takes))
+        for name, raw_data in takes.items():
+            rec_path = os.path.join(self.reed_dir, name)
+            recording, fingerp = rutils.load_rec(rec_path)
+            np.testing.assert_allclose(
+                recording, raw_data, atol=1 / storage.INT16_SCALE
+            )
+            self.assertEqual(fingerp["save_time"], int(name[:3]))
+
+        window, _ = rutils.load_rec(os.path.join(self.reed_dir, "100.rrec"), "r", 10, 5)
+        np.testing.assert_array_equal(window, takes["100.rrec"][10:15])
+
+        iterated = {
+            name: rec for name, rec, _ in pack.open_pack(self.reed_dir).iter_takes()
+        }
+        self.assertEqual(sorted(iterated), sorted(takes))
+
+    def test_append_replaces_and_rewrite_frees(self):
+        write_take(self.reed_dir, 100)
+        pack.append(self.reed_dir, ["100.rrec"])
+        newer = write_take(self.reed_dir, 100, n_samples=800)
+        pack.append(self.reed_dir, ["100.rrec"])
+        os.remove(os.path.join(self.reed_dir, "100.rrec"))
+
+        self.assertGreater(pack.rewrite(self.reed_dir), 0)
+        recording, _ = rutils.load_rec(os.path.join(self.reed_dir, "100.rrec"))
+        np.testing.assert_array_equal(recording, newer)
+
+    def test_interrupted_append_keeps_last_index(self):
+        raw_data = write_take(self.reed_dir, 100)
+        pack.append(self.reed_dir, ["100.rrec"])
+        # a crash part way through the next append: samples, no new trailer
+        with open(self.path, "ab") as pack_file:
+            pack_file.write(b"\1" * 1000 + pack.TRAILER_MAGIC + b"\2" * 7)
+
+        entries = pack.read_index(self.path)
+        self.assertEqual(sorted(entries), ["100.rrec"])
+        recording, _ = pack.Pack(self.path).load("100.rrec")
+        np.testing.assert_array_equal(recording, raw_data)
+
+        # the next append writes past the leftovers
+        write_take(self.reed_dir, 200)
+        pack.append(self.reed_dir, ["200.rrec"])
+        self.assertEqual(sorted(pack.read_index(self.path)), ["100.rrec", "200.rrec"])
+
+    def test_failed_append_truncates(self):
+        write_take(self.reed_dir, 100)
+        pack.append(self.reed_dir, ["100.rrec"])
+        size = os.path.getsize(self.path)
+
+        write_take(self.reed_dir, 200)
+        with open(os.path.join(self.reed_dir, "300.rrec"), "wb") as rec_file:
+            rec_file.write(b"not a recording".ljust(64))
+        with self.assertRaises(ValueError):
+            pack.append(self.reed_dir, ["200.rrec", "300.rrec"])
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(sorted(pack.read_index(self.path)), ["100.rrec"])
+
+    def test_failed_first_append_removes_pack(self):
+        with open(os.path.join(self.reed_dir, "300.rrec"), "wb") as rec_file:
+            rec_file.write(b"not a recording".ljust(64))
+        with self.assertRaises(ValueError):
+            pack.append(self.reed_dir, ["300.rrec"])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_loose_file_wins(self):
+        write_take(self.reed_dir, 100)
+        pack.append(self.reed_dir, ["100.rrec"])
+        loose = write_take(self.reed_dir, 100, n_samples=50)
+        recording, _ = rutils.load_rec(os.path.join(self.reed_dir, "100.rrec"))
+        np.testing.assert_array_equal(recording, loose)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+
+import reed_reviewer.pitch as pitch
+
+FS = 16000
+
+
+def note(f0, seconds=0.5, amplitudes=(0.5, 0.25, 0.125), channels=1):
+    """
+    a harmonic tone, harmonic h at amplitudes[h - 1]
+    """
+    t = np.arange(int(seconds * FS)) / FS
+    wave = sum(
+        amplitude * np.sin(2 * np.pi * f0 * (idx + 1) * t)
+        for idx, amplitude in enumerate(amplitudes)
+    )
+    return np.repeat(wave[:, np.newaxis], channels, axis=1).astype(np.float32)
+
+
+class TestPitch(unittest.TestCase):
+    def test_frame_length_holds_two_periods(self):
+        frame_len = pitch.frame_length(FS)
+        self.assertGreaterEqual(frame_len, 2 * FS / pitch.F0_MIN)
+        self.assertEqual(frame_len & (frame_len - 1), 0)
+
+    def test_f0_and_harmonics(self):
+        for f0 in (110, 220.5, 660):
+            result = pitch.analyze(note(f0, channels=2), FS)
+            est_f0, amps = pitch.summarize(result)
+            np.testing.assert_allclose(est_f0, f0, rtol=2e-3)
+            # peak bin of a Hann window, off-bin harmonics lose up to ~15%
+            np.testing.assert_allclose(amps[:3, 0], [0.5, 0.25, 0.125], rtol=0.16)
+            self.assertLess(amps[5, 0], 0.01)
+            self.assertGreater(np.nanmin(result["periodicity"]), 0.9)
+
+    def test_silence_and_noise_unvoiced(self):
+        silence = np.zeros([FS // 2, 1], np.float32)
+        self.assertTrue(np.isnan(pitch.analyze(silence, FS)["f0"]).all())
+        f0, amps = pitch.summarize(pitch.analyze(silence, FS))
+        self.assertTrue(np.isnan(f0).all() and np.isnan(amps).all())
+
+    def test_batch_matches_single(self):
+        recordings = [(note(220), FS), (note(330, seconds=0.3), FS), (note(440), 8000)]
+        batch = pitch.analyze_batch(recordings)
+        for (raw_data, rec_Fs), result in zip(recordings, batch):
+            single = pitch.analyze(raw_data, rec_Fs)
+            np.testing.assert_allclose(result["f0"], single["f0"], rtol=1e-5)
+            np.testing.assert_allclose(result["t"], single["t"])
+
+    def test_tracker_matches_analyze(self):
+        raw_data = note(196, seconds=1)
+        tracker = pitch.PitchTracker(FS, 1)
+        f0 = []
+        for start in range(0, raw_data.shape[0], 1000):
+            f0.append(tracker.push(raw_data[start : start + 1000])["f0"])
+        np.testing.assert_allclose(
+            np.concatenate(f0), pitch.analyze(raw_data, FS)["f0"], rtol=1e-5
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+import reed_reviewer.storage as storage
+import reed_reviewer.recorder as recorder
+
+FS = 44100
+
+
+def session(loud=(0.3,) * 4, soft=(0.05,) * 3, gap_sec=0.6, note_sec=0.3):
+    """
+    quiet room noise with loud notes then soft notes, gap_sec apart
+    """
+    rng = np.random.default_rng(0)
+    parts = [rng.normal(0, 1e-3, [2 * FS, 1])]
+    t = np.arange(int(note_sec * FS)) / FS
+    for amplitude in loud + soft:
+        parts.append(amplitude * np.sin(2 * np.pi * 440 * t)[:, np.newaxis])
+        parts.append(rng.normal(0, 1e-3, [int(gap_sec * FS), 1]))
+    return np.concatenate(parts).astype(np.float32)
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.session_path = os.path.join(self.tmp.name, "session.rrec")
+        fingerprint = dict(id="0", save_time=1000, Fs=FS, rms_thresh=[])
+        storage.write_rec(self.session_path, session(), fingerprint)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def replay(self, *options):
+        data_root = os.path.join(self.tmp.name, f"scratch{len(options)}")
+        recorder.main(
+            ["replay", self.session_path, "--reed-id", "9", "--data-root", data_root]
+            + list(options)
+        )
+        return sorted(os.listdir(os.path.join(data_root, "reed_9")))
+
+    def test_fixed_thresh_is_kept(self):
+        # 0.2 cuts only the loud notes, the noise floor would drop the
+        # threshold far enough to cut the soft ones too
+        self.assertEqual(len(self.replay("--thresh", "0.2")), 4)
+
+    def test_noise_floor_without_thresh(self):
+        self.assertEqual(len(self.replay()), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import io
+import os
+import contextlib
+import tempfile
+import unittest
+import numpy as np
+
+import reed_reviewer.audio as audio
+import reed_reviewer.features as features
+import reed_reviewer.storage as storage
+from reed_reviewer.catalog import Catalog
+from reed_reviewer.reviewer import reprocess, reed_recording_paths
+
+FS = 44100
+
+
+class TestReprocess(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_root = self.tmp.name
+        reed_dir = os.path.join(self.data_root, "reed_1")
+        os.makedirs(reed_dir)
+        os.makedirs(os.path.join(self.data_root, "baseline"))
+        self.paths = []
+        for save_time in (100, 200, 300):
+            rec_path = os.path.join(reed_dir, f"{save_time}.rrec")
+            raw_data = audio.synthetic_take(FS // 4, 2, seed=save_time)
+            fingerprint = dict(id="1", save_time=save_time, Fs=FS, rms_thresh=[0.1])
+            storage.write_rec(rec_path, raw_data, fingerprint)
+            self.paths.append(rec_path)
+        self.broken = os.path.join(reed_dir, "400.rrec")
+        with open(self.broken, "wb") as rec_file:
+            rec_file.write(b"not a recording".ljust(64))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def reprocess(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return reprocess(self.data_root, workers=1, **kwargs)
+
+    def test_paths(self):
+        self.assertEqual(
+            reed_recording_paths(self.data_root), self.paths + [self.broken]
+        )
+
+    def test_only_stale_sidecars(self):
+        summary = self.reprocess()
+        self.assertEqual(
+            [summary[key] for key in ("total", "skipped", "done", "failed")],
+            [4, 0, 3, 1],
+        )
+        self.assertTrue(all(features.is_fresh(path) for path in self.paths))
+        self.assertEqual(len(Catalog(self.data_root).recordings(reed_id=1)), 3)
+
+        summary = self.reprocess()
+        self.assertEqual((summary["skipped"], summary["done"]), (3, 0))
+
+        raw_data = audio.synthetic_take(FS // 4, 2, seed=0)
+        features.write_features(self.paths[0], raw_data, FS, ref_power=0.01)
+        os.utime(self.paths[1], (1, 1))  # rewritten
+        summary = self.reprocess()
+        self.assertEqual((summary["skipped"], summary["done"]), (2, 1))
+        summary = self.reprocess(force=True)
+        self.assertEqual((summary["skipped"], summary["done"]), (0, 3))
+        self.assertEqual(features.stored_ref_power(self.paths[0]), 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
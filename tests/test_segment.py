@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+
+from reed_reviewer.segment import find_events, frame_rms, frame_peak
+
+FS = 1000
+
+
+def segments(*levels):
+    """
+    a mono recording of (amplitude, seconds) stretches of a 50 Hz tone
+    """
+    parts = []
+    for amplitude, seconds in levels:
+        t = np.arange(int(seconds * FS)) / FS
+        parts.append(amplitude * np.sin(2 * np.pi * 50 * t))
+    return np.concatenate(parts)[:, np.newaxis]
+
+
+class TestFrames(unittest.TestCase):
+    def test_short_last_frame_kept(self):
+        raw_data = np.array([[3, 0], [-3, 1], [4, 0], [-4, 1], [2, -5]], float)
+        np.testing.assert_allclose(
+            frame_rms(raw_data, 2), [[3, np.sqrt(0.5)], [4, np.sqrt(0.5)], [2, 5]]
+        )
+        np.testing.assert_array_equal(frame_peak(raw_data, 2), [[3, 1], [4, 1], [2, 5]])
+        self.assertEqual(frame_rms(raw_data[:, 0], 5).shape, (1, 1))
+
+
+class TestFindEvents(unittest.TestCase):
+    def test_hysteresis(self):
+        # on at 0.4, off at 0.2: the 0.3 tail stays in the event, the lone 0.3
+        # bump never reaches on_thresh and isn't one
+        raw_data = segments(
+            (0, 0.2), (0.5, 0.2), (0.3, 0.2), (0, 0.3), (0.3, 0.2), (0, 0.2)
+        )
+        events = find_events(raw_data, FS, on_thresh=0.4, pad_sec=0)
+        self.assertEqual(events, [(200, 600)])
+
+    def test_short_gaps_merge(self):
+        raw_data = segments((0, 0.1), (0.5, 0.1), (0, 0.02), (0.5, 0.1), (0, 0.1))
+        events = find_events(raw_data, FS, on_thresh=0.4, min_gap_sec=0.05, pad_sec=0)
+        self.assertEqual(events, [(100, 320)])
+
+    def test_short_events_dropped(self):
+        raw_data = segments((0, 0.1), (0.5, 0.02), (0, 0.1))
+        self.assertEqual(find_events(raw_data, FS, on_thresh=0.4), [])
+
+    def test_any_channel_triggers(self):
+        quiet = segments((0, 0.5))
+        loud = segments((0, 0.1), (0.5, 0.2), (0, 0.2))
+        raw_data = np.hstack([quiet, loud])
+        events = find_events(raw_data, FS, on_thresh=[0.4, 0.4], pad_sec=0)
+        self.assertEqual(events, [(100, 300)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+import reed_reviewer.similarity as similarity
+
+
+def vector(seed):
+    return (
+        np.random.default_rng(seed).normal(size=similarity.N_BANDS).astype(np.float32)
+    )
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_root = self.tmp.name
+        self.index = similarity.SpectralIndex(self.data_root)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def rec_path(self, save_time):
+        return os.path.join(self.data_root, "reed_1", f"{save_time}.rrec")
+
+    def add(self, seed, save_time=None):
+        # the index only stats recordings, an empty file stands in for one
+        rec_path = self.rec_path(seed if save_time is None else save_time)
+        os.makedirs(os.path.dirname(rec_path), exist_ok=True)
+        open(rec_path, "ab").close()
+        self.index.add(rec_path, vector(seed))
+        return rec_path
+
+    def test_journal_round_trip(self):
+        for seed in range(3):
+            self.index.add(self.rec_path(seed), vector(seed))
+        paths, vectors = self.index._read_journal(self.index.journal_path)
+        self.assertEqual(
+            paths, [os.path.join("reed_1", f"{seed}.rrec") for seed in range(3)]
+        )
+        np.testing.assert_array_equal(vectors, [vector(seed) for seed in range(3)])
+
+    def test_half_written_record_skipped(self):
+        self.index.add(self.rec_path(0), vector(0))
+        with open(self.index.journal_path, "ab") as journal:
+            journal.write(similarity._PATH_LEN.pack(20) + b"reed_1/1.r")
+        paths, _ = self.index._read_journal(self.index.journal_path)
+        self.assertEqual(paths, [os.path.join("reed_1", "0.rrec")])
+
+    def test_compact_folds_journal_in(self):
+        for seed in range(3):
+            self.add(seed)
+        self.index.compact()
+        self.assertFalse(os.path.exists(self.index.journal_path))
+        self.assertFalse(os.path.exists(self.index.compacting_path))
+        paths, vectors = self.index._read_base()
+        self.assertEqual(len(paths), 3)
+
+        self.add(3)
+        matches = self.index.query(vector(3), k=2)
+        self.assertEqual(matches[0][0], self.rec_path(3))
+        self.assertAlmostEqual(matches[0][1], 0, places=5)
+        self.assertEqual(len(matches), 2)
+
+    def test_rewritten_take_kept_once(self):
+        rewritten = self.add(0)
+        self.add(1)
+        self.index.compact()
+        self.add(2, save_time=0)  # take 0 reprocessed, new fingerprint
+
+        matches = self.index.query(vector(2), k=5)
+        self.assertEqual([match[0] for match in matches].count(rewritten), 1)
+        self.assertEqual(matches[0][0], rewritten)
+        self.assertAlmostEqual(matches[0][1], 0, places=5)
+
+        self.add(3, save_time=0)
+        self.index.compact()
+        base = dict(zip(*self.index._read_base()))
+        self.assertEqual(len(base), 2)
+        np.testing.assert_array_equal(base[os.path.join("reed_1", "0.rrec")], vector(3))
+
+    def test_deleted_take_dropped(self):
+        for seed in range(3):
+            self.add(seed)
+        self.index.compact()
+        self.add(3)
+        os.remove(self.rec_path(1))
+        os.remove(self.rec_path(3))
+
+        matches = self.index.query(vector(1), k=5)
+        self.assertEqual(
+            sorted(match[0] for match in matches), [self.rec_path(0), self.rec_path(2)]
+        )
+        self.index.compact()
+        paths, _ = self.index._read_base()
+        self.assertEqual(len(paths), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+from scipy import signal as sp_signal
+
+from reed_reviewer.spectrum import get_window, spectrum, SpectrumCache
+
+FS = 8000
+
+
+def noise(n_samples=1000, channels=2, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=[n_samples, channels]).astype(np.float32)
+
+
+class TestSpectrum(unittest.TestCase):
+    def test_windows_match_scipy(self):
+        for window in ("hann", "hamming", ("tukey", 0.25)):
+            np.testing.assert_allclose(
+                get_window(window, 64), sp_signal.get_window(window, 64), atol=1e-12
+            )
+
+    def test_matches_numpy_rfft(self):
+        raw_data = noise()
+        freq_axis, freq_mag = spectrum(raw_data, FS)
+        expected = np.abs(np.fft.rfft(raw_data, axis=0)) * FS / raw_data.shape[0]
+        np.testing.assert_allclose(freq_mag, expected, rtol=1e-4, atol=1e-3)
+        np.testing.assert_allclose(freq_axis, np.fft.rfftfreq(1000, 1 / FS))
+        self.assertEqual(freq_mag.dtype, np.float32)
+
+        _, mono_mag = spectrum(raw_data[:, 0], FS)
+        np.testing.assert_allclose(mono_mag[:, 0], freq_mag[:, 0])
+
+    def test_welch_averages_segments(self):
+        raw_data = noise(1000, 1)
+        _, freq_mag = spectrum(raw_data, FS, window="hann", nperseg=200, overlap=0.5)
+        win = sp_signal.get_window("hann", 200)
+        segments = [
+            raw_data[start : start + 200, 0] * win for start in range(0, 801, 100)
+        ]
+        expected = np.mean([np.abs(np.fft.rfft(seg)) for seg in segments], axis=0)
+        np.testing.assert_allclose(
+            freq_mag[:, 0], expected * FS / win.sum(), rtol=1e-4, atol=1e-3
+        )
+        self.assertEqual(freq_mag.shape, (101, 1))
+
+    def test_tone_peak(self):
+        t = np.arange(FS) / FS
+        freq_axis, freq_mag = spectrum(np.sin(2 * np.pi * 440 * t), FS, window="hann")
+        self.assertEqual(freq_axis[np.argmax(freq_mag[:, 0])], 440)
+
+
+class TestSpectrumCache(unittest.TestCase):
+    def test_hits_and_eviction(self):
+        cache = SpectrumCache(max_entries=2)
+        first = cache.get(("1", 100), noise(seed=1), FS)
+        self.assertIs(cache.get(("1", 100), noise(seed=1), FS), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cache.get(("1", 100), noise(seed=1), FS, window="hann")  # other settings
+        cache.get(("1", 200), noise(seed=2), FS)  # evicts the boxcar entry
+        self.assertIsNot(cache.get(("1", 100), noise(seed=1), FS), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+        cache.clear()
+        cache.get(("1", 200), noise(seed=2), FS)
+        self.assertEqual(cache.misses, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
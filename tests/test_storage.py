@@ -0,0 +1,144 @@
+import io
+import os
+import tempfile
+import unittest
+import contextlib
+import numpy as np
+
+import reed_reviewer.storage as storage
+import reed_reviewer.reed_utils as rutils
+from reed_reviewer.catalog import Catalog
+
+FINGERPRINT = dict(id="7", Fs=44100, save_time=123456789, rms_thresh=[0.01, 0.02])
+
+
+class TestRecFormat(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rec_path = os.path.join(self.tmp.name, "123456789.rrec")
+        rng = np.random.default_rng(0)
+        self.raw_data = rng.uniform(-0.5, 0.5, [1000, 2]).astype(np.float32)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_header_round_trip(self):
+        storage.write_rec(self.rec_path, self.raw_data, FINGERPRINT)
+        header = storage.read_header(self.rec_path)
+        self.assertEqual(header["fingerprint"], FINGERPRINT)
+        self.assertEqual(header["n_samples"], 1000)
+        self.assertEqual(header["n_channels"], 2)
+        self.assertEqual(header["data_offset"] % 64, 0)
+        self.assertEqual(
+            os.path.getsize(self.rec_path), header["data_offset"] + self.raw_data.nbytes
+        )
+
+    def test_samples_round_trip(self):
+        storage.write_rec(self.rec_path, self.raw_data, FINGERPRINT)
+        recording, fingerp = storage.load_rec(self.rec_path)
+        np.testing.assert_array_equal(recording, self.raw_data)
+        self.assertEqual(fingerp, FINGERPRINT)
+
+        window, _ = storage.load_rec(
+            self.rec_path, mmap_mode="r", offset=900, length=500
+        )
+        np.testing.assert_array_equal(window, self.raw_data[900:])
+
+    def test_int16_scaled_back(self):
+        storage.write_rec(self.rec_path, self.raw_data, FINGERPRINT, dtype="int16")
+        recording, _ = storage.load_rec(self.rec_path)
+        self.assertEqual(recording.dtype, np.float32)
+        np.testing.assert_allclose(
+            recording, self.raw_data, atol=1 / storage.INT16_SCALE
+        )
+
+    def test_mono_written_as_one_channel(self):
+        storage.write_rec(self.rec_path, self.raw_data[:, 0], FINGERPRINT)
+        recording, _ = storage.load_rec(self.rec_path)
+        self.assertEqual(recording.shape, (1000, 1))
+
+    def test_unfinalized_header_counts_samples_from_size(self):
+        # a long take that was never finalized has n_samples None in its header
+        with open(self.rec_path, "wb") as rec_file:
+            rec_file.write(storage.encode_header(FINGERPRINT, "float32", 2, None))
+            rec_file.write(self.raw_data.tobytes())
+            rec_file.write(b"\0" * 5)  # half a frame of a block being written
+        header = storage.read_header(self.rec_path)
+        self.assertEqual(header["n_samples"], 1000)
+        recording, _ = storage.load_rec(self.rec_path)
+        np.testing.assert_array_equal(recording, self.raw_data)
+
+    def test_not_a_recording(self):
+        with open(self.rec_path, "wb") as rec_file:
+            rec_file.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            storage.read_header(self.rec_path)
+
+    def test_failed_write_keeps_old_file(self):
+        storage.write_rec(self.rec_path, self.raw_data, FINGERPRINT)
+        with self.assertRaises(TypeError):  # fingerprint isn't json
+            storage.write_rec(self.rec_path, self.raw_data, dict(id=object()))
+        recording, _ = storage.load_rec(self.rec_path)
+        np.testing.assert_array_equal(recording, self.raw_data)
+
+
+def write_npz(dir_path, name, save_time):
+    os.makedirs(dir_path, exist_ok=True)
+    fingerprint = dict(FINGERPRINT, save_time=save_time)
+    recording = np.full([100, 2], save_time / 1000, dtype=np.float64)
+    np.savez_compressed(
+        os.path.join(dir_path, name),
+        recording=recording,
+        fingerprint=np.array(fingerprint, dtype=object),
+    )
+    return recording
+
+
+class TestMigrate(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.reed_dir = os.path.join(self.root, "reed_7")
+        self.recording = write_npz(self.reed_dir, "100.npz", 100)
+        write_npz(os.path.join(self.root, "baseline"), "baseline_200_x.npz", 200)
+        write_npz(os.path.join(self.root, "archive", "baseline_1"), "b_1_x.npz", 1)
+        # not recordings, must be left alone
+        np.savez(os.path.join(self.root, "similarity.npz"), vectors=np.zeros(3))
+        write_npz(os.path.join(self.root, "timelines"), "reed_7.npz", 300)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def migrate(self, keep=False):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            count = storage.migrate_tree(self.root, keep=keep)
+        self.assertNotIn("skipping", out.getvalue())
+        return count
+
+    def test_migrate_tree(self):
+        self.assertEqual(self.migrate(), 3)
+        self.assertEqual(os.listdir(self.reed_dir), ["100.rrec"])
+        recording, fingerp = rutils.load_rec(os.path.join(self.reed_dir, "100.rrec"))
+        np.testing.assert_allclose(recording, self.recording)
+        self.assertEqual(fingerp["save_time"], 100)
+        self.assertTrue(os.path.exists(os.path.join(self.root, "similarity.npz")))
+        self.assertTrue(
+            os.path.exists(os.path.join(self.root, "timelines", "reed_7.npz"))
+        )
+        archived = os.listdir(os.path.join(self.root, "archive", "baseline_1"))
+        self.assertEqual(archived, ["b_1_x.rrec"])
+
+        rows = Catalog(self.root).recordings()  # takes only, not the baseline
+        self.assertEqual([row["save_time"] for row in rows], [100])
+
+    def test_keep_moves_npz_aside(self):
+        self.assertEqual(self.migrate(keep=True), 3)
+        self.assertEqual(rutils.list_recordings(self.reed_dir), ["100.rrec"])
+        kept = os.path.join(self.reed_dir, "100.npz" + storage.KEPT_SUFFIX)
+        self.assertTrue(os.path.exists(kept))
+        self.assertEqual(self.migrate(keep=True), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import numpy as np
+
+from reed_reviewer.stream import RingBuffer, StreamTrigger
+
+FS = 1000
+
+
+def ramp(start, n_frames, channels=2):
+    """
+    blocks whose samples are their absolute index, so reads are easy to check
+    """
+    frames = np.arange(start, start + n_frames, dtype=np.float32)
+    return np.repeat(frames[:, np.newaxis], channels, axis=1)
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_wraparound(self):
+        ring = RingBuffer(10, 2)
+        total = 0
+        for n_frames in (4, 4, 4, 7):  # the last two writes wrap
+            ring.write(ramp(total, n_frames))
+            total += n_frames
+        self.assertEqual(ring.total, 19)
+        self.assertEqual(ring.oldest(), 9)
+        np.testing.assert_array_equal(ring.read(9, 19), ramp(9, 10))
+        np.testing.assert_array_equal(ring.read(12, 15), ramp(12, 3))
+
+    def test_read_is_clipped_to_held_samples(self):
+        ring = RingBuffer(10, 2)
+        ring.write(ramp(0, 15))
+        np.testing.assert_array_equal(ring.read(0, 100), ramp(5, 10))
+        self.assertEqual(ring.read(20, 30).shape, (0, 2))
+
+    def test_block_longer_than_buffer_keeps_newest(self):
+        ring = RingBuffer(10, 2)
+        ring.write(ramp(0, 3))
+        ring.write(ramp(3, 25))
+        self.assertEqual(ring.total, 28)
+        np.testing.assert_array_equal(
+            ring.read(ring.oldest(), ring.total), ramp(18, 10)
+        )
+
+    def test_read_is_a_copy(self):
+        ring = RingBuffer(10, 2)
+        ring.write(ramp(0, 5))
+        out = ring.read(0, 5)
+        ring.write(ramp(5, 10))
+        np.testing.assert_array_equal(out, ramp(0, 5))
+
+
+class TestStreamTrigger(unittest.TestCase):
+    def push_all(self, trigger, signal, blocksize=100):
+        takes, starts = [], []
+        for start in range(0, signal.shape[0], blocksize):
+            for take in trigger.push(signal[start : start + blocksize]):
+                takes.append(take)
+                starts.append(trigger.last_start)
+        return takes, starts
+
+    def trigger(self):
+        return StreamTrigger(
+            FS, 1, 0.4, pre_roll_sec=0.1, post_roll_sec=0.2, max_take_sec=1
+        )
+
+    def test_take_with_pre_and_post_roll(self):
+        signal = np.zeros([2000, 1], np.float32)
+        signal[500:800] = 0.5
+        signal[1500:1600] = 0.5
+        trigger = self.trigger()
+        takes, starts = self.push_all(trigger, signal)
+        self.assertEqual(starts, [400, 1400])
+        self.assertEqual([take.shape[0] for take in takes], [600, 400])
+        np.testing.assert_array_equal(takes[0], signal[400:1000])
+        self.assertEqual(trigger.flush(), [])
+
+    def test_long_take_is_cut_and_flushed(self):
+        signal = np.full([2500, 1], 0.5, np.float32)
+        trigger = self.trigger()
+        takes, starts = self.push_all(trigger, signal)
+        self.assertEqual(starts, [0, 1000])
+        self.assertEqual([take.shape[0] for take in takes], [1000, 1000])
+        self.assertTrue(trigger.active)
+        rest = trigger.flush()
+        self.assertEqual(rest[0].shape[0], 500)
+        self.assertEqual(trigger.last_start, 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import threading
+import unittest
+import importlib.util
+
+HAS_KIVY = importlib.util.find_spec("kivy") is not None
+if HAS_KIVY:
+    from kivy.clock import Clock
+    from src_kivy_app.tasks import TaskRunner
+
+
+@unittest.skipUnless(HAS_KIVY, "the app's task runner needs kivy")
+class TestTaskRunner(unittest.TestCase):
+    def setUp(self):
+        self.busy = []
+        self.runner = TaskRunner(on_busy=self.busy.append)
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def deliver(self, *futures):
+        for future in futures:
+            if not future.cancelled():
+                future.exception()  # waits for it to finish
+        Clock.tick()  # results come back through the main thread's Clock
+
+    def test_result_delivered(self):
+        results = []
+        future = self.runner.submit(
+            "plot", "plotting", sum, [1, 2], on_done=results.append
+        )
+        self.assertTrue(self.runner.is_busy("plot"))
+        self.deliver(future)
+        self.assertEqual(results, [3])
+        self.assertFalse(self.runner.is_busy("plot"))
+        self.assertEqual(self.busy, [{"plot": "plotting"}, {}])
+
+    def test_error_delivered(self):
+        errors = []
+        future = self.runner.submit(
+            "plot", "plotting", lambda: 1 / 0, on_error=errors.append
+        )
+        self.deliver(future)
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+
+    def test_newer_job_supersedes(self):
+        release = threading.Event()
+        results = []
+        running = self.runner.submit("plot", "old", release.wait)
+        waiting = self.runner.submit(
+            "plot", "old", lambda: "waiting", on_done=results.append
+        )
+        newest = self.runner.submit(
+            "plot", "new", lambda: "new", on_done=results.append
+        )
+        self.assertTrue(waiting.cancelled())
+        release.set()
+        self.deliver(running, waiting, newest)
+        self.assertEqual(results, ["new"])
+
+    def test_lane_without_supersede_runs_everything(self):
+        results = []
+        futures = [
+            self.runner.submit(
+                "audio",
+                "recording",
+                lambda idx=idx: idx,
+                on_done=results.append,
+                supersede=False,
+            )
+            for idx in range(3)
+        ]
+        self.deliver(*futures)
+        self.assertEqual(results, [0, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+import reed_reviewer.storage as storage
+from reed_reviewer.catalog import Catalog
+from reed_reviewer.plotting import RecordingPlot
+from reed_reviewer.timeline import Timeline
+
+FS = 44100
+
+
+class TestTimeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_root = self.tmp.name
+        self.catalog = Catalog(self.data_root)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add(self, save_time, freq, mtime=None):
+        reed_dir = os.path.join(self.data_root, "reed_1")
+        os.makedirs(reed_dir, exist_ok=True)
+        rec_path = os.path.join(reed_dir, f"{save_time}.rrec")
+        t = np.arange(FS // 4) / FS
+        raw_data = np.repeat(0.3 * np.sin(2 * np.pi * freq * t)[:, np.newaxis], 2, 1)
+        fingerprint = dict(id="1", save_time=save_time, Fs=FS, rms_thresh=[0.01])
+        storage.write_rec(rec_path, raw_data.astype(np.float32), fingerprint)
+        if mtime is not None:
+            os.utime(rec_path, (mtime, mtime))
+        self.catalog.add(rec_path, fingerprint, raw_data.shape)
+        return rec_path
+
+    def update(self):
+        timeline = Timeline(1, self.data_root)
+        n_new = timeline.update(self.catalog.recordings(reed_id=1))
+        return timeline, n_new
+
+    def test_incremental_update(self):
+        self.add(300, 600)
+        self.add(100, 200)
+        timeline, n_new = self.update()
+        self.assertEqual(n_new, 2)
+        self.add(200, 400)  # late arrival, older than the newest take
+
+        timeline, n_new = self.update()
+        self.assertEqual(n_new, 1)
+        self.assertEqual(timeline.save_time.tolist(), [100, 200, 300])
+        np.testing.assert_allclose(timeline.dominant, [200, 400, 600])
+        self.assertEqual(self.update()[1], 0)
+
+        count, mean, std = timeline.summary()["centroid"]
+        self.assertEqual(count, 3)
+        self.assertAlmostEqual(mean, timeline.centroid.mean())
+        self.assertAlmostEqual(std, timeline.centroid.std(ddof=1))
+        self.assertEqual(timeline.summary()["db"][0], 0)  # no baseline, all nan
+
+    def test_removed_and_rewritten_takes(self):
+        self.add(100, 200)
+        gone = self.add(200, 400)
+        self.add(300, 600)
+        self.update()
+
+        self.catalog.remove(gone)
+        os.remove(gone)
+        self.add(300, 800, mtime=1)  # rewritten
+
+        timeline, n_new = self.update()
+        self.assertEqual(n_new, 1)
+        self.assertEqual(timeline.save_time.tolist(), [100, 300])
+        np.testing.assert_allclose(timeline.dominant, [200, 800])
+        count, mean, _ = timeline.summary()["dominant"]
+        self.assertEqual(count, 2)
+        self.assertAlmostEqual(mean, 500)
+
+    def test_plot_keeps_recording_axes(self):
+        self.add(100, 200)
+        self.add(200, 400)
+        timeline, _ = self.update()
+        fig = plt.figure()
+        self.addCleanup(plt.close, fig)
+
+        plot = RecordingPlot.for_figure(fig)
+        timeline.plot(fig)
+        self.assertEqual(len(fig.axes), 6)
+        self.assertTrue(all(ax in fig.axes for ax in plot.ax))
+        self.assertFalse(any(ax.get_visible() for ax in plot.ax))
+
+        self.assertIs(RecordingPlot.for_figure(fig), plot)
+        visible = [ax for ax in fig.axes if ax.get_visible()]
+        self.assertEqual(visible, plot.ax)
+
+        timeline.plot(fig)  # same panels again
+        self.assertEqual(len(fig.axes), 6)
+        self.assertEqual(len([ax for ax in fig.axes if ax.get_visible()]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import queue
+import threading
+import unittest
+
+from reed_reviewer.writer import SaveQueue, shared_save_queue
+
+
+class TestSaveQueue(unittest.TestCase):
+    def setUp(self):
+        self.errors = []
+        self.save_queue = SaveQueue(
+            maxsize=2,
+            put_timeout=0.2,
+            on_error=lambda err, description: self.errors.append(description),
+        )
+
+    def tearDown(self):
+        self.save_queue.close()
+
+    def test_jobs_written_in_order(self):
+        written = []
+        for idx in range(5):
+            self.save_queue.submit(f"job {idx}", written.append, idx)
+        self.save_queue.flush()
+        self.assertEqual(written, list(range(5)))
+        self.assertEqual(self.save_queue.written, 5)
+        self.assertEqual(self.save_queue.pending(), 0)
+
+    def test_failed_job_doesnt_stop_the_rest(self):
+        written = []
+        self.save_queue.submit("bad", lambda: 1 / 0)
+        self.save_queue.submit("good", written.append, "good")
+        self.save_queue.flush()
+        self.assertEqual(written, ["good"])
+        self.assertEqual(self.errors, ["bad"])
+        self.assertEqual(self.save_queue.errors[0][0], "bad")
+        self.assertIsInstance(self.save_queue.errors[0][1], ZeroDivisionError)
+
+    def test_full_queue_pushes_back(self):
+        started, release = threading.Event(), threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait()
+
+        self.save_queue.submit("blocking", blocking)
+        started.wait()  # the worker holds it, the queue itself is empty
+        self.save_queue.submit("waiting 1", lambda: None)
+        self.save_queue.submit("waiting 2", lambda: None)
+        with self.assertRaises(queue.Full):
+            self.save_queue.submit("no room", lambda: None)
+        release.set()
+        self.save_queue.flush()
+        self.assertEqual(self.save_queue.written, 3)
+
+    def test_close_writes_queued_jobs(self):
+        written = []
+        release = threading.Event()
+        self.save_queue.submit("blocking", release.wait)
+        self.save_queue.submit("queued", written.append, "queued")
+        release.set()
+        self.save_queue.close()
+        self.assertEqual(written, ["queued"])
+        with self.assertRaises(RuntimeError):
+            self.save_queue.submit("late", written.append, "late")
+
+    def test_shared_queue(self):
+        shared = shared_save_queue()
+        self.assertIs(shared_save_queue(), shared)
+        shared.close()
+        self.assertIsNot(shared_save_queue(), shared)
+
+
+if __name__ == "__main__":
+    unittest.main()